@@ -0,0 +1,246 @@
+"""
+API отчётов по сохранённым штрафам (только чтение)
+
+Отдельный процесс со своим пулом соединений (database.models.
+create_report_engine): тяжёлые выборки не занимают соединения цикла
+опроса. Списки штрафов - постранично по курсору (keyset pagination),
+выгрузка в CSV идёт потоком страницами по DB_BATCH_SIZE в коротких
+транзакциях, итоги по дням, типам и статусам читаются из daily_stats.
+
+Запуск:
+    python -m api.main
+    curl "http://127.0.0.1:8080/fines?status=Начислен&min_amount=1000"
+"""
+
+import base64
+import binascii
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, sessionmaker
+
+from bot.config import config
+from database.history import FineHistoryRepository
+from database.models import DEFAULT_SELLER_ID, Fine, create_report_engine
+from database.repository import FineFilter, FineRepository, StatsRepository
+
+MAX_PAGE_SIZE = 1000
+CSV_COLUMNS = ("id", "date", "type", "amount", "order_id", "status")
+
+_session_factory: Optional[sessionmaker] = None
+
+
+def _session() -> Session:
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(
+            autocommit=False, autoflush=False, bind=create_report_engine()
+        )
+    return _session_factory()
+
+
+def get_db() -> Iterator[Session]:
+    db = _session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _authorize(authorization: Optional[str] = Header(None)):
+    if config.API_TOKEN and authorization != f"Bearer {config.API_TOKEN}":
+        raise HTTPException(status_code=401, detail="Нужен заголовок Authorization")
+
+
+app = FastAPI(title="WB Fines API", dependencies=[Depends(_authorize)])
+
+
+def encode_cursor(fine_date: datetime, fine_id: str) -> str:
+    """Курсор страницы: дата и id последнего штрафа"""
+    raw = f"{fine_date.isoformat()}|{fine_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        fine_date, fine_id = base64.urlsafe_b64decode(cursor).decode().split("|", 1)
+        return datetime.fromisoformat(fine_date), fine_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Некорректный cursor")
+
+
+def fine_filter(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    order_id: Optional[str] = None,
+) -> FineFilter:
+    """Фильтр из параметров запроса: [date_from, date_to), сумма от min_amount"""
+    return FineFilter(date_from, date_to, type, status, min_amount, order_id)
+
+
+def _fine_json(fine: Fine) -> dict:
+    # Суммы строкой, чтобы не терять копейки во float
+    return {
+        "id": fine.id,
+        "date": fine.date.isoformat(),
+        "type": fine.type,
+        "amount": str(fine.amount),
+        "order_id": fine.order_id,
+        "status": fine.status,
+        "notified": fine.notified,
+    }
+
+
+def _stat_json(row: dict) -> dict:
+    return {**row, "total_amount": str(row["total_amount"])}
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/fines")
+def list_fines(
+    seller: str = DEFAULT_SELLER_ID,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    filters: FineFilter = Depends(fine_filter),
+    db: Session = Depends(get_db),
+):
+    """
+    Штрафы кабинета по фильтру, от новых к старым
+
+    Следующая страница - тот же запрос с cursor из поля "next" (null на
+    последней странице).
+    """
+    after = decode_cursor(cursor) if cursor else None
+    fines = FineRepository(db, seller).find(filters, limit, after)
+    next_cursor = None
+    if len(fines) == limit:
+        next_cursor = encode_cursor(fines[-1].date, fines[-1].id)
+    return {"data": [_fine_json(fine) for fine in fines], "next": next_cursor}
+
+
+def _csv_rows(seller: str, filters: FineFilter) -> Iterator[str]:
+    """CSV страницами; каждая страница - своя короткая транзакция"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    after = None
+    while True:
+        db = _session()
+        try:
+            fines = FineRepository(db, seller).find(
+                filters, config.DB_BATCH_SIZE, after
+            )
+            for fine in fines:
+                writer.writerow(
+                    (
+                        fine.id,
+                        fine.date.isoformat(),
+                        fine.type,
+                        fine.amount,
+                        fine.order_id,
+                        fine.status,
+                    )
+                )
+        finally:
+            db.close()
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if len(fines) < config.DB_BATCH_SIZE:
+            return
+        after = (fines[-1].date, fines[-1].id)
+
+
+@app.get("/fines/export.csv")
+def export_fines(
+    seller: str = DEFAULT_SELLER_ID,
+    filters: FineFilter = Depends(fine_filter),
+):
+    """Выгрузка всех штрафов по фильтру в CSV (потоком, без лимита)"""
+    return StreamingResponse(
+        _csv_rows(seller, filters),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="fines-{seller}.csv"'},
+    )
+
+
+@app.get("/fines/{fine_id}/history")
+def fine_history(
+    fine_id: str,
+    seller: str = DEFAULT_SELLER_ID,
+    db: Session = Depends(get_db),
+):
+    """Изменения штрафа (смена статуса, суммы, типа), от старых к новым"""
+    entries = FineHistoryRepository(db, seller).get_for_fine(fine_id)
+    return {
+        "data": [
+            {
+                "changed_at": entry.changed_at.isoformat(),
+                "old_status": entry.old_status,
+                "new_status": entry.new_status,
+                "old_amount": (
+                    str(entry.old_amount) if entry.old_amount is not None else None
+                ),
+                "new_amount": (
+                    str(entry.new_amount) if entry.new_amount is not None else None
+                ),
+                "old_type": entry.old_type,
+                "new_type": entry.new_type,
+            }
+            for entry in entries
+        ]
+    }
+
+
+@app.get("/stats/daily")
+def stats_daily(
+    seller: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Количество и сумма по дням из daily_stats (seller не указан - все)"""
+    rows = StatsRepository(db, seller).get_daily(date_from, date_to, type, status)
+    return {"data": [_stat_json(row) for row in rows]}
+
+
+@app.get("/stats/breakdown")
+def stats_breakdown(
+    by: str = Query("type", pattern="^(type|status)$"),
+    seller: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    type: Optional[str] = None,
+    status: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Количество и сумма по типам или статусам за период из daily_stats"""
+    rows = StatsRepository(db, seller).get_breakdown(
+        by, date_from, date_to, type, status
+    )
+    return {"data": [_stat_json(row) for row in rows]}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    print("=" * 50)
+    print(f"API отчётов: http://{config.API_HOST}:{config.API_PORT}")
+    print(f"Документация: http://{config.API_HOST}:{config.API_PORT}/docs")
+    print("=" * 50)
+    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
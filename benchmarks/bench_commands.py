@@ -0,0 +1,174 @@
+"""
+Бенчмарк команд в чатах: итоги в памяти против запросов к fines
+
+В БД --sellers кабинетов по --fines штрафов, разнесённых на --days дней.
+Каждая команда (/stats, /today, /top, /unpaid) выполняется --repeat раз
+для случайных чатов:
+- sql: ответ считается GROUP BY по таблице fines, как без кэша;
+- cache: ответ из SummaryCache (TelegramCommands.answer), SQL-запросов
+  быть не должно.
+Отдельно - время полной загрузки кэша из daily_stats (запуск и раз в
+SUMMARY_REFRESH) и применения изменений одной пачки после коммита.
+
+Запуск (по умолчанию временная SQLite, для PostgreSQL укажите URL):
+    python -m benchmarks.bench_commands --sellers 20 --fines 20000
+    python -m benchmarks.bench_commands --database-url postgresql://...
+
+Внимание: из таблицы fines удаляются строки с префиксом BENCH,
+daily_stats после этого пересчитывается.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import Session
+
+from benchmarks.common import QueryCounter, make_fines, percentile
+from bot.commands import TOP_DAYS, TelegramCommands
+from bot.summary import CLOSED_STATUSES, SummaryCache
+from database.models import Base, Fine
+from database.repository import FineRepository, StatsRepository
+
+COMMANDS = ("/stats", "/today", "/top", "/unpaid")
+
+
+def cleanup(engine):
+    with Session(engine) as db:
+        db.execute(delete(Fine).where(Fine.id.like("BENCH_%")))
+        StatsRepository(db).rebuild()
+        db.commit()
+
+
+def seller_fines(args, index: int) -> list:
+    """Штрафы кабинета за последние --days дней"""
+    now = datetime.now()
+    rnd = random.Random(index)
+    fines = make_fines(args.fines, seed=index, prefix=f"BENCH_{index:03d}")
+    for fine in fines:
+        fine["date"] = (
+            now - timedelta(seconds=rnd.randint(0, args.days * 86400 - 1))
+        ).isoformat()
+    return fines
+
+
+def fill(engine, args) -> list:
+    cleanup(engine)
+    seller_ids = [f"bench_{index:03d}" for index in range(args.sellers)]
+    for index, seller_id in enumerate(seller_ids):
+        with Session(engine) as db:
+            FineRepository(db, seller_id).save_fines_batch(seller_fines(args, index))
+            db.commit()
+    return seller_ids
+
+
+def sql_answer(db: Session, seller_id: str, command: str):
+    """Ответ на команду запросом к fines (вариант без кэша)"""
+    today = datetime.combine(date.today(), datetime.min.time())
+    column = Fine.status if command in ("/stats", "/unpaid") else Fine.type
+    query = (
+        select(column, func.count(), func.sum(Fine.amount))
+        .where(Fine.seller_id == seller_id)
+        .group_by(column)
+    )
+    if command == "/today":
+        query = query.where(Fine.date >= today)
+    elif command == "/top":
+        query = query.where(Fine.date >= today - timedelta(days=TOP_DAYS - 1))
+    elif command == "/unpaid":
+        query = query.where(Fine.status.not_in(CLOSED_STATUSES))
+    return db.execute(query).all()
+
+
+def measure(args, seller_ids, counter, command: str, answer) -> dict:
+    rnd = random.Random(0)
+    durations = []
+    counter.count = 0
+    for _ in range(args.repeat):
+        seller_id = rnd.choice(seller_ids)
+        started = time.perf_counter()
+        answer(seller_id, command)
+        durations.append(time.perf_counter() - started)
+    return {
+        "command": command,
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p99_ms": round(percentile(durations, 99) * 1000, 3),
+        "queries_per_answer": round(counter.count / args.repeat, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sellers", type=int, default=20)
+    parser.add_argument("--fines", type=int, default=20000, help="на кабинет")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+
+    seller_ids = fill(engine, args)
+    counter = QueryCounter(engine)
+
+    summary = SummaryCache()
+    started = time.perf_counter()
+    with Session(engine) as db:
+        rows = StatsRepository(db, None).get_rows()
+    summary.load(rows)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    commands = TelegramCommands(None, summary)
+    commands.chat_sellers = {seller_id: (seller_id,) for seller_id in seller_ids}
+
+    # Изменения одной пачки: 100 новых штрафов за сегодня
+    deltas = {}
+    for fine in make_fines(100, prefix="DELTA"):
+        key = (date.today(), fine["type"], fine["status"])
+        count, amount = deltas.get(key, (0, Decimal(0)))
+        deltas[key] = (count + 1, amount + Decimal(str(fine["amount"])))
+    started = time.perf_counter()
+    summary.apply(seller_ids[0], deltas)
+    apply_us = (time.perf_counter() - started) * 1e6
+
+    with Session(engine) as db:
+        sql = [
+            measure(
+                args,
+                seller_ids,
+                counter,
+                command,
+                lambda seller_id, command: sql_answer(db, seller_id, command),
+            )
+            for command in COMMANDS
+        ]
+    cache = [
+        measure(args, seller_ids, counter, command, commands.answer)
+        for command in COMMANDS
+    ]
+
+    cleanup(engine)
+    report = {
+        "fines_total": args.sellers * args.fines,
+        "daily_stats_rows": len(rows),
+        "cache_load_ms": round(load_ms, 1),
+        "cache_apply_us": round(apply_us, 1),
+        "sql": sql,
+        "cache": cache,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Бенчмарк отзывчивости event loop при параллельной работе с БД и сетью
+
+Несколько задач одновременно повторяют цикл бота: запрос штрафов к
+мок-серверу WB и сохранение пачки в БД. Сравниваются три способа
+работы с БД из асинхронного кода:
+- blocking: синхронная сессия прямо в корутине (как было раньше);
+- thread: run_db с psycopg2 в пуле потоков;
+- async: run_db с asyncpg (DB_ASYNC=true).
+
+Нужен PostgreSQL (DATABASE_URL из конфигурации):
+    python -m benchmarks.bench_db_loop --tasks 8 --cycles 10 --batch 500
+
+Внимание: штрафы с префиксом LOOP удаляются, daily_stats пересчитывается.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import delete
+
+from benchmarks.common import LoopLagProbe, make_fines, run_server
+from bot.config import config
+from bot.wb_client import AsyncWBClient
+from database import models
+from database.models import Fine, SessionLocal, dispose_engines, init_db, run_db
+from database.repository import FineRepository, StatsRepository
+
+
+def save_batch(db, fines) -> int:
+    FineRepository(db).save_fines_batch(fines)
+    return FineRepository(db).get_fines_count()
+
+
+def save_batch_blocking(fines) -> int:
+    db = SessionLocal()
+    try:
+        total = save_batch(db, fines)
+        db.commit()
+        return total
+    finally:
+        db.close()
+
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        db.execute(delete(Fine).where(Fine.id.like("LOOP%")))
+        StatsRepository(db).rebuild()
+        db.commit()
+    finally:
+        db.close()
+
+
+async def bench(mode: str, base_url: str, args) -> dict:
+    config.DB_ASYNC = mode == "async"
+    client = AsyncWBClient(base_url=base_url)
+    # Данные готовятся заранее, чтобы их генерация не попала в замер
+    batches = {
+        (number, cycle): make_fines(
+            args.batch, seed=number * 1000 + cycle, prefix=f"LOOP{number}_{cycle}"
+        )
+        for number in range(args.tasks)
+        for cycle in range(args.cycles)
+    }
+    probe = LoopLagProbe()
+    probe.start()
+
+    async def task(number: int):
+        for cycle in range(args.cycles):
+            await client.get_fines(days_back=1)
+            fines = batches[(number, cycle)]
+            if mode == "blocking":
+                save_batch_blocking(fines)
+            else:
+                await run_db(save_batch, fines)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(task(number) for number in range(args.tasks)))
+    elapsed = time.perf_counter() - started
+
+    await probe.stop()
+    await client.aclose()
+    await dispose_engines()
+    cycles = args.tasks * args.cycles
+    return {
+        "mode": mode,
+        "cycles": cycles,
+        "elapsed_s": round(elapsed, 3),
+        "fines_per_s": round(cycles * args.batch / elapsed, 1),
+        "loop_lag": probe.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tasks", type=int, default=8)
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    if not config.DATABASE_URL.startswith("postgresql"):
+        raise SystemExit("Нужен PostgreSQL")
+    # Пул должен вмещать все задачи, иначе они ждут соединение, а не БД
+    config.DB_POOL_SIZE = max(config.DB_POOL_SIZE, args.tasks)
+
+    init_db()
+    results = []
+    env = {"MOCK_LATENCY_MS": str(args.latency_ms)}
+    with run_server("mock_server.main:app", env=env) as base_url:
+        for mode in ("blocking", "thread", "async"):
+            cleanup()
+            results.append(asyncio.run(bench(mode, base_url, args)))
+        cleanup()
+    models.get_engine().dispose()
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Сквозной бенчмарк цикла опроса (WBFineBot.check_fines)
+
+Для каждого объёма из --volumes запускается отдельный процесс (пиковый
+RSS относится к одному объёму): мок WB с детерминированным набором из N
+штрафов, эмуляция Telegram без лимитов и бот с локальной БД. Замеры:
+- cold: первый цикл, все N штрафов новые;
+- steady: --cycles следующих циклов, бот перечитывает окно перекрытия,
+  набор растёт (MOCK_DATASET_GROW);
+- delivery: разбор outbox в Telegram (для объёмов до --deliver-max).
+
+В отчёте - штрафов/с первого цикла, p50/p99 времени цикла, SQL-запросов
+(round trips) на штраф и пиковый RSS процесса бота. Результат пишется в
+JSON вместе с коммитом, прошлый результат можно сравнить с текущим.
+
+Запуск (по умолчанию временная SQLite, для PostgreSQL укажите URL):
+    python -m benchmarks.bench_e2e --volumes 10,1000,100000
+    python -m benchmarks.bench_e2e --volumes 1000000 --database-url postgresql://...
+    python -m benchmarks.bench_e2e --compare benchmarks/results/e2e-1a2b3c4.json
+
+Внимание: в PostgreSQL перед каждым объёмом очищаются таблицы fines,
+notifications, daily_stats и fetch_cursors.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.common import ROOT, QueryCounter, percentile, run_server
+
+# Набор мока укладывается в окно первого запуска (FETCH_INITIAL_DAYS=1)
+DATASET_SPAN = 80_000  # сек
+
+METRICS = (
+    "fines_per_s",
+    "cycle_ms_p50",
+    "cycle_ms_p99",
+    "round_trips_per_fine",
+    "peak_rss_mb",
+)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss в Linux - в килобайтах
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def measure(args, volume: int, wb_url: str) -> dict:
+    """Циклы опроса и доставка в процессе, где уже настроен config"""
+    from bot.config import config
+    from bot.main import WBFineBot
+    from bot.wb_client import AsyncWBClient
+    from database.models import dispose_engines, get_async_engine, get_engine, init_db
+
+    bot = WBFineBot()
+    init_db()
+    await bot.wb_client.aclose()
+    bot.wb_client = AsyncWBClient(base_url=wb_url)
+    counters = [QueryCounter(get_engine())]
+    if config.DB_ASYNC:
+        counters.append(QueryCounter(get_async_engine().sync_engine))
+
+    def round_trips() -> int:
+        return sum(counter.count for counter in counters)
+
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    cold = await bot.check_fines()
+    cold_s = time.perf_counter() - started
+    cold_round_trips = round_trips()
+
+    durations, fetched = [], 0
+    errors = 1 if cold.error else 0
+    for _ in range(args.cycles):
+        await asyncio.sleep(args.interval)
+        started = time.perf_counter()
+        result = await bot.check_fines()
+        durations.append(time.perf_counter() - started)
+        fetched += result.fetched
+        errors += 1 if result.error else 0
+    steady_round_trips = round_trips() - cold_round_trips
+    peak_rss = _peak_rss_mb()
+
+    delivery = None
+    if volume <= args.deliver_max:
+        await bot.notifier.start()
+        started = time.perf_counter()
+        notifications = 0
+        while True:
+            drained = await bot.outbox_worker.drain_once()
+            if not drained:
+                break
+            notifications += drained
+        await bot.outbox_worker.flush_status()
+        elapsed = time.perf_counter() - started
+        await bot.notifier.stop()
+        delivery = {
+            "notifications": notifications,
+            "elapsed_s": round(elapsed, 2),
+            "per_s": round(notifications / elapsed) if elapsed else 0,
+        }
+
+    await bot.wb_client.aclose()
+    await dispose_engines()
+    return {
+        "volume": volume,
+        "fines_per_s": round(cold.fetched / cold_s) if cold_s else 0,
+        "cold_s": round(cold_s, 3),
+        "cold_fetched": cold.fetched,
+        "cold_new": cold.new,
+        "cycle_ms_p50": round(percentile(durations, 50) * 1000, 1),
+        "cycle_ms_p99": round(percentile(durations, 99) * 1000, 1),
+        "steady_fetched_per_cycle": (
+            round(fetched / len(durations), 1) if durations else 0
+        ),
+        "round_trips_per_fine": round(cold_round_trips / max(cold.fetched, 1), 4),
+        "round_trips_per_cycle": (
+            round(steady_round_trips / len(durations), 1) if durations else 0
+        ),
+        "rss_start_mb": rss_before,
+        "peak_rss_mb": peak_rss,
+        "delivery": delivery,
+        "failed_cycles": errors,
+    }
+
+
+def _prepare_database(url: str):
+    """Пустые таблицы бота в PostgreSQL (SQLite каждый раз новая)"""
+    if not url.startswith("postgresql"):
+        return
+    from sqlalchemy import create_engine, text
+
+    from database.migrations import migrate
+
+    engine = create_engine(url)
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE fines, notifications, daily_stats, fetch_cursors"))
+    engine.dispose()
+
+
+def run_volume(args, volume: int) -> dict:
+    """Один объём; выполняется в дочернем процессе"""
+    from bot.config import config
+
+    url = args.database_url or f"sqlite:///{os.path.join(os.getcwd(), 'e2e.db')}"
+    _prepare_database(url)
+    config.DB_URL = url
+    config.DB_ASYNC = args.async_db and url.startswith("postgresql")
+    config.NOTIFY_MODE = "digest"
+    config.TELEGRAM_BOT_TOKEN = "1:BENCH"
+    config.TELEGRAM_CHAT_ID = "42"
+    config.TELEGRAM_GLOBAL_RATE = config.TELEGRAM_CHAT_RATE = 10_000
+    config.TELEGRAM_CHAT_BURST = 10_000
+    config.FETCH_CHUNK_SIZE = args.chunk_size
+
+    wb_env = {
+        "MOCK_DATASET_SIZE": str(volume),
+        "MOCK_DATASET_STEP": str(DATASET_SPAN / volume),
+        "MOCK_DATASET_GROW": "true",
+        "MOCK_LATENCY_MS": str(args.latency_ms),
+    }
+    tg_env = {
+        "MOCK_TG_LATENCY_MS": "0",
+        "MOCK_TG_CHAT_RATE": "10000",
+        "MOCK_TG_CHAT_BURST": "10000",
+        "MOCK_TG_GLOBAL_RATE": "10000",
+    }
+    with run_server("mock_server.main:app", env=wb_env) as wb_url, run_server(
+        "mock_server.telegram:app", env=tg_env
+    ) as tg_url:
+        config.TELEGRAM_API_URL = f"{tg_url}/bot"
+        return asyncio.run(measure(args, volume, wb_url))
+
+
+def _commit() -> dict:
+    def git(*command):
+        return subprocess.run(
+            ["git", *command], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def run_child(args, volume: int) -> dict:
+    """Запуск объёма в отдельном процессе; логи бота - в его каталоге"""
+    with tempfile.TemporaryDirectory() as workdir:
+        result_file = os.path.join(workdir, "result.json")
+        command = [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_e2e",
+            "--child",
+            str(volume),
+            "--result-file",
+            result_file,
+            "--cycles",
+            str(args.cycles),
+            "--interval",
+            str(args.interval),
+            "--chunk-size",
+            str(args.chunk_size),
+            "--deliver-max",
+            str(args.deliver_max),
+            "--latency-ms",
+            str(args.latency_ms),
+        ]
+        if args.database_url:
+            command += ["--database-url", args.database_url]
+        if args.async_db:
+            command.append("--async-db")
+        env = {
+            **os.environ,
+            "PYTHONPATH": ROOT,
+            "LOG_LEVEL": args.log_level,
+            "APP_MODE": "MOCK",
+        }
+        subprocess.run(command, cwd=workdir, env=env, check=True)
+        with open(result_file, encoding="utf-8") as file:
+            return json.load(file)
+
+
+def compare(old: dict, new: dict):
+    """Изменение метрик по объёмам, присутствующим в обоих отчётах"""
+    old_results = {result["volume"]: result for result in old["results"]}
+    print(f"{old['commit']} -> {new['commit']}")
+    for result in new["results"]:
+        previous = old_results.get(result["volume"])
+        if previous is None:
+            continue
+        changes = []
+        for metric in METRICS:
+            before, after = previous[metric], result[metric]
+            change = f"{(after - before) / before * 100:+.0f}%" if before else "n/a"
+            changes.append(f"{metric} {before} -> {after} ({change})")
+        print(f"  {result['volume']}: " + "; ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--volumes", default="10,1000,10000,100000")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.5, help="сек между циклами")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--deliver-max", type=int, default=10_000)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--async-db", action="store_true")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="прошлый JSON-отчёт")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        with open(args.result_file, "w", encoding="utf-8") as file:
+            json.dump(run_volume(args, args.child), file)
+        return
+
+    report = {
+        **_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": (args.database_url or "sqlite").split(":")[0]
+        + ("+asyncpg" if args.async_db else ""),
+        "cycles": args.cycles,
+        "results": [run_child(args, int(volume)) for volume in args.volumes.split(",")],
+    }
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"e2e-{report['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Отчёт: {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(json.load(file), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Бенчмарк FineRecord против штрафов-словарей
+
+На N штрафах (по умолчанию 1M) из JSON в формате API сравниваются:
+- память: список словарей после json.loads против списка FineRecord
+  (словари после разбора освобождены);
+- CPU: разбор при загрузке (FineRecord.from_api, один раз) и то, что
+  раньше повторялось на каждом шаге - строка для INSERT (разбор даты и
+  Decimal из float) и текст уведомления (пять replace, срез даты).
+
+Запуск:
+    python -m benchmarks.bench_fine_record --fines 1000000
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+from benchmarks.common import make_fines
+from bot.notifications import _clean_text
+from bot.records import CENTS, FineRecord
+
+
+def legacy_row(fine: dict) -> dict:
+    """Строка для INSERT из словаря, как было до FineRecord"""
+    return {
+        "seller_id": "default",
+        "id": fine["id"],
+        "date": datetime.fromisoformat(fine["date"].replace("Z", "+00:00")).replace(
+            tzinfo=None
+        ),
+        "type": fine["type"],
+        "amount": Decimal(str(fine["amount"])).quantize(CENTS),
+        "order_id": fine.get("order_id", ""),
+        "status": fine["status"],
+    }
+
+
+def legacy_text(fine: dict) -> str:
+    clean_type = (
+        fine["type"]
+        .replace("*", "")
+        .replace("_", "")
+        .replace("`", "")
+        .replace("[", "")
+        .replace("]", "")
+    )
+    return (
+        f"{fine['amount']} руб - {clean_type}, {fine['date'][:10]}, "
+        f"заказ {fine.get('order_id') or 'не указан'}, {fine['status']}, "
+        f"ID {fine['id']}"
+    )
+
+
+def record_text(fine: FineRecord) -> str:
+    return (
+        f"{fine.amount} руб - {_clean_text(fine.type)}, {fine.date.date()}, "
+        f"заказ {fine.order_id or 'не указан'}, {fine.status}, "
+        f"ID {fine.id}"
+    )
+
+
+def timed(function, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        function(item)
+    return round(time.perf_counter() - started, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--fines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    payload = json.dumps(make_fines(args.fines), ensure_ascii=False)
+
+    # Память: всё, что держит процесс после разбора
+    gc.collect()
+    tracemalloc.start()
+    raw = json.loads(payload)
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    records = [FineRecord.from_api(fine) for fine in raw]
+    del raw
+    gc.collect()
+    record_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+
+    # CPU без tracemalloc
+    raw = json.loads(payload)
+    started = time.perf_counter()
+    records = [FineRecord.from_api(fine) for fine in raw]
+    from_api_s = round(time.perf_counter() - started, 2)
+
+    results = {
+        "fines": args.fines,
+        "memory_mb": {
+            "dict": round(dict_bytes / 2**20, 1),
+            "record": round(record_bytes / 2**20, 1),
+        },
+        "cpu_s": {
+            "from_api": from_api_s,
+            "row_dict": timed(legacy_row, raw),
+            "row_record": timed(lambda fine: fine.as_row("default"), records),
+            "text_dict": timed(legacy_text, raw),
+            "text_record": timed(record_text, records),
+        },
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
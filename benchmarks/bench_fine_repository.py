@@ -0,0 +1,122 @@
+"""
+Бенчмарк сохранения штрафов: save_fine по одному против save_fines_batch
+
+Старый путь на каждый штраф делает SELECT + COMMIT в save_fine,
+ещё SELECT + COMMIT в mark_as_notified и INSERT + COMMIT в
+log_notification. Новый путь: пакетный upsert, пакетные отметки и
+один коммит на цикл. Путь historical - загрузка истории через COPY
+(load_historical, как в bot/backfill.py; в SQLite - тот же пакетный upsert).
+
+Запуск (по умолчанию временная SQLite, для PostgreSQL укажите URL):
+    python -m benchmarks.bench_fine_repository --count 10000
+    python -m benchmarks.bench_fine_repository --database-url postgresql://...
+
+Внимание: таблицы fines и notifications очищаются от строк с префиксом BENCH,
+daily_stats после этого пересчитывается.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+from benchmarks.common import QueryCounter, make_fines
+from bot.records import FineRecord
+from database.models import Base, Fine, Notification
+from database.repository import (
+    FineRepository,
+    NotificationRepository,
+    StatsRepository,
+)
+
+
+def cleanup(engine):
+    with Session(engine) as db:
+        db.execute(delete(Notification).where(Notification.fine_id.like("BENCH_%")))
+        db.execute(delete(Fine).where(Fine.id.like("BENCH_%")))
+        StatsRepository(db).rebuild()
+        db.commit()
+
+
+def run_legacy(engine, fines) -> None:
+    with Session(engine) as db:
+        fine_repo = FineRepository(db)
+        notif_repo = NotificationRepository(db)
+        for fine_data in fines:
+            fine, is_new = fine_repo.save_fine(fine_data)
+            if is_new:
+                fine_repo.mark_as_notified(fine.id)
+                notif_repo.log_notification(fine.id, "telegram", True)
+
+
+def run_batch(engine, fines) -> None:
+    with Session(engine) as db:
+        fine_repo = FineRepository(db)
+        new_ids = fine_repo.save_fines_batch(fines)
+        fine_repo.mark_as_notified_batch(new_ids)
+        NotificationRepository(db).log_notifications(new_ids, "telegram", True)
+        db.commit()
+
+
+def run_historical(engine, fines) -> None:
+    with Session(engine) as db:
+        FineRepository(db).load_historical([FineRecord.from_api(f) for f in fines])
+        db.commit()
+
+
+def measure(engine, name, runner, fines) -> dict:
+    counter = QueryCounter(engine)
+    results = {"path": name, "fines": len(fines)}
+
+    # Первый проход: все штрафы новые; второй: все уже известны
+    for phase in ("insert", "refetch"):
+        counter.count = 0
+        started = time.perf_counter()
+        runner(engine, fines)
+        elapsed = time.perf_counter() - started
+        results[phase] = {
+            "elapsed_s": round(elapsed, 3),
+            "fines_per_s": round(len(fines) / elapsed, 1),
+            "round_trips": counter.count,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmpdir = None
+    url = args.database_url
+    if url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    fines = make_fines(args.count)
+
+    results = []
+    for name, runner in (
+        ("legacy", run_legacy),
+        ("batch", run_batch),
+        ("historical", run_historical),
+    ):
+        cleanup(engine)
+        results.append(measure(engine, name, runner, fines))
+    cleanup(engine)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    engine.dispose()
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Бенчмарк запросов к fines на синтетических данных
+
+В отдельной схеме создаётся исходная схема (миграция 1), заливается
+--rows штрафов за два года, замеряются типовые запросы. Затем
+применяются остальные миграции (партиционирование и индексы), и те же
+запросы замеряются снова. Планы этих запросов (индексы и одна
+партиция на месяц) проверяет tests/test_fines_query_plans.py.
+
+Нужен PostgreSQL (по умолчанию DATABASE_URL из конфигурации):
+    python -m benchmarks.bench_fines_indexes --rows 10000000
+    python -m benchmarks.bench_fines_indexes --rows 200000 --database-url postgresql://...
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, text
+
+from bot.config import config
+from database.migrations import latest_version, migrate
+
+SCHEMA = "bench_fines_indexes"
+RARE_TYPE = "Ошибка в документах"
+
+LOAD_FINES = f"""
+INSERT INTO fines (id, date, type, amount, order_id, status, notified)
+SELECT
+    'IDX_' || g,
+    date_trunc('day', now()) - interval '730 days'
+        + (g::float / :rows) * interval '730 days',
+    CASE WHEN g % 1000 = 0 THEN '{RARE_TYPE}'
+         ELSE (ARRAY['Просрочка поставки', 'Несоответствие упаковки',
+                     'Брак товара', 'Нарушение сроков'])[g % 4 + 1]
+    END,
+    g % 9700 + 300,
+    'ORDER_' || g,
+    (ARRAY['Начислен', 'Оспорен', 'Оплачен'])[g % 3 + 1],
+    g <= :rows - 1000
+FROM generate_series(1, :rows) AS g
+"""
+
+LOAD_NOTIFICATIONS = """
+INSERT INTO notifications (fine_id, channel, status)
+SELECT 'IDX_' || g, 'telegram', 'sent'
+FROM generate_series(10, :rows, 10) AS g
+"""
+
+
+def _month_bounds() -> dict:
+    """Границы позапрошлого полного месяца"""
+    today = date.today()
+    month = today.month - 2
+    year = today.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return {"start": start, "end": end}
+
+
+def queries(rows: int) -> dict:
+    """Проверяемые запросы: (SQL, параметры)"""
+    probe = f"IDX_{rows // 2}"
+    return {
+        "unnotified": ("SELECT * FROM fines WHERE notified = FALSE", {}),
+        "month_range": (
+            "SELECT count(*), sum(amount) FROM fines "
+            "WHERE date >= :start AND date < :end",
+            _month_bounds(),
+        ),
+        "by_type": (
+            "SELECT count(*) FROM fines WHERE type = :type",
+            {"type": RARE_TYPE},
+        ),
+        "by_order_id": (
+            "SELECT * FROM fines WHERE order_id = :order_id",
+            {"order_id": f"ORDER_{rows // 2}"},
+        ),
+        "notifications_by_fine_id": (
+            "SELECT * FROM notifications WHERE fine_id = :fine_id",
+            {"fine_id": probe},
+        ),
+    }
+
+
+def time_queries(engine, rows: int, repeat: int) -> dict:
+    """Медиана времени каждого запроса, мс"""
+    results = {}
+    with engine.connect() as conn:
+        for name, (sql, params) in queries(rows).items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = round(statistics.median(timings), 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    parser.add_argument("--keep", action="store_true", help="не удалять схему")
+    args = parser.parse_args()
+
+    engine = create_engine(
+        args.database_url, connect_args={"options": f"-csearch_path={SCHEMA}"}
+    )
+    if engine.dialect.name != "postgresql":
+        sys.exit("Нужен PostgreSQL")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+
+    report = {"rows": args.rows}
+    try:
+        migrate(engine, target=1)
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text(LOAD_FINES), {"rows": args.rows})
+            conn.execute(text(LOAD_NOTIFICATIONS), {"rows": args.rows})
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(
+                text("ANALYZE")
+            )
+        report["load_s"] = round(time.perf_counter() - started, 1)
+        report["before_ms"] = time_queries(engine, args.rows, args.repeat)
+
+        started = time.perf_counter()
+        migrate(engine)
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(
+                text("ANALYZE")
+            )
+        report["migrate_s"] = round(time.perf_counter() - started, 1)
+        report["schema_version"] = latest_version()
+        report["after_ms"] = time_queries(engine, args.rows, args.repeat)
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
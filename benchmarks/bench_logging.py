@@ -0,0 +1,132 @@
+"""
+Бенчмарк логирования: задержки event loop при большом потоке штрафов
+
+Имитируется цикл опроса крупного кабинета: --fines штрафов пачками по
+--chunk-size, на каждый штраф - строка INFO "Новый штраф" и выключенная
+строка DEBUG, между пачками - ожидание ввода-вывода. Лог пишется в файл
+с ротацией и в stdout (здесь - /dev/null) в режимах:
+- sync: обработчики в потоке event loop (LOG_QUEUE=false);
+- queue: запись в фоновом потоке (QueueHandler + QueueListener);
+- queue_json: то же с LOG_FORMAT=json.
+Для каждого режима - задержки event loop (LoopLagProbe), время вызовов
+логгера в потоке loop и время до записи всего лога на диск.
+Отдельно - цена выключенной строки DEBUG: f-строка против %-стиля.
+
+Запуск:
+    python -m benchmarks.bench_logging --fines 200000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import timeit
+from decimal import Decimal
+
+from benchmarks.common import LoopLagProbe
+from bot import logs
+from bot.config import config
+
+logger = logging.getLogger("bench.logging")
+
+MODES = {
+    "sync": {"LOG_QUEUE": False, "LOG_FORMAT": "text"},
+    "queue": {"LOG_QUEUE": True, "LOG_FORMAT": "text"},
+    "queue_json": {"LOG_QUEUE": True, "LOG_FORMAT": "json"},
+}
+
+
+async def workload(args) -> float:
+    """Цикл с логированием; возвращает время вызовов логгера, сек"""
+    busy = 0.0
+    amount = Decimal("1234.50")
+    for start in range(0, args.fines, args.chunk_size):
+        token = logs.new_cycle_id("bench")
+        started = time.perf_counter()
+        for index in range(start, min(start + args.chunk_size, args.fines)):
+            logger.info("[%s] Новый штраф: %s - %s руб", "bench", "Брак товара", amount)
+            logger.debug("Штраф %s: заказ %s", index, amount)
+        busy += time.perf_counter() - started
+        logs.cycle_id.reset(token)
+        # Ожидание API или БД между пачками
+        await asyncio.sleep(args.io_ms / 1000)
+    return busy
+
+
+async def measure(args) -> dict:
+    probe = LoopLagProbe(interval=0.005)
+    probe.start()
+    started = time.perf_counter()
+    busy = await workload(args)
+    elapsed = time.perf_counter() - started
+    await probe.stop()
+    return {
+        "loop_busy_s": round(busy, 3),
+        "elapsed_s": round(elapsed, 3),
+        **probe.report(),
+    }
+
+
+def run(args, mode: str, workdir: str) -> dict:
+    for name, value in MODES[mode].items():
+        setattr(config, name, value)
+    config.LOG_LEVEL = "INFO"
+    log_file = os.path.join(workdir, f"{mode}.log")
+
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            logs.setup_logging(log_file)
+            result = asyncio.run(measure(args))
+            started = time.perf_counter()
+            # Всё, что осталось в очереди, дописывается на диск
+            logs.stop_logging()
+            result["flush_s"] = round(time.perf_counter() - started, 3)
+        finally:
+            logging.getLogger().handlers.clear()
+            sys.stdout = stdout
+
+    size = sum(
+        os.path.getsize(os.path.join(workdir, name))
+        for name in os.listdir(workdir)
+        if name.startswith(f"{mode}.log")
+    )
+    return {"mode": mode, "log_mb": round(size / 2**20, 1), **result}
+
+
+def disabled_debug_cost(number: int = 200_000) -> dict:
+    """Наносекунд на выключенную строку DEBUG"""
+    logging.getLogger().setLevel(logging.INFO)
+    fine_id, amount = "FINE_000001", Decimal("1234.50")
+    fstring = timeit.timeit(
+        lambda: logger.debug(f"Штраф {fine_id}: {amount} руб"), number=number
+    )
+    lazy = timeit.timeit(
+        lambda: logger.debug("Штраф %s: %s руб", fine_id, amount), number=number
+    )
+    return {
+        "fstring_ns": round(fstring / number * 1e9),
+        "lazy_ns": round(lazy / number * 1e9),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--fines", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--io-ms", type=float, default=5, help="пауза между пачками")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(args, mode, workdir) for mode in MODES]
+    report = {"modes": results, "disabled_debug": disabled_debug_cost()}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Бенчмарк накладных расходов метрик в горячем пути
+
+Сравнивает стоимость вызова для заглушки (METRICS_ENABLED=false) и для
+настоящих метрик: observe, замер через time() и счётчик с метками.
+
+Запуск:
+    python -m benchmarks.bench_metrics --ops 1000000
+"""
+
+import argparse
+import json
+import time
+
+from bot.metrics import NOOP, Counter, Histogram
+
+
+def measure(operation, ops: int) -> float:
+    """Наносекунд на вызов"""
+    started = time.perf_counter()
+    for _ in range(ops):
+        operation()
+    return round((time.perf_counter() - started) / ops * 1e9, 1)
+
+
+def timed(metric):
+    def operation():
+        with metric.time():
+            pass
+
+    return operation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--ops", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    histogram = Histogram("bench_seconds", "bench", ["stage"]).labels(stage="fetch")
+    counter = Counter("bench_total", "bench", ["status"])
+    noop_child = NOOP.labels(stage="fetch")
+
+    results = []
+    for name, metric, labelled in (
+        ("disabled", noop_child, NOOP),
+        ("enabled", histogram, counter),
+    ):
+        results.append(
+            {
+                "mode": name,
+                "baseline_ns": measure(lambda: None, args.ops),
+                "observe_ns": measure(lambda: metric.observe(0.01), args.ops),
+                "time_ns": measure(timed(metric), args.ops),
+                "labels_inc_ns": measure(
+                    lambda: labelled.labels(status=200).inc(), args.ops
+                ),
+            }
+        )
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Симуляция опроса API: фиксированный интервал против адаптивного
+
+Мок-сервер выдаёт штрафы пуассоновским потоком со всплесками
+(MOCK_ARRIVAL_RATE, MOCK_BURST_*), PollingScheduler опрашивает его
+одним кабинетом. Для каждой политики считаются:
+- запросов к API на один обнаруженный штраф;
+- задержка обнаружения: от даты штрафа до ответа API, в котором он
+  впервые появился.
+
+Время сжато: интервалы в секундах вместо десятков секунд.
+    python -m benchmarks.bench_polling --duration 60 --base 2 --min 0.5 --max 8
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+import httpx
+
+from benchmarks.common import percentile, run_server
+from bot.config import config
+from bot.scheduler import CycleResult, PollingScheduler
+from bot.sellers import Seller
+from bot.transport import WBUnavailableError
+from bot.wb_client import AsyncWBClient
+
+
+async def simulate(base_url: str, args, min_interval: float, max_interval: float):
+    config.POLL_MIN_INTERVAL = min_interval
+    config.POLL_MAX_INTERVAL = max_interval
+    client = AsyncWBClient(base_url=base_url)
+    seller = Seller("sim", "sim", "", ("0",), args.base)
+
+    calls = 0
+    latencies = {}
+    cursor = None
+
+    async def poll(seller: Seller) -> CycleResult:
+        nonlocal calls, cursor
+        calls += 1
+        date_from = cursor - timedelta(seconds=1) if cursor else None
+        try:
+            fines = await client.get_fines(days_back=1, date_from=date_from)
+        except WBUnavailableError as e:
+            return CycleResult(error="unavailable", retry_after=e.retry_after)
+
+        seen_at = time.time()
+        new = 0
+        for fine in fines:
+            cursor = max(cursor, fine.date) if cursor else fine.date
+            if fine.id not in latencies:
+                latencies[fine.id] = seen_at - fine.date.timestamp()
+                new += 1
+        return CycleResult(fetched=len(fines), new=new)
+
+    async def load_sellers():
+        return [seller]
+
+    scheduler = PollingScheduler(
+        poll, load_sellers, concurrency=1, reload_interval=args.duration * 2
+    )
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(args.duration)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await client.aclose()
+    return calls, list(latencies.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--base", type=float, default=2, help="check_interval")
+    parser.add_argument("--min", type=float, default=0.5)
+    parser.add_argument("--max", type=float, default=8)
+    parser.add_argument("--rate", type=float, default=0.02, help="штрафов/сек")
+    parser.add_argument("--burst-rate", type=float, default=2)
+    parser.add_argument("--burst-every", type=float, default=30)
+    parser.add_argument("--burst-duration", type=float, default=5)
+    args = parser.parse_args()
+
+    env = {
+        "MOCK_ARRIVAL_RATE": str(args.rate),
+        "MOCK_BURST_RATE": str(args.burst_rate),
+        "MOCK_BURST_EVERY": str(args.burst_every),
+        "MOCK_BURST_DURATION": str(args.burst_duration),
+    }
+    results = []
+    for policy, bounds in (
+        ("fixed", (args.base, args.base)),
+        ("adaptive", (args.min, args.max)),
+    ):
+        # Свежий сервер на каждую политику: поток штрафов начинается заново
+        with run_server("mock_server.main:app", env=env) as base_url:
+            calls, latencies = asyncio.run(simulate(base_url, args, *bounds))
+            generated = len(httpx.get(f"{base_url}/api/v3/fines").json()["data"])
+
+        detected = len(latencies)
+        results.append(
+            {
+                "policy": policy,
+                "bounds_s": bounds,
+                "api_calls": calls,
+                "generated": generated,
+                "detected": detected,
+                "calls_per_fine": round(calls / detected, 2) if detected else None,
+                "latency_s": {
+                    "p50": round(percentile(latencies, 50), 2),
+                    "p95": round(percentile(latencies, 95), 2),
+                    "max": round(max(latencies, default=0.0), 2),
+                },
+            }
+        )
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Бенчмарк нескольких копий бота (SHARDING=true)
+
+Для каждого числа копий из --replicas в отдельной схеме PostgreSQL
+заводятся --sellers кабинетов, у каждого в моке WB свой набор из --fines
+штрафов (разные ключи API). Запускаются копии python -m bot.main, и
+замеряется время, за которое все штрафы попадают в БД. Затем одна копия
+убивается (SIGKILL), и замеряется, через сколько её кабинеты снова
+опрашиваются живыми копиями. В конце проверяется, что уведомление о
+каждом штрафе поставлено ровно один раз.
+
+Нужен PostgreSQL (по умолчанию DATABASE_URL из конфигурации); мок WB
+занимает порт 8000:
+    python -m benchmarks.bench_replicas --replicas 1,2,4 --sellers 20
+    python -m benchmarks.bench_replicas --database-url postgresql://...
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.common import ROOT, run_server
+from bot.config import config
+from database.migrations import migrate
+
+SCHEMA = "bench_replicas"
+
+COUNTS = {
+    "fines": "SELECT count(*) FROM fines",
+    "duplicates": """
+        SELECT count(*) FROM (
+            SELECT 1 FROM notifications
+            GROUP BY seller_id, fine_id, chat_id HAVING count(*) > 1
+        ) AS duplicated
+    """,
+    "notifications": "SELECT count(*) FROM notifications",
+}
+
+
+def _schema_url(url: str) -> str:
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}options={quote(f'-csearch_path={SCHEMA}')}"
+
+
+def prepare(engine, sellers: int):
+    """Пустая схема с кабинетами BENCH_*"""
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    migrate(engine)
+    with engine.begin() as conn:
+        for index in range(sellers):
+            conn.execute(
+                text(
+                    "INSERT INTO seller_accounts (id, name, api_key, chat_ids, "
+                    "check_interval, enabled) "
+                    "VALUES (:id, :id, :key, '42', 1, TRUE)"
+                ),
+                {"id": f"BENCH_{index:03d}", "key": f"KEY_{index}"},
+            )
+
+
+def count(engine, name: str) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text(COUNTS[name])).scalar()
+
+
+def wait_for(predicate, timeout: float) -> float:
+    """Секунд до выполнения условия (timeout, если не дождались)"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if predicate():
+            return time.perf_counter() - started
+        time.sleep(0.2)
+    return timeout
+
+
+def start_replica(index: int, env: dict, workdir: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "bot.main"],
+        cwd=workdir,
+        env={**env, "REPLICA_ID": f"replica-{index}"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def run(engine, args, replicas: int, tg_url: str) -> dict:
+    prepare(engine, args.sellers)
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "APP_MODE": "MOCK",
+        "DB_URL": _schema_url(args.database_url),
+        # statement_timeout передаётся в options и заменил бы search_path
+        "DB_STATEMENT_TIMEOUT": "0",
+        "SHARDING": "true",
+        "REPLICA_HEARTBEAT": str(args.heartbeat),
+        "REPLICA_TTL": str(args.heartbeat * 3),
+        "POLL_MIN_INTERVAL": "0.5",
+        "POLL_MAX_INTERVAL": "2",
+        "TELEGRAM_BOT_TOKEN": "1:BENCH",
+        "TELEGRAM_CHAT_ID": "42",
+        "TELEGRAM_API_URL": f"{tg_url}/bot",
+        "NOTIFY_MODE": "digest",
+        "LOG_LEVEL": "WARNING",
+    }
+    expected = args.sellers * args.fines
+    with tempfile.TemporaryDirectory() as workdir:
+        processes = [start_replica(index, env, workdir) for index in range(replicas)]
+        try:
+            load_s = wait_for(lambda: count(engine, "fines") >= expected, args.timeout)
+            result = {
+                "replicas": replicas,
+                "fines": count(engine, "fines"),
+                "load_s": round(load_s, 1),
+                "fines_per_s": round(expected / load_s),
+            }
+
+            if replicas > 1:
+                # Кабинеты убитой копии должны снова опрашиваться: новые
+                # штрафы (MOCK_DATASET_GROW) появляются у всех кабинетов
+                processes[0].send_signal(signal.SIGKILL)
+                killed_at = time.perf_counter()
+                time.sleep(args.heartbeat)
+                result["rebalance_s"] = round(
+                    wait_for(lambda: _all_polled(engine, killed_at), args.timeout)
+                    + args.heartbeat,
+                    1,
+                )
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=30)
+
+    result["notifications"] = count(engine, "notifications")
+    result["duplicate_notifications"] = count(engine, "duplicates")
+    return result
+
+
+def _all_polled(engine, since: float) -> bool:
+    """Все кабинеты под арендой живых копий и курсоры сдвинулись после since"""
+    with engine.connect() as conn:
+        stale = conn.execute(
+            text(
+                "SELECT count(*) FROM seller_accounts s "
+                "LEFT JOIN poll_leases l ON l.seller_id = s.id "
+                "LEFT JOIN bot_replicas r ON r.id = l.owner "
+                "WHERE r.id IS NULL OR l.owner = 'replica-0' "
+                "   OR l.expires_at < now() AT TIME ZONE 'utc'"
+            )
+        ).scalar()
+    return stale == 0 and time.perf_counter() > since
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--replicas", default="1,2,4")
+    parser.add_argument("--sellers", type=int, default=20)
+    parser.add_argument("--fines", type=int, default=20_000, help="на кабинет")
+    parser.add_argument("--heartbeat", type=float, default=2)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        args.database_url, connect_args={"options": f"-csearch_path={SCHEMA}"}
+    )
+    if engine.dialect.name != "postgresql":
+        sys.exit("Нужен PostgreSQL")
+
+    wb_env = {
+        "MOCK_DATASET_SIZE": str(args.fines),
+        "MOCK_DATASET_STEP": str(min(1.0, 80_000 / args.fines)),
+        "MOCK_DATASET_GROW": "true",
+    }
+    tg_env = {
+        "MOCK_TG_LATENCY_MS": "0",
+        "MOCK_TG_CHAT_RATE": "10000",
+        "MOCK_TG_CHAT_BURST": "10000",
+        "MOCK_TG_GLOBAL_RATE": "10000",
+    }
+    results = []
+    try:
+        with run_server("mock_server.telegram:app", env=tg_env) as tg_url:
+            for replicas in args.replicas.split(","):
+                # Новый мок на каждый прогон: набор снова заканчивается "сейчас"
+                with run_server("mock_server.main:app", env=wb_env, port=8000):
+                    results.append(run(engine, args, int(replicas), tg_url))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
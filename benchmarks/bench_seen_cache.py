@@ -0,0 +1,128 @@
+"""
+Бенчмарк кэша известных штрафов (SeenFineCache)
+
+Цикл опроса повторяется --cycles раз: в каждом ответе API окно из
+--window уже известных штрафов, --new новых и --changed штрафов со
+сменившимся статусом. Сравниваются:
+- no_cache: каждый штраф ответа проверяется в БД (save_fines_batch);
+- cache: в БД уходят только промахи кэша;
+- restart: кэш создаётся заново и прогревается из БД (get_recent), как
+  после перезапуска бота.
+Для каждого варианта - SQL-запросов и время на цикл, число новых штрафов
+(должно совпадать во всех вариантах).
+
+Запуск (по умолчанию временная SQLite, для PostgreSQL укажите URL):
+    python -m benchmarks.bench_seen_cache --window 5000 --cycles 20
+    python -m benchmarks.bench_seen_cache --database-url postgresql://...
+
+Внимание: из таблицы fines удаляются строки с префиксом BENCH,
+daily_stats после этого пересчитывается.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+from benchmarks.common import QueryCounter, make_fines, percentile
+from bot.records import FineRecord
+from bot.seen_cache import SeenFineCache
+from database.models import Base, Fine
+from database.repository import FineRepository, StatsRepository
+
+
+def cleanup(engine):
+    with Session(engine) as db:
+        db.execute(delete(Fine).where(Fine.id.like("BENCH_%")))
+        StatsRepository(db).rebuild()
+        db.commit()
+
+
+def cycles(args):
+    """Ответы API по циклам: скользящее окно, новые и изменившиеся штрафы"""
+    total = args.window + args.new * args.cycles
+    fines = [FineRecord.from_api(fine) for fine in make_fines(total)]
+    fines.sort(key=lambda fine: fine.date)
+    for cycle in range(args.cycles):
+        start = args.new * cycle
+        response = fines[start : start + args.window + args.new]
+        for index in range(args.changed):
+            fine = response[index * 7 % len(response)]
+            response[index * 7 % len(response)] = FineRecord(
+                fine.id,
+                fine.date,
+                fine.type,
+                fine.amount,
+                fine.order_id,
+                f"Статус {cycle}",
+            )
+        yield response
+
+
+def run(engine, args, mode: str) -> dict:
+    cleanup(engine)
+    counter = QueryCounter(engine)
+    cache = SeenFineCache("bench", args.window * 2, ttl=3600)
+    responses = list(cycles(args))
+
+    # Первый ответ сохраняется до замера: окно уже в БД
+    with Session(engine) as db:
+        FineRepository(db).save_fines_batch(responses[0])
+        db.commit()
+    if mode == "cache":
+        cache.remember(responses[0])
+    elif mode == "restart":
+        since = min(fine.date for fine in responses[1]) - timedelta(minutes=10)
+        with Session(engine) as db:
+            cache.load(FineRepository(db).get_recent(since, cache.max_size))
+
+    counter.count = 0
+    durations, new_count = [], 0
+    for response in responses[1:]:
+        started = time.perf_counter()
+        unseen = response if mode == "no_cache" else cache.unseen(response)
+        with Session(engine) as db:
+            new_count += len(FineRepository(db).save_fines_batch(unseen))
+            db.commit()
+        cache.remember(unseen)
+        durations.append(time.perf_counter() - started)
+
+    measured = len(responses) - 1
+    return {
+        "mode": mode,
+        "new_fines": new_count,
+        "queries_per_cycle": round(counter.count / measured, 1),
+        "cycle_ms_p50": round(percentile(durations, 50) * 1000, 1),
+        "cache_hits": cache.hits,
+        "cache_misses": cache.misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--window", type=int, default=5000)
+    parser.add_argument("--new", type=int, default=10)
+    parser.add_argument("--changed", type=int, default=5)
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+
+    results = [run(engine, args, mode) for mode in ("no_cache", "cache", "restart")]
+    cleanup(engine)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
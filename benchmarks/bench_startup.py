@@ -0,0 +1,192 @@
+"""
+Бенчмарк запуска бота: импорт bot.main и проверки подключений
+
+imports: python -X importtime -c "import bot.main" в отдельном процессе
+--repeat раз. В отчёте медиана общего времени импорта, самые тяжёлые
+пакеты и цена отложенных модулей (telegram, requests, sqlalchemy),
+которые при импорте загружаться не должны. Выход с кодом 1, если отложенный модуль
+всё же загружен или импорт дольше --max-import-ms: так профиль проверяется
+в CI.
+
+checks: время до начала опроса при перезапуске (схема БД уже актуальна)
+против мок-серверов WB и Telegram с задержкой --latency-ms:
+- sequential: БД, затем WB, затем Telegram (как было);
+- concurrent: все три проверки одновременно (WBFineBot.startup_checks);
+- fast_start: FAST_START=true, ждём только БД.
+
+Запуск (по умолчанию временная SQLite, для PostgreSQL укажите URL):
+    python -m benchmarks.bench_startup --max-import-ms 400
+    python -m benchmarks.bench_startup --database-url postgresql://...
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.common import ROOT, run_server
+
+# Модули, которые bot.main загружает только при первом использовании
+DEFERRED_MODULES = (
+    "telegram",
+    "requests",
+    "sqlalchemy",
+    "fastapi",
+    "uvicorn",
+    "asyncpg",
+)
+
+
+def import_profile(module: str) -> dict:
+    """Один запуск -X importtime: {модуль: (своё время, суммарное), мкс}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:") :].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # заголовок таблицы
+        profile[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return profile
+
+
+def measure_imports(args) -> dict:
+    totals, packages, loaded = [], defaultdict(list), set()
+    for _ in range(args.repeat):
+        profile = import_profile("bot.main")
+        totals.append(profile["bot.main"][1] / 1000)
+        by_package = defaultdict(int)
+        for name, (own, _) in profile.items():
+            by_package[name.split(".")[0]] += own
+        for package, own in by_package.items():
+            packages[package].append(own / 1000)
+        loaded.update(
+            name
+            for name in profile
+            if name.split(".")[0] in DEFERRED_MODULES or name in DEFERRED_MODULES
+        )
+
+    heaviest = sorted(
+        ((package, statistics.median(times)) for package, times in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+    # Сколько стоит догрузить их после bot.main (общие зависимости уже есть)
+    profile = import_profile("bot.main, telegram.request, requests, sqlalchemy.orm")
+    deferred = {
+        module: round(profile[module][1] / 1000, 1)
+        for module in ("telegram", "requests", "sqlalchemy")
+    }
+    return {
+        "import_ms_p50": round(statistics.median(totals), 1),
+        "import_ms_max": round(max(totals), 1),
+        "heaviest_packages_ms": {name: round(ms, 1) for name, ms in heaviest},
+        "deferred_modules_ms": deferred,
+        "deferred_loaded": sorted({name.split(".")[0] for name in loaded}),
+    }
+
+
+async def startup(mode: str, wb_url: str) -> float:
+    """Время до готовности к опросу, мс"""
+    from bot.config import config
+    from bot.main import WBFineBot
+    from database.models import dispose_engines
+
+    config.FAST_START = mode == "fast_start"
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = WBFineBot()
+    bot.wb_client.base_url = wb_url
+    started = time.perf_counter()
+    if mode == "sequential":
+        await bot._init_db()
+        await bot.wb_client.test_connection()
+        await bot.notifier.check()
+        background = None
+    else:
+        _, background = await bot.startup_checks()
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if background is not None:
+        await background
+    await bot.wb_client.aclose()
+    await bot.notifier.bot.shutdown()
+    await dispose_engines()
+    return elapsed
+
+
+def measure_checks(args) -> list:
+    from bot.config import config
+    from database.models import init_db
+
+    latency = {"MOCK_LATENCY_MS": str(args.latency_ms)}
+    tg_latency = {"MOCK_TG_LATENCY_MS": str(args.latency_ms)}
+    with run_server("mock_server.main:app", env=latency) as wb_url, run_server(
+        "mock_server.telegram:app", env=tg_latency
+    ) as tg_url:
+        config.DB_URL = args.database_url or "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "startup.db"
+        )
+        config.TELEGRAM_BOT_TOKEN = "1:BENCH"
+        config.TELEGRAM_CHAT_ID = "42"
+        config.TELEGRAM_API_URL = f"{tg_url}/bot"
+        # Перезапуск: схема уже создана предыдущим запуском
+        init_db()
+
+        results = []
+        for mode in ("sequential", "concurrent", "fast_start"):
+            durations = [asyncio.run(startup(mode, wb_url)) for _ in range(args.repeat)]
+            results.append(
+                {
+                    "mode": mode,
+                    "ready_ms_p50": round(statistics.median(durations), 1),
+                    "ready_ms_max": round(max(durations), 1),
+                }
+            )
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--latency-ms", type=int, default=100, help="WB и Telegram")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--imports-only", action="store_true")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    report = {"imports": measure_imports(args)}
+    if not args.imports_only:
+        report["checks"] = measure_checks(args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    imports = report["imports"]
+    failures = []
+    if imports["deferred_loaded"]:
+        failures.append(f"при импорте загружены: {imports['deferred_loaded']}")
+    if args.max_import_ms and imports["import_ms_p50"] > args.max_import_ms:
+        failures.append(
+            f"импорт {imports['import_ms_p50']} мс > {args.max_import_ms} мс"
+        )
+    if failures:
+        print("❌ " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
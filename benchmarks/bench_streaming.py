@@ -0,0 +1,84 @@
+"""
+Бенчмарк памяти при загрузке большого ответа со штрафами
+
+Мок-сервер отдаёт MOCK_DATASET_SIZE штрафов. Сравниваются:
+- json: get_fines - тело целиком, response.json(), весь список в памяти;
+- stream: iter_fines одной страницей - потоковый разбор;
+- stream+pages: iter_fines страницами по --page-size.
+Потребитель, как check_fines, забирает штрафы пачками по --chunk-size
+(без БД, чтобы замер касался только загрузки). Пик памяти - tracemalloc.
+
+Запуск:
+    python -m benchmarks.bench_streaming --fines 200000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from benchmarks.common import run_server
+from bot.streaming import achunks
+from bot.wb_client import AsyncWBClient
+
+
+async def consume(client: AsyncWBClient, mode: str, args) -> int:
+    if mode == "json":
+        fines = await client.get_fines(days_back=1)
+        for start in range(0, len(fines), args.chunk_size):
+            fines[start : start + args.chunk_size]
+        return len(fines)
+
+    page_size = args.fines if mode == "stream" else args.page_size
+    count = 0
+    async for chunk in achunks(
+        client.iter_fines(days_back=1, page_size=page_size), args.chunk_size
+    ):
+        count += len(chunk)
+    return count
+
+
+async def bench(base_url: str, mode: str, args) -> dict:
+    client = AsyncWBClient(base_url=base_url)
+    await client.test_connection()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = await consume(client, mode, args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await client.aclose()
+    return {
+        "mode": mode,
+        "fines": count,
+        "elapsed_s": round(elapsed, 2),
+        "fines_per_s": round(count / elapsed),
+        "peak_mb": round(peak / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--fines", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Весь набор укладывается в сутки, которые запрашивает days_back=1
+    env = {
+        "MOCK_DATASET_SIZE": str(args.fines),
+        "MOCK_DATASET_STEP": str(80_000 / args.fines),
+    }
+    results = []
+    with run_server("mock_server.main:app", env=env) as base_url:
+        for mode in ("json", "stream", "stream+pages"):
+            results.append(asyncio.run(bench(base_url, mode, args)))
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Бенчмарк отправки уведомлений: последовательная отправка против очереди
+
+Поднимает mock_server/telegram.py (эмуляция Bot API с флуд-контролем) и
+отправляет пачку уведомлений о штрафах в несколько чатов:
+- legacy: await send_message по одному, при любой ошибке повтор
+  «простым текстом» (как было в TelegramNotifier раньше);
+- queue: TelegramNotifier с очередью, воркерами и token bucket.
+
+Запуск:
+    python -m benchmarks.bench_telegram_dispatch --messages 200 --chats 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from telegram import Bot
+from telegram.error import TelegramError
+
+from benchmarks.common import make_fines, run_server
+from bot.config import config
+from bot.notifications import TelegramNotifier
+from bot.records import FineRecord
+
+TOKEN = "123456:BENCH"
+
+
+async def bench_legacy(base_url: str, fines: list, chats: list) -> dict:
+    bot = Bot(token=TOKEN, base_url=f"{base_url}/bot")
+    notifier = TelegramNotifier()
+    delivered = 0
+
+    started = time.perf_counter()
+    for i, fine in enumerate(fines):
+        chat_id = chats[i % len(chats)]
+        try:
+            await bot.send_message(chat_id=chat_id, text=notifier._format_message(fine))
+            delivered += 1
+        except TelegramError:
+            try:
+                await bot.send_message(
+                    chat_id=chat_id, text=notifier._format_simple(fine)
+                )
+                delivered += 1
+            except TelegramError:
+                pass
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+    return {"mode": "legacy", "delivered": delivered, "elapsed_s": elapsed}
+
+
+async def bench_queue(base_url: str, fines: list, chats: list) -> dict:
+    notifier = TelegramNotifier()
+    await notifier.start()
+
+    started = time.perf_counter()
+    futures = [
+        await notifier.submit(
+            notifier._format_message(fine),
+            notifier._format_simple(fine),
+            chat_id=chats[i % len(chats)],
+        )
+        for i, fine in enumerate(fines)
+    ]
+    enqueue_elapsed = time.perf_counter() - started
+    results = await asyncio.gather(*futures)
+    elapsed = time.perf_counter() - started
+
+    await notifier.stop()
+    return {
+        "mode": f"queue (workers={config.TELEGRAM_WORKERS})",
+        "delivered": sum(results),
+        "elapsed_s": elapsed,
+        "enqueue_s": round(enqueue_elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=config.TELEGRAM_WORKERS)
+    parser.add_argument("--latency-ms", type=int, default=120)
+    args = parser.parse_args()
+
+    fines = [FineRecord.from_api(fine) for fine in make_fines(args.messages)]
+    chats = [str(100000 + i) for i in range(args.chats)]
+    env = {"MOCK_TG_LATENCY_MS": str(args.latency_ms)}
+
+    results = []
+    with run_server("mock_server.telegram:app", env=env) as base_url:
+        config.TELEGRAM_BOT_TOKEN = TOKEN
+        config.TELEGRAM_API_URL = f"{base_url}/bot"
+        config.TELEGRAM_WORKERS = args.workers
+
+        for bench in (bench_legacy, bench_queue):
+            httpx.post(f"{base_url}/stats/reset")
+            result = asyncio.run(bench(base_url, fines, chats))
+            server = httpx.get(f"{base_url}/stats").json()
+            result.update(
+                {
+                    "elapsed_s": round(result["elapsed_s"], 3),
+                    "messages_per_s": round(
+                        result["delivered"] / result["elapsed_s"], 1
+                    ),
+                    "http_requests": server["requests"],
+                    "rate_limited_429": server["rate_limited"],
+                }
+            )
+            results.append(result)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Бенчмарк устойчивости клиента WB на мок-сервере со сбоями
+
+Сценарии (knobs мок-сервера, POST /mock/faults):
+- errors: 30% ответов 503 - доля успешных запросов без повторов и с ними;
+- outage: WB лежит целиком - сколько запросов доходит до сервера без
+  circuit breaker и с ним;
+- tail: 10% ответов медленные - задержка p95/p99 без hedging и с ним;
+- rate_limit: 50% ответов 429 (Retry-After: 0) - доля успешных запросов.
+
+Запуск:
+    python -m benchmarks.bench_transport --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import percentile, run_server
+from bot.transport import CircuitBreaker, ResilientTransport, WBTransportError
+from bot.wb_client import AsyncWBClient
+
+
+def set_faults(base_url: str, **faults) -> None:
+    httpx.post(f"{base_url}/mock/faults/reset")
+    httpx.post(f"{base_url}/mock/faults", json=faults)
+
+
+def server_requests(base_url: str) -> int:
+    return httpx.get(f"{base_url}/mock/faults").json()["stats"]["requests"]
+
+
+async def run(base_url: str, transport: ResilientTransport, requests_count: int):
+    """Последовательные запросы штрафов: успехи, ошибки и задержки"""
+    client = AsyncWBClient(base_url=base_url, transport=transport)
+    ok, errors, latencies = 0, {}, []
+    for _ in range(requests_count):
+        started = time.perf_counter()
+        try:
+            await client.get_fines(days_back=1)
+            ok += 1
+            latencies.append(time.perf_counter() - started)
+        except WBTransportError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+    await client.aclose()
+    return {
+        "ok": ok,
+        "errors": errors,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+        },
+    }
+
+
+def transport(**options) -> ResilientTransport:
+    breaker = CircuitBreaker(
+        threshold=options.pop("threshold", 1_000_000),
+        reset_timeout=options.pop("reset_timeout", 30),
+    )
+    options.setdefault("backoff_base", 0.01)
+    options.setdefault("backoff_cap", 0.1)
+    options.setdefault("hedge_after", 0)
+    return ResilientTransport(breaker=breaker, **options)
+
+
+def scenario(base_url: str, name: str, faults: dict, variants: dict, count: int):
+    results = []
+    for variant, options in variants.items():
+        set_faults(base_url, **faults)
+        result = asyncio.run(run(base_url, transport(**options), count))
+        result.update(
+            scenario=name, variant=variant, server_requests=server_requests(base_url)
+        )
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    count = args.requests
+
+    results = []
+    with run_server("mock_server.main:app") as base_url:
+        results += scenario(
+            base_url,
+            "errors",
+            {"error_rate": 0.3},
+            {"no_retry": {"max_attempts": 1}, "retry": {"max_attempts": 4}},
+            count,
+        )
+        results += scenario(
+            base_url,
+            "outage",
+            {"outage": True},
+            {
+                "retry": {"max_attempts": 3},
+                "retry+breaker": {"max_attempts": 3, "threshold": 5},
+            },
+            count,
+        )
+        results += scenario(
+            base_url,
+            "tail",
+            {"slow_rate": 0.1, "slow_ms": 500},
+            {"plain": {"max_attempts": 1}, "hedged": {"hedge_after": 0.05}},
+            count,
+        )
+        results += scenario(
+            base_url,
+            "rate_limit",
+            {"rate_limit_rate": 0.5, "retry_after": 0},
+            {"no_retry": {"max_attempts": 1}, "retry": {"max_attempts": 4}},
+            count,
+        )
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Бенчмарк клиента WB: блокирующий WBClient против AsyncWBClient
+
+Запускает мок-сервер с искусственной задержкой и измеряет:
+- отзывчивость event loop (задержка фонового тикера) во время загрузки;
+- пропускную способность (запросов штрафов в секунду).
+
+Запуск:
+    python -m benchmarks.bench_wb_client --latency-ms 200 --requests 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import LoopLagProbe, run_server
+from bot.wb_client import AsyncWBClient, WBClient
+
+
+async def bench_sync(base_url: str, requests_count: int) -> dict:
+    """Старый путь: requests.get прямо из корутины, последовательно"""
+    client = WBClient(base_url=base_url)
+    probe = LoopLagProbe()
+    probe.start()
+
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        client.get_fines(days_back=1)
+        # Как в check_fines: между запросами есть точки переключения
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    await probe.stop()
+    return {
+        "mode": "sync",
+        "requests": requests_count,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests_count / elapsed, 1),
+        "loop_lag": probe.report(),
+    }
+
+
+async def bench_async(base_url: str, requests_count: int, concurrency: int) -> dict:
+    """Новый путь: AsyncWBClient с пулом keep-alive соединений"""
+    client = AsyncWBClient(base_url=base_url)
+    semaphore = asyncio.Semaphore(concurrency)
+    probe = LoopLagProbe()
+    probe.start()
+
+    async def fetch():
+        async with semaphore:
+            await client.get_fines(days_back=1)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(fetch() for _ in range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    await probe.stop()
+    await client.aclose()
+    return {
+        "mode": f"async (concurrency={concurrency})",
+        "requests": requests_count,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests_count / elapsed, 1),
+        "loop_lag": probe.report(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    env = {"MOCK_LATENCY_MS": str(args.latency_ms)}
+    with run_server("mock_server.main:app", env=env) as base_url:
+        results = [
+            asyncio.run(bench_sync(base_url, args.requests)),
+            asyncio.run(bench_async(base_url, args.requests, 1)),
+            asyncio.run(bench_async(base_url, args.requests, args.concurrency)),
+        ]
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Общие утилиты для бенчмарков"""
+
+import asyncio
+import contextlib
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+FINE_TYPES = [
+    "Просрочка поставки",
+    "Несоответствие упаковки",
+    "Брак товара",
+    "Нарушение сроков",
+    "Ошибка в документах",
+]
+STATUSES = ["Начислен", "Оспорен", "Оплачен"]
+
+
+def make_fines(count: int, seed: int = 42, prefix: str = "BENCH") -> list:
+    """Синтетические штрафы в формате ответа API WB"""
+    rnd = random.Random(seed)
+    now = datetime(2026, 1, 31, 12, 0, 0)
+    return [
+        {
+            "id": f"{prefix}_{i:09d}",
+            "date": (now - timedelta(seconds=rnd.randint(0, 86400))).isoformat(),
+            "type": rnd.choice(FINE_TYPES),
+            "amount": round(rnd.uniform(300, 10000), 2),
+            "order_id": f"ORDER_{rnd.randint(100000, 999999)}",
+            "status": rnd.choice(STATUSES),
+        }
+        for i in range(count)
+    ]
+
+
+class QueryCounter:
+    """Подсчёт SQL-запросов (round trips) через события SQLAlchemy"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+def free_port() -> int:
+    """Свободный локальный порт"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_server(app: str, env: dict = None, port: int = None):
+    """
+    Запуск ASGI-приложения (uvicorn) в отдельном процессе
+
+    Args:
+        app: путь вида "mock_server.main:app"
+        env: дополнительные переменные окружения
+        port: порт (по умолчанию свободный)
+
+    Yields:
+        базовый URL сервера
+    """
+    port = port or free_port()
+    proc_env = {**os.environ, **(env or {})}
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            app,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=proc_env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                httpx.get(f"{base_url}/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError(f"Сервер {app} не запустился")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def percentile(values, q: float) -> float:
+    """Перцентиль (nearest-rank) по списку значений"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LoopLagProbe:
+    """
+    Замер отзывчивости event loop
+
+    Фоновая задача просыпается каждые interval секунд и фиксирует,
+    насколько позже запланированного она получила управление.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+    def report(self) -> dict:
+        return {
+            "max_ms": round(max(self.lags, default=0.0) * 1000, 2),
+            "p99_ms": round(percentile(self.lags, 99) * 1000, 2),
+            "samples": len(self.lags),
+        }
@@ -0,0 +1,269 @@
+"""
+Историческая загрузка штрафов кабинета (backfill)
+
+Период [--from, --to) делится на окна по BACKFILL_WINDOW_HOURS часов,
+окна загружаются параллельно (BACKFILL_WORKERS), начиная с последних.
+Все запросы к WB, включая повторы, проходят через общий token bucket
+(BACKFILL_RATE запросов в секунду). Окно читается потоком и
+загружается пачками по FETCH_CHUNK_SIZE через COPY.
+
+Загруженное окно записывается в backfill_windows, поэтому после
+прерывания повторный запуск продолжает с незагруженных окон; повторная
+загрузка окна ничего не дублирует. Уведомлений по историческим штрафам
+нет: строки сразу notified, в outbox ничего не ставится. Курсор опроса
+бота не меняется, backfill можно запускать рядом с работающим ботом.
+
+Запуск:
+    python -m bot.backfill shop1 --from 2025-10-01 --to 2026-01-01
+    python -m bot.backfill default --from 2025-12-01 --workers 8 --rate 2
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from bot.config import config
+from bot.logs import setup_logging
+from bot.ratelimit import TokenBucket
+from bot.records import FineRecord
+from bot.sellers import Seller, get_seller
+from bot.streaming import achunks
+from bot.transport import WBTransportError, WBUnavailableError
+from bot.wb_client import AsyncWBClient
+from database.migrations import ensure_fine_partitions
+from database.models import (
+    SessionLocal,
+    dispose_engines,
+    get_engine,
+    init_db,
+    run_db,
+)
+from database.repository import BackfillRepository, FineRepository
+
+logger = logging.getLogger(__name__)
+
+# Окно загрузки: [начало, конец)
+Window = Tuple[datetime, datetime]
+
+# Попыток загрузить окно при временной недоступности WB
+WINDOW_ATTEMPTS = 3
+
+
+def split_windows(start: datetime, end: datetime, size: timedelta) -> List[Window]:
+    """Окна размером size, покрывающие [start, end), от последнего к первому"""
+    windows = []
+    while start < end:
+        windows.append((start, min(start + size, end)))
+        start += size
+    return windows[::-1]
+
+
+@dataclass
+class BackfillResult:
+    """Итог загрузки"""
+
+    windows: int = 0  # загружено окон
+    skipped: int = 0  # уже были загружены раньше
+    failed: int = 0  # не загрузились, будут повторены при следующем запуске
+    fines: int = 0  # добавлено штрафов
+
+
+class Backfill:
+    """Параллельная загрузка окон одного кабинета"""
+
+    def __init__(self, seller: Seller, client: AsyncWBClient, workers: int):
+        self.seller = seller
+        self.client = client
+        self.workers = workers
+        self._attempts: Dict[Window, int] = {}
+
+    # COPY работает только с синхронным драйвером (psycopg2), поэтому
+    # все транзакции backfill - в обычной сессии даже при DB_ASYNC
+    async def _run_db(self, fn, *args):
+        return await run_db(fn, *args, session_factory=SessionLocal)
+
+    def _finished(self, db: Session, start: datetime, end: datetime) -> Set[Window]:
+        return set(BackfillRepository(db, self.seller.id).get_finished(start, end))
+
+    def _load_chunk(self, db: Session, fines: List[FineRecord]) -> int:
+        return FineRepository(db, self.seller.id).load_historical(fines)
+
+    def _finish(self, db: Session, window: Window, fines_count: int):
+        BackfillRepository(db, self.seller.id).finish(*window, fines_count)
+
+    async def _load_window(self, window: Window) -> int:
+        """Загрузка одного окна; возвращает число добавленных штрафов"""
+        added = 0
+        fines = self.client.iter_fines(
+            date_from=window[0], date_to=window[1], api_key=self.seller.api_key
+        )
+        async for chunk in achunks(fines, config.FETCH_CHUNK_SIZE):
+            added += await self._run_db(self._load_chunk, chunk)
+        await self._run_db(self._finish, window, added)
+        return added
+
+    async def _worker(self, queue: asyncio.Queue, result: BackfillResult, total: int):
+        while not queue.empty():
+            window = queue.get_nowait()
+            start, end = window
+            try:
+                added = await self._load_window(window)
+            except WBTransportError as e:
+                attempts = self._attempts[window] = self._attempts.get(window, 0) + 1
+                if isinstance(e, WBUnavailableError) and attempts < WINDOW_ATTEMPTS:
+                    # WB временно недоступен (429, разомкнут breaker): окно
+                    # возвращается в очередь после паузы
+                    logger.warning("[%s] %s, окно будет повторено", self.seller.id, e)
+                    await asyncio.sleep(e.retry_after or config.WB_BACKOFF_CAP)
+                    queue.put_nowait(window)
+                    continue
+                result.failed += 1
+                logger.error(
+                    "[%s] Окно %s - %s не загружено: %s", self.seller.id, start, end, e
+                )
+                continue
+            except Exception:
+                # Ошибка БД и прочие сбои окна не должны бросать остальные
+                # воркеры: окно повторится при следующем запуске
+                result.failed += 1
+                logger.exception(
+                    "[%s] Окно %s - %s не загружено", self.seller.id, start, end
+                )
+                continue
+
+            result.windows += 1
+            result.fines += added
+            logger.info(
+                "[%s] Окно %s - %s: добавлено %s (%s/%s)",
+                self.seller.id,
+                start,
+                end,
+                added,
+                result.windows + result.failed,
+                total,
+            )
+
+    async def run(
+        self, start: datetime, end: datetime, window_size: timedelta
+    ) -> BackfillResult:
+        """Загрузка периода [start, end); уже загруженные окна пропускаются"""
+        windows = split_windows(start, end, window_size)
+        finished = await self._run_db(self._finished, start, end)
+        pending = [window for window in windows if window not in finished]
+        result = BackfillResult(skipped=len(windows) - len(pending))
+        logger.info(
+            "[%s] Backfill %s - %s: окон %s, уже загружено %s",
+            self.seller.id,
+            start,
+            end,
+            len(windows),
+            result.skipped,
+        )
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for window in pending:
+            queue.put_nowait(window)
+        await asyncio.gather(
+            *(
+                self._worker(queue, result, len(pending))
+                for _ in range(min(self.workers, len(pending)))
+            )
+        )
+        return result
+
+
+def _prepare_partitions(start: datetime, end: datetime):
+    """Партиции fines для месяцев истории, иначе строки осядут в fines_default"""
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        ensure_fine_partitions(conn, start.date(), end.date())
+
+
+async def run_backfill(
+    seller: Seller,
+    start: datetime,
+    end: datetime,
+    window_size: timedelta,
+    workers: int,
+    rate: float,
+) -> BackfillResult:
+    client = AsyncWBClient(rate_limit=TokenBucket(rate))
+    try:
+        return await Backfill(seller, client, workers).run(start, end, window_size)
+    finally:
+        await client.aclose()
+        await dispose_engines()
+
+
+def main(argv: Optional[List[str]] = None):
+    """Точка входа: историческая загрузка штрафов кабинета"""
+    parser = argparse.ArgumentParser(description="Историческая загрузка штрафов")
+    parser.add_argument("seller_id", help="кабинет ('default' - из .env)")
+    parser.add_argument(
+        "--from", dest="start", required=True, type=datetime.fromisoformat
+    )
+    parser.add_argument(
+        "--to",
+        dest="end",
+        type=datetime.fromisoformat,
+        help="конец периода, не включая (по умолчанию - сейчас)",
+    )
+    parser.add_argument(
+        "--window-hours", type=int, default=config.BACKFILL_WINDOW_HOURS
+    )
+    parser.add_argument("--workers", type=int, default=config.BACKFILL_WORKERS)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=config.BACKFILL_RATE,
+        help="запросов к WB в секунду",
+    )
+    args = parser.parse_args(argv)
+    end = args.end or datetime.utcnow()
+
+    setup_logging()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        seller = get_seller(db, args.seller_id)
+    finally:
+        db.close()
+    if seller is None:
+        print(f"❌ Кабинет {args.seller_id} не найден")
+        sys.exit(1)
+
+    _prepare_partitions(args.start, end)
+    try:
+        result = asyncio.run(
+            run_backfill(
+                seller,
+                args.start,
+                end,
+                timedelta(hours=args.window_hours),
+                args.workers,
+                args.rate,
+            )
+        )
+    except KeyboardInterrupt:
+        print("\nЗагрузка прервана, повторный запуск продолжит с этого места")
+        sys.exit(1)
+
+    print(
+        f"Окон загружено: {result.windows}, пропущено: {result.skipped}, "
+        f"с ошибкой: {result.failed}; добавлено штрафов: {result.fines}"
+    )
+    if result.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Команды бота в чатах Telegram: /stats, /today, /top, /unpaid, /help
+
+Обновления читаются long polling (getUpdates) в том же event loop, что и
+опрос WB. Ответы строятся из SummaryCache (bot/summary.py) без запросов к
+БД и уходят через очередь TelegramNotifier с её лимитами. Чату видны
+кабинеты, в chat_ids которых он указан; в остальных чатах бот молчит.
+
+getUpdates одного токена может читать только один процесс: при SHARDING
+команды читает только копия с наименьшим REPLICA_ID среди живых
+(ShardCoordinator.is_leader), остальные ждут, пока она не упадёт.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from bot import metrics
+from bot.config import config
+from bot.notifications import TelegramNotifier
+from bot.sellers import Seller, load_sellers
+from bot.summary import CLOSED_STATUSES, ZERO, SummaryCache, Total
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+TOP_DAYS = 30
+TOP_LIMIT = 5
+
+HELP_TEXT = """Команды бота штрафов WB
+
+/stats - всего штрафов по статусам
+/today - штрафы за сегодня по типам
+/top - типы штрафов с наибольшей суммой за 30 дней
+/unpaid - неоплаченные штрафы"""
+
+
+def utc_today() -> date:
+    """
+    Сегодняшний день по UTC
+
+    Дни daily_stats - даты штрафов в UTC (FineRecord.from_api отбрасывает
+    зону), поэтому "сегодня" не зависит от часового пояса сервера.
+    """
+    return datetime.now(timezone.utc).date()
+
+
+def _total(total: Total) -> str:
+    count, amount = total
+    return f"{count} на {amount} руб"
+
+
+def _sum(totals: Dict[str, Total]) -> Total:
+    count, amount = ZERO
+    for total_count, total_amount in totals.values():
+        count, amount = count + total_count, amount + total_amount
+    return count, amount
+
+
+def _lines(totals: Dict[str, Total], limit: Optional[int] = None) -> List[str]:
+    """Строки "название: N на X руб" по убыванию суммы"""
+    ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+    return [
+        f"{name or 'без статуса'}: {_total(total)}" for name, total in ranked[:limit]
+    ]
+
+
+class TelegramCommands:
+    """Обработка команд в чатах по итогам из SummaryCache"""
+
+    def __init__(
+        self,
+        notifier: TelegramNotifier,
+        summary: SummaryCache,
+        active: Optional[Callable[[], bool]] = None,
+    ):
+        self.notifier = notifier
+        self.summary = summary
+        # Читать ли команды сейчас (при SHARDING - только в одной копии)
+        self.active = active
+        self.chat_sellers: Dict[str, Tuple[str, ...]] = {}
+        self._offset: Optional[int] = None
+        self._refresh_at = 0.0
+        self._handlers = {
+            "/start": self._help,
+            "/help": self._help,
+            "/stats": self._stats,
+            "/today": self._today,
+            "/top": self._top,
+            "/unpaid": self._unpaid,
+        }
+
+    def _load(self, db: "Session") -> Tuple[List[Seller], list]:
+        from database.repository import StatsRepository
+
+        return load_sellers(db), StatsRepository(db, None).get_rows()
+
+    async def refresh(self):
+        """Перечитать кабинеты и итоги из БД (при запуске и раз в SUMMARY_REFRESH)"""
+        from database.models import run_db
+
+        sellers, rows = await run_db(self._load)
+        self.summary.load(rows)
+        chat_sellers: Dict[str, List[str]] = {}
+        for seller in sellers:
+            for chat_id in seller.chat_ids:
+                chat_sellers.setdefault(chat_id, []).append(seller.id)
+        self.chat_sellers = {
+            chat_id: tuple(seller_ids) for chat_id, seller_ids in chat_sellers.items()
+        }
+        self._refresh_at = time.monotonic() + config.SUMMARY_REFRESH
+        logger.info(
+            "Итоги для команд перечитаны: %s строк, чатов: %s",
+            len(rows),
+            len(self.chat_sellers),
+        )
+
+    def answer(self, chat_id: str, text: str) -> Optional[str]:
+        """
+        Ответ на сообщение чата (без обращений к БД)
+
+        Returns:
+            текст ответа; None - не команда или чужой чат
+        """
+        seller_ids = self.chat_sellers.get(chat_id)
+        if not seller_ids or not text.startswith("/"):
+            return None
+        # /stats@имя_бота в группах
+        command = text.split()[0].split("@")[0].lower()
+        handler = self._handlers.get(command)
+        if handler is None:
+            return None
+        with metrics.COMMAND_SECONDS.time():
+            reply = handler(seller_ids)
+        metrics.COMMANDS_TOTAL.labels(command=command).inc()
+        return reply
+
+    def _help(self, seller_ids: Tuple[str, ...]) -> str:
+        return HELP_TEXT
+
+    def _stats(self, seller_ids: Tuple[str, ...]) -> str:
+        statuses = self.summary.by_status(seller_ids)
+        lines = [f"Штрафы WB: всего {_total(_sum(statuses))}"]
+        if statuses:
+            lines += ["", "По статусам:"] + _lines(statuses)
+        return "\n".join(lines)
+
+    def _today(self, seller_ids: Tuple[str, ...]) -> str:
+        today = utc_today()
+        types = self.summary.by_type(seller_ids, today, today)
+        lines = [f"Штрафы WB за {today}: {_total(_sum(types))}"]
+        if types:
+            lines += [""] + _lines(types)
+        return "\n".join(lines)
+
+    def _top(self, seller_ids: Tuple[str, ...]) -> str:
+        today = utc_today()
+        types = self.summary.by_type(
+            seller_ids, today - timedelta(days=TOP_DAYS - 1), today
+        )
+        if not types:
+            return f"Штрафов за {TOP_DAYS} дней нет"
+        lines = _lines(types, TOP_LIMIT)
+        return f"Типы штрафов за {TOP_DAYS} дней по сумме:\n\n" + "\n".join(
+            f"{place}. {line}" for place, line in enumerate(lines, start=1)
+        )
+
+    def _unpaid(self, seller_ids: Tuple[str, ...]) -> str:
+        unpaid = {
+            status: total
+            for status, total in self.summary.by_status(seller_ids).items()
+            if status not in CLOSED_STATUSES
+        }
+        lines = [f"Не оплачено: {_total(_sum(unpaid))}"]
+        if unpaid:
+            lines += [""] + _lines(unpaid)
+        return "\n".join(lines)
+
+    async def _handle(self, update):
+        message = update.message
+        if message is None or not message.text:
+            return
+        chat_id = str(message.chat.id)
+        reply = self.answer(chat_id, message.text)
+        if reply is None:
+            return
+        await self.notifier.submit(reply, chat_id=chat_id)
+
+    async def run(self):
+        """Бесконечный цикл: getUpdates и ответы на команды"""
+        from telegram.error import Conflict, TelegramError
+
+        logger.info("Команды в чатах включены")
+        while True:
+            if self.active is not None and not self.active():
+                await asyncio.sleep(config.REPLICA_HEARTBEAT)
+                continue
+            try:
+                if time.monotonic() >= self._refresh_at:
+                    await self.refresh()
+                updates = await self.notifier.bot.get_updates(
+                    offset=self._offset,
+                    timeout=config.TELEGRAM_COMMANDS_TIMEOUT,
+                    allowed_updates=["message"],
+                )
+                for update in updates:
+                    self._offset = update.update_id + 1
+                    await self._handle(update)
+            except asyncio.CancelledError:
+                raise
+            except Conflict as e:
+                # Обновления этого токена читает другой процесс
+                logger.error("getUpdates занят другим процессом: %s", e)
+                await asyncio.sleep(60)
+            except TelegramError as e:
+                logger.warning("Ошибка получения команд: %s", e)
+                await asyncio.sleep(5)
+            except Exception as e:
+                logger.error("Ошибка обработки команд: %s", e, exc_info=True)
+                await asyncio.sleep(5)
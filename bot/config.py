@@ -15,18 +15,109 @@ class Config:
     DB_NAME = os.getenv("DB_NAME", "wb_fines_db")
     DB_USER = os.getenv("DB_USER", "postgres")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
+    DB_URL = os.getenv("DB_URL", "")  # готовый URL вместо DB_* (например, sqlite)
+    DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", 1000))  # строк в одном INSERT
+    DB_PARTITION_MONTHS_AHEAD = int(os.getenv("DB_PARTITION_MONTHS_AHEAD", 3))
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # сек, -1 = никогда
+    DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))  # мс, 0 = нет
+    DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 10))  # сек, 0 = нет
+    DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"  # asyncpg
 
     # === Telegram ===
     TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
     TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+    TELEGRAM_WORKERS = int(os.getenv("TELEGRAM_WORKERS", 4))  # параллельных отправок
+    TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", 1000))
+    TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 25))  # сообщ/сек
+    TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1))  # сообщ/сек на чат
+    TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3))
+    TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", 5))
 
     # === API Wildberries ===
     WB_API_KEY = os.getenv("WB_API_KEY", "")
+    WB_REQUEST_TIMEOUT = float(os.getenv("WB_REQUEST_TIMEOUT", 30))  # дедлайн, сек
+    WB_CONNECT_TIMEOUT = float(os.getenv("WB_CONNECT_TIMEOUT", 5))
+    WB_POOL_SIZE = int(os.getenv("WB_POOL_SIZE", 10))  # keep-alive соединений в пуле
+    WB_KEEPALIVE_EXPIRY = float(os.getenv("WB_KEEPALIVE_EXPIRY", 60))
+    WB_MAX_ATTEMPTS = int(os.getenv("WB_MAX_ATTEMPTS", 3))  # попыток на запрос
+    WB_BACKOFF_BASE = float(os.getenv("WB_BACKOFF_BASE", 0.5))  # сек
+    WB_BACKOFF_CAP = float(os.getenv("WB_BACKOFF_CAP", 10))  # сек
+    WB_TOTAL_TIMEOUT = float(os.getenv("WB_TOTAL_TIMEOUT", 60))  # все попытки, сек
+    WB_BREAKER_THRESHOLD = int(os.getenv("WB_BREAKER_THRESHOLD", 5))  # сбоев подряд
+    WB_BREAKER_RESET = float(os.getenv("WB_BREAKER_RESET", 30))  # сек до пробы
+    WB_HEDGE_AFTER = float(os.getenv("WB_HEDGE_AFTER", 0))  # сек, 0 = без hedging
+    WB_PAGE_SIZE = int(os.getenv("WB_PAGE_SIZE", 1000))  # штрафов на странице
+    FETCH_INITIAL_DAYS = int(os.getenv("FETCH_INITIAL_DAYS", 1))  # первый запуск
+    FETCH_OVERLAP_MINUTES = int(os.getenv("FETCH_OVERLAP_MINUTES", 10))  # опоздавшие
+    FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", 5000))  # штрафов в транзакции
+    FINE_CACHE_SIZE = int(os.getenv("FINE_CACHE_SIZE", 100000))  # на кабинет, 0 = выкл
+    FINE_CACHE_TTL = float(os.getenv("FINE_CACHE_TTL", 3600))  # сек
+    BACKFILL_WINDOW_HOURS = int(os.getenv("BACKFILL_WINDOW_HOURS", 24))  # окно
+    BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", 4))  # окон параллельно
+    BACKFILL_RATE = float(os.getenv("BACKFILL_RATE", 1))  # запросов к WB в сек
 
     # === Настройки приложения ===
     CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", 30))  # 30 секунд для тестов
+    POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", 10))  # циклов одновременно
+    POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", 5))  # сек
+    POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", 120))  # сек
+    POLL_BURST_FACTOR = float(os.getenv("POLL_BURST_FACTOR", 0.5))  # есть новые
+    POLL_IDLE_FACTOR = float(os.getenv("POLL_IDLE_FACTOR", 1.5))  # новых нет
+    POLL_ERROR_FACTOR = float(os.getenv("POLL_ERROR_FACTOR", 2))  # 429/5xx подряд
+    SELLERS_RELOAD_INTERVAL = int(os.getenv("SELLERS_RELOAD_INTERVAL", 300))  # сек
+    # Проверки при запуске (БД, WB, Telegram) идут одновременно; FAST_START -
+    # опрос начинается сразу после БД, WB и Telegram проверяются в фоне
+    STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", 10))  # сек на проверку
+    FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+    # Несколько копий бота делят кабинеты между собой (bot/sharding.py)
+    SHARDING = os.getenv("SHARDING", "false").lower() == "true"
+    REPLICA_ID = os.getenv("REPLICA_ID", "")  # по умолчанию hostname:pid
+    REPLICA_HEARTBEAT = float(os.getenv("REPLICA_HEARTBEAT", 10))  # сек
+    REPLICA_TTL = float(os.getenv("REPLICA_TTL", 30))  # сек без отметки = упала
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text или json (JSON-строки)
+    LOG_QUEUE = os.getenv("LOG_QUEUE", "true").lower() == "true"  # запись в потоке
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 2**20))  # ротация, 0 = нет
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+    LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")  # midnight, H... вместо размера
     HIGH_FINE_THRESHOLD = float(os.getenv("HIGH_FINE_THRESHOLD", 5000))
+    NOTIFY_MODE = os.getenv("NOTIFY_MODE", "single")  # single или digest
+    DIGEST_WINDOW = int(os.getenv("DIGEST_WINDOW", 0))  # сек, 0 = раз в цикл
+    # Уведомлять о смене статуса уже известного штрафа (Начислен -> Оспорен ...)
+    NOTIFY_STATUS_CHANGES = (
+        os.getenv("NOTIFY_STATUS_CHANGES", "false").lower() == "true"
+    )
+    # Команды /stats, /today, /top, /unpaid в чатах (bot/commands.py); при
+    # SHARDING их читает только одна живая копия бота
+    TELEGRAM_COMMANDS = os.getenv("TELEGRAM_COMMANDS", "true").lower() == "true"
+    TELEGRAM_COMMANDS_TIMEOUT = int(os.getenv("TELEGRAM_COMMANDS_TIMEOUT", 30))  # сек
+    SUMMARY_REFRESH = int(os.getenv("SUMMARY_REFRESH", 600))  # сек, итоги из БД
+
+    # === Метрики Prometheus ===
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+    # === Outbox уведомлений ===
+    OUTBOX_IN_PROCESS = os.getenv("OUTBOX_IN_PROCESS", "true").lower() == "true"
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+    OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 2))  # сек
+    OUTBOX_LEASE = int(os.getenv("OUTBOX_LEASE", 300))  # сек на доставку пачки
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+    OUTBOX_RETRY_DELAY = int(os.getenv("OUTBOX_RETRY_DELAY", 30))  # сек, x2 за попытку
+
+    # === API отчётов (api/main.py) ===
+    API_HOST = os.getenv("API_HOST", "127.0.0.1")
+    API_PORT = int(os.getenv("API_PORT", 8080))
+    API_TOKEN = os.getenv("API_TOKEN", "")  # Authorization: Bearer, пусто = без
+    API_DATABASE_URL = os.getenv("API_DATABASE_URL", "")  # например, реплика
+    API_DB_POOL_SIZE = int(os.getenv("API_DB_POOL_SIZE", 2))
+    API_STATEMENT_TIMEOUT = int(os.getenv("API_STATEMENT_TIMEOUT", 60000))  # мс
 
     # === Вычисляемые свойства ===
     @property
@@ -41,6 +132,8 @@ class Config:
     @property
     def DATABASE_URL(self):
         """URL подключения к БД с экранированием пароля"""
+        if self.DB_URL:
+            return self.DB_URL
         if self.DB_PASSWORD:
             password_escaped = quote_plus(self.DB_PASSWORD)
         else:
@@ -48,6 +141,11 @@ class Config:
 
         return f"postgresql://{self.DB_USER}:{password_escaped}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def ASYNC_DATABASE_URL(self):
+        """URL подключения к БД для асинхронного драйвера asyncpg"""
+        return self.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
     def validate(self):
         """Проверка конфигурации"""
         errors = []
@@ -63,6 +161,28 @@ class Config:
         if self.MODE not in ["MOCK", "PROD"]:
             errors.append(f"Неверный APP_MODE: {self.MODE}. Должно быть MOCK или PROD")
 
+        if self.NOTIFY_MODE not in ["single", "digest"]:
+            errors.append(
+                f"Неверный NOTIFY_MODE: {self.NOTIFY_MODE}. Должно быть single или digest"
+            )
+
+        if self.LOG_FORMAT not in ["text", "json"]:
+            errors.append(
+                f"Неверный LOG_FORMAT: {self.LOG_FORMAT}. Должно быть text или json"
+            )
+
+        if not 0 < self.POLL_MIN_INTERVAL <= self.POLL_MAX_INTERVAL:
+            errors.append(
+                "Нужно 0 < POLL_MIN_INTERVAL <= POLL_MAX_INTERVAL "
+                f"(сейчас {self.POLL_MIN_INTERVAL} и {self.POLL_MAX_INTERVAL})"
+            )
+
+        if self.SHARDING and not 0 < self.REPLICA_HEARTBEAT < self.REPLICA_TTL:
+            errors.append(
+                "Нужно 0 < REPLICA_HEARTBEAT < REPLICA_TTL "
+                f"(сейчас {self.REPLICA_HEARTBEAT} и {self.REPLICA_TTL})"
+            )
+
         # Для PROD режима нужен API ключ
         if self.MODE == "PROD" and not self.WB_API_KEY:
             errors.append("Для PROD режима нужен WB_API_KEY")
@@ -82,14 +202,25 @@ class Config:
             "Режим": self.MODE,
             "База данных": f"{self.DB_NAME} на {self.DB_HOST}:{self.DB_PORT}",
             "Пользователь БД": self.DB_USER,
+            "Драйвер БД": "asyncpg" if self.DB_ASYNC else "psycopg2",
             "Telegram": (
                 "✅ Настроен"
                 if self.TELEGRAM_BOT_TOKEN and self.TELEGRAM_CHAT_ID
                 else "❌ Не настроен"
             ),
             "API URL": self.WB_API_URL,
-            "Интервал проверки": f"{self.CHECK_INTERVAL} сек",
+            "Интервал проверки": (
+                f"{self.CHECK_INTERVAL} сек "
+                f"(от {self.POLL_MIN_INTERVAL:g} "
+                f"до {max(self.POLL_MAX_INTERVAL, self.CHECK_INTERVAL):g})"
+            ),
             "Порог уведомлений": f"{self.HIGH_FINE_THRESHOLD} руб",
+            "Режим уведомлений": self.NOTIFY_MODE
+            + (", смена статуса" if self.NOTIFY_STATUS_CHANGES else ""),
+            "Копии бота": "делят кабинеты" if self.SHARDING else "одна",
+            "Команды в чатах": (
+                "✅ Включены" if self.TELEGRAM_COMMANDS else "❌ Выключены"
+            ),
         }
 
         for key, value in config_info.items():
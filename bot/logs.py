@@ -0,0 +1,167 @@
+"""
+Настройка логирования процессов бота
+
+Обработчики (файл с ротацией и stdout) работают в фоновом потоке
+QueueListener: в event loop остаётся подстановка аргументов в сообщение и
+постановка записи в очередь, а форматирование и запись на диск идут в
+потоке. Сообщения пишутся в %-стиле (logger.info("... %s", value)),
+поэтому записи отключённых уровней не форматируются вовсе.
+
+Файл ротируется по размеру (LOG_MAX_BYTES) или по времени
+(LOG_ROTATE_WHEN, например midnight), хранится LOG_BACKUP_COUNT старых
+файлов. LOG_FORMAT=json пишет JSON-строки; у записей, сделанных внутри
+цикла опроса (включая запросы к БД в потоках), есть cycle_id.
+LOG_QUEUE=false - запись прямо из вызывающего потока, как раньше.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from bot.config import config
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Id текущего цикла опроса. asyncio копирует контекст в задачи и в
+# asyncio.to_thread, поэтому id виден и в коде, работающем с БД
+cycle_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "cycle_id", default=None
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_EXC_FORMATTER = logging.Formatter()
+
+
+def new_cycle_id(seller_id: str) -> contextvars.Token:
+    """Новый id цикла кабинета; вернуть прежний - cycle_id.reset(token)"""
+    return cycle_id.set(f"{seller_id}-{uuid.uuid4().hex[:8]}")
+
+
+class CycleIdFilter(logging.Filter):
+    """Запоминает в записи cycle_id вызывающего контекста"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.cycle_id = cycle_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "cycle_id", None):
+            entry["cycle_id"] = record.cycle_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Постановка записи в очередь с минимумом работы в вызывающем потоке
+
+    В отличие от QueueHandler.prepare, запись не форматируется целиком:
+    подставляются только аргументы (они могут измениться после вызова) и
+    текст исключения (traceback нельзя передавать в другой поток).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _file_handler(path: str) -> logging.Handler:
+    if config.LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            path,
+            when=config.LOG_ROTATE_WHEN,
+            backupCount=config.LOG_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+    return logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=config.LOG_MAX_BYTES,
+        backupCount=config.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+
+
+def setup_logging(log_file: Optional[str] = None):
+    """
+    Настройка корневого логгера по конфигурации (повторный вызов заменяет
+    прежнюю настройку)
+
+    Args:
+        log_file: файл лога с ротацией; None - только stdout
+    """
+    global _listener
+    stop_logging()
+
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(_file_handler(log_file))
+    formatter = (
+        JsonFormatter()
+        if config.LOG_FORMAT == "json"
+        else logging.Formatter(TEXT_FORMAT)
+    )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(getattr(logging, config.LOG_LEVEL))
+
+    if not config.LOG_QUEUE:
+        for handler in handlers:
+            handler.addFilter(CycleIdFilter())
+            root.addHandler(handler)
+        return
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(records)
+    queue_handler.addFilter(CycleIdFilter())
+    _listener = logging.handlers.QueueListener(
+        records, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    root.addHandler(queue_handler)
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток записи (вызывается и при выходе)"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(stop_logging)
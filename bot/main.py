@@ -2,25 +2,35 @@ import asyncio
 import logging
 import os
 import sys
-from sqlalchemy.orm import Session
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Awaitable, Dict, List, Optional, Tuple
 
+from bot import metrics
+from bot.commands import TelegramCommands
 from bot.config import config
-from bot.wb_client import WBClient
+from bot.logs import cycle_id, new_cycle_id, setup_logging
+from bot.transport import WBTransportError, WBUnavailableError
+from bot.wb_client import AsyncWBClient
 from bot.notifications import TelegramNotifier
-from database.models import SessionLocal, init_db
-from database.repository import FineRepository, NotificationRepository
+from bot.records import FineRecord
+from bot.outbox import OutboxWorker
+from bot.scheduler import CycleResult, PollingScheduler
+from bot.seen_cache import SeenFineCache
+from bot.streaming import achunks
+from bot.summary import SummaryCache
+from bot.sellers import Seller, default_seller, load_sellers
+
+if TYPE_CHECKING:
+    # SQLAlchemy и модули БД грузятся при первом обращении к БД, а не при
+    # импорте бота (benchmarks/bench_startup.py)
+    from sqlalchemy.orm import Session
+
+    from bot.sharding import ShardCoordinator
+    from database.history import FineChange
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Настройка логирования
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("bot.log", encoding="utf-8"),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
 logger = logging.getLogger(__name__)
 
 
@@ -33,93 +43,332 @@ class WBFineBot:
             config.validate()
             config.print_config()
         except ValueError as e:
-            logger.error(f"Ошибка конфигурации: {e}")
+            logger.error("Ошибка конфигурации: %s", e)
             raise
 
         # Инициализируем компоненты
-        self.wb_client = WBClient()
+        self.wb_client = AsyncWBClient()
         self.notifier = TelegramNotifier()
+        self.outbox_worker = OutboxWorker(self.notifier)
+        # Кэши известных штрафов по кабинетам, создаются при первом цикле
+        self.seen_caches: Dict[str, SeenFineCache] = {}
+        # Итоги штрафов для команд в чатах (bot/commands.py)
+        self.summary = SummaryCache()
 
-        # Инициализируем БД
-        try:
-            init_db()
-            logger.info("База данных инициализирована")
-        except Exception as e:
-            logger.error(f"Ошибка инициализации БД: {e}")
-            raise
-
+        # БД инициализируется в run() одновременно с остальными проверками
         logger.info("Бот инициализирован")
 
-    def get_db(self) -> Session:
+    def get_db(self) -> "Session":
         """Получение сессии БД"""
-        return SessionLocal()
+        from database.models import SessionLocal
 
-    async def check_fines(self):
-        """Проверка новых штрафов"""
-        logger.info("Проверка новых штрафов...")
+        return SessionLocal()
 
-        db = self.get_db()
+    def _fetch_window(self, db: "Session", seller: Seller):
+        """Начало окна загрузки: позиция курсора с запасом на опоздавшие"""
+        from database.repository import CursorRepository
+
+        position = CursorRepository(db).get_position(seller.cursor_name)
+        if position is None:
+            return None
+        return position - timedelta(minutes=config.FETCH_OVERLAP_MINUTES)
+
+    def _load_recent(self, db: "Session", seller: Seller, since: datetime, limit: int):
+        from database.repository import FineRepository
+
+        return FineRepository(db, seller.id).get_recent(since, limit)
+
+    async def _seen_cache(
+        self, seller: Seller, since: Optional[datetime]
+    ) -> SeenFineCache:
+        """Кэш известных штрафов кабинета; при создании прогревается из БД"""
+        cache = self.seen_caches.get(seller.id)
+        if cache is not None:
+            return cache
+
+        cache = SeenFineCache(seller.id, config.FINE_CACHE_SIZE, config.FINE_CACHE_TTL)
+        if cache.max_size > 0:
+            from database.models import run_db
+
+            if since is None:
+                since = datetime.utcnow() - timedelta(days=config.FETCH_INITIAL_DAYS)
+            cache.load(await run_db(self._load_recent, seller, since, cache.max_size))
+            logger.info("[%s] Кэш штрафов прогрет из БД: %s", seller.id, len(cache))
+        self.seen_caches[seller.id] = cache
+        return cache
+
+    def _save_fines(
+        self,
+        db: "Session",
+        seller: Seller,
+        fines: List[FineRecord],
+        latest: Optional[datetime] = None,
+        advance: bool = True,
+    ) -> Tuple[List[FineRecord], Optional[datetime], Dict]:
+        """
+        Сохранение пачки штрафов и постановка уведомлений
+
+        Всё в одной транзакции (коммит делает run_db). С advance=True в
+        той же транзакции курсор сдвигается на самую позднюю дату штрафа,
+        с учётом latest из предыдущих пачек этого цикла.
+
+        Returns:
+            новые штрафы, самая поздняя дата штрафа с учётом latest и
+            изменения daily_stats
+        """
+        from database.repository import (
+            CursorRepository,
+            FineRepository,
+            NotificationRepository,
+        )
+
+        # Сохраняем всю пачку: один SELECT и один upsert на DB_BATCH_SIZE
+        fine_repo = FineRepository(db, seller.id)
+        with metrics.STAGE_UPSERT.time():
+            new_ids = set(fine_repo.save_fines_batch(fines))
+
+        dates = [fine.date for fine in fines]
+        if latest is not None:
+            dates.append(latest)
+        latest = max(dates) if dates else None
+        if advance and latest is not None:
+            CursorRepository(db).advance(seller.cursor_name, latest)
+
+        # Уведомления попадают в outbox в той же транзакции; доставкой
+        # занимается OutboxWorker, цикл опроса её не ждёт
+        new_fines = []
+        for fine in fines:
+            if fine.id not in new_ids:
+                continue
+            new_ids.discard(fine.id)
+            new_fines.append(fine)
+            logger.info(
+                "[%s] Новый штраф: %s - %s руб", seller.id, fine.type, fine.amount
+            )
+        status_changes = self._log_changes(seller, fine_repo.changes)
+        notif_repo = NotificationRepository(db)
+        for chat_id in seller.chat_ids:
+            notif_repo.enqueue(
+                [fine.id for fine in new_fines],
+                chat_id,
+                seller_id=seller.id,
+            )
+            if config.NOTIFY_STATUS_CHANGES:
+                notif_repo.enqueue(
+                    status_changes,
+                    chat_id,
+                    kind="status",
+                    seller_id=seller.id,
+                    history_ids=fine_repo.history_ids,
+                )
+        return new_fines, latest, fine_repo.deltas
+
+    def _log_changes(self, seller: Seller, changes: List["FineChange"]) -> List[str]:
+        """Учёт изменений известных штрафов; возвращает id со сменой статуса"""
+        status_changes = []
+        for change in changes:
+            for field in ("type", "amount", "status"):
+                if getattr(change, f"old_{field}") != getattr(change, f"new_{field}"):
+                    metrics.FINE_CHANGES_TOTAL.labels(field=field).inc()
+            if change.status_changed:
+                status_changes.append(change.fine_id)
+                logger.info(
+                    "[%s] Статус штрафа %s: %s -> %s",
+                    seller.id,
+                    change.fine_id,
+                    change.old_status,
+                    change.new_status,
+                )
+        return status_changes
+
+    async def _save_chunk(
+        self,
+        seller: Seller,
+        cache: SeenFineCache,
+        fines: List[FineRecord],
+        latest: Optional[datetime],
+        advance: bool = True,
+    ) -> Tuple[List[FineRecord], Optional[datetime]]:
+        """
+        Сохранение пачки: в БД уходят только штрафы, которых нет в кэше
+
+        Курсор сдвигается по всем штрафам пачки, включая найденные в кэше.
+        В кэш и в итоги для команд штрафы попадают после коммита транзакции.
+        """
+        chunk_latest = max(fine.date for fine in fines)
+        latest = chunk_latest if latest is None else max(latest, chunk_latest)
+        unseen = cache.unseen(fines)
+        if not unseen and not advance:
+            return [], latest
+
+        from database.models import run_db
+
+        new_fines, latest, deltas = await run_db(
+            self._save_fines, seller, unseen, latest, advance
+        )
+        cache.remember(unseen)
+        self.summary.apply(seller.id, deltas)
+        return new_fines, latest
+
+    async def check_fines(self, seller: Seller = None) -> CycleResult:
+        """Проверка новых штрафов кабинета (по умолчанию - из настроек .env)"""
+        seller = seller or default_seller()
+        # Все записи лога цикла (и запросов к БД в потоках) получают его id
+        token = new_cycle_id(seller.id)
         try:
-            # Получаем штрафы за последний день
-            fines = self.wb_client.get_fines(days_back=1)
+            logger.info("[%s] Проверка новых штрафов...", seller.id)
+            with metrics.STAGE_CYCLE.time():
+                result = await self._check_fines(seller)
+        finally:
+            cycle_id.reset(token)
+        metrics.LAST_CYCLE_TIMESTAMP.set(time.time())
+        return result
 
-            if not fines:
-                logger.info("Штрафов не обнаружено")
-                return 0
+    async def _check_fines(self, seller: Seller) -> CycleResult:
+        from database.models import run_db
 
-            # Обрабатываем штрафы
-            fine_repo = FineRepository(db)
-            notif_repo = NotificationRepository(db)
+        try:
+            # Получаем только новое с момента курсора. Транзакции БД короткие
+            # и не держатся открытыми на время запроса к API
+            date_from = await run_db(self._fetch_window, seller)
+            cache = await self._seen_cache(seller, date_from)
+
+            # Штрафы читаются потоком и сохраняются пачками по
+            # FETCH_CHUNK_SIZE, так что память не растёт с размером ответа.
+            # Курсор сдвигается вместе с последней пачкой: если ответ
+            # оборвётся, следующий цикл перечитает окно целиком
+            fines = self.wb_client.iter_fines(
+                days_back=config.FETCH_INITIAL_DAYS,
+                date_from=date_from,
+                api_key=seller.api_key,
+            )
+            fetched = 0
             new_fines_count = 0
-
-            for fine_data in fines:
-                try:
-                    # Сохраняем штраф
-                    fine, is_new = fine_repo.save_fine(fine_data)
-
-                    # Если штраф новый и ещё не уведомлён
-                    if is_new and not fine.notified:
-                        # Отправляем уведомление
-                        success = await self.notifier.send_fine_alert(fine_data)
-
-                        if success:
-                            # Отмечаем как уведомлённый
-                            fine_repo.mark_as_notified(fine.id)
-
-                            # Логируем уведомление
-                            notif_repo.log_notification(fine.id, "telegram", True)
-
-                            new_fines_count += 1
-                            logger.info(f"Новый штраф: {fine.type} - {fine.amount} руб")
-                        else:
-                            logger.error(
-                                f"Не удалось отправить уведомление для {fine.id}"
-                            )
-
-                except Exception as e:
-                    logger.error(
-                        f"Ошибка обработки штрафа {fine_data.get('id', 'unknown')}: {e}"
+            latest = None
+            pending = None
+            async for chunk in achunks(fines, config.FETCH_CHUNK_SIZE):
+                fetched += len(chunk)
+                if pending is not None:
+                    new_fines, latest = await self._save_chunk(
+                        seller, cache, pending, latest, False
                     )
-                    continue
-
-            # Статистика
-            total_fines = fine_repo.get_fines_count()
-
+                    new_fines_count += len(new_fines)
+                pending = chunk
+            if pending is not None:
+                new_fines, latest = await self._save_chunk(
+                    seller, cache, pending, latest
+                )
+                new_fines_count += len(new_fines)
+            metrics.FINES_PER_CYCLE.observe(fetched)
+
+            if not fetched:
+                logger.info("[%s] Штрафов не обнаружено", seller.id)
+                return CycleResult()
+
+            metrics.NEW_FINES_TOTAL.inc(new_fines_count)
             if new_fines_count > 0:
-                logger.info(f"Обнаружено новых штрафов: {new_fines_count}")
-                # Отправляем статус только если есть новые штрафы
-                await self.notifier.send_status_message(new_fines_count, total_fines)
+                logger.info(
+                    "[%s] Обнаружено новых штрафов: %s", seller.id, new_fines_count
+                )
             else:
-                logger.info(f"Проверено штрафов: {len(fines)}, новых: 0")
-
-            return new_fines_count
-
+                logger.info("[%s] Проверено штрафов: %s, новых: 0", seller.id, fetched)
+
+            return CycleResult(fetched=fetched, new=new_fines_count)
+
+        except WBUnavailableError as e:
+            # Цикл пропускается: это не "штрафов нет"
+            logger.warning("[%s] %s", seller.id, e)
+            return CycleResult(
+                error="throttled" if e.throttled else "unavailable",
+                retry_after=e.retry_after,
+            )
+        except WBTransportError as e:
+            logger.error("[%s] %s", seller.id, e)
+            return CycleResult(error="error")
         except Exception as e:
-            logger.error(f"Ошибка при проверке: {e}", exc_info=True)
-            return 0
+            logger.error("[%s] Ошибка при проверке: %s", seller.id, e, exc_info=True)
+            return CycleResult(error="error")
+
+    def _make_scheduler(
+        self, coordinator: Optional["ShardCoordinator"]
+    ) -> PollingScheduler:
+        """Планировщик опроса; при SHARDING - только кабинеты этой копии"""
+        from database.models import run_db
+
+        if coordinator is None:
+            return PollingScheduler(self.check_fines, lambda: run_db(load_sellers))
+
+        async def load_own_sellers() -> List[Seller]:
+            sellers = await coordinator.assign(await run_db(load_sellers))
+            owned = {seller.id for seller in sellers}
+            # Кэш ушедшего кабинета устареет, пока его опрашивает другая копия
+            for seller_id in list(self.seen_caches):
+                if seller_id not in owned:
+                    self.seen_caches.pop(seller_id).clear()
+            return sellers
+
+        return PollingScheduler(
+            coordinator.guard(self.check_fines),
+            load_own_sellers,
+            reload_interval=config.REPLICA_HEARTBEAT,
+        )
+
+    async def _check(
+        self, name: str, check: Awaitable[bool], timeout: Optional[float] = None
+    ) -> bool:
+        """Одна проверка при запуске: результат и время в лог"""
+        started = time.perf_counter()
+        try:
+            ok = await asyncio.wait_for(check, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error("%s: нет ответа за %s сек", name, timeout)
+            return False
+        logger.log(
+            logging.INFO if ok else logging.WARNING,
+            "%s: %s за %.0f мс",
+            name,
+            "работает" if ok else "ошибка",
+            (time.perf_counter() - started) * 1000,
+        )
+        return ok
+
+    async def _init_db(self) -> bool:
+        # Миграции могут идти долго, поэтому без общего таймаута; подключение
+        # ограничено DB_CONNECT_TIMEOUT. Ошибка БД останавливает запуск.
+        from database.models import init_db
 
-        finally:
-            db.close()
+        try:
+            await asyncio.to_thread(init_db)
+        except Exception as e:
+            logger.error("Ошибка инициализации БД: %s", e)
+            raise
+        return True
+
+    async def startup_checks(self) -> Tuple[bool, Optional[asyncio.Future]]:
+        """
+        Проверка БД (с миграциями), API WB и Telegram одновременно
+
+        Returns:
+            можно ли начинать опрос и, при FAST_START, фоновые проверки
+            WB и Telegram (их результат только пишется в лог)
+        """
+        db_check = self._check("База данных", self._init_db())
+        wb_check = self._check(
+            "API WB", self.wb_client.test_connection(), config.STARTUP_TIMEOUT
+        )
+        telegram_check = self._check(
+            "Telegram", self.notifier.check(), config.STARTUP_TIMEOUT
+        )
+        if config.FAST_START:
+            # Первый цикл опроса сам проверит API WB, ждать его незачем
+            background = asyncio.gather(
+                wb_check, telegram_check, return_exceptions=True
+            )
+            return await db_check, background
+
+        # Без Telegram бот работает: уведомления дождутся его в outbox
+        db_ok, wb_ok, _ = await asyncio.gather(db_check, wb_check, telegram_check)
+        return db_ok and wb_ok, None
 
     async def run(self):
         """Основной цикл работы бота"""
@@ -127,35 +376,82 @@ class WBFineBot:
 
         # Проверяем подключения
         logger.info("Проверка подключений...")
-
-        # Проверка API
-        if not self.wb_client.test_connection():
+        started = time.perf_counter()
+        ready, background_checks = await self.startup_checks()
+        if not ready:
             logger.error("Не удалось подключиться к API")
+            await self.wb_client.aclose()
             return
 
-        logger.info("Все подключения работают")
+        logger.info(
+            "Проверки при запуске: %.0f мс", (time.perf_counter() - started) * 1000
+        )
+
+        metrics_server = await metrics.start_metrics_server()
+        await self.notifier.start()
+        outbox_task = None
+        if config.OUTBOX_IN_PROCESS:
+            outbox_task = asyncio.create_task(self.outbox_worker.run())
+        coordinator = None
+        if config.SHARDING:
+            from bot.sharding import ShardCoordinator
+
+            coordinator = ShardCoordinator()
+        commands_task = None
+        if config.TELEGRAM_COMMANDS:
+            # getUpdates одного токена читает только одна копия бота
+            active = (lambda: coordinator.is_leader) if coordinator else None
+            commands = TelegramCommands(self.notifier, self.summary, active)
+            commands_task = asyncio.create_task(commands.run())
 
         # НЕ отправляем стартовое сообщение - убираем эту проблему
 
-        # Основной цикл
-        logger.info(f"Начинаю мониторинг (интервал: {config.CHECK_INTERVAL} сек)")
+        # Основной цикл: все кабинеты опрашиваются в одном event loop
+        logger.info(
+            "Начинаю мониторинг (интервал: %s сек, от %g до %g)",
+            config.CHECK_INTERVAL,
+            config.POLL_MIN_INTERVAL,
+            max(config.POLL_MAX_INTERVAL, config.CHECK_INTERVAL),
+        )
         logger.info("Для остановки нажмите Ctrl+C")
 
+        scheduler = self._make_scheduler(coordinator)
         try:
-            while True:
-                await self.check_fines()
-                await asyncio.sleep(config.CHECK_INTERVAL)
+            await scheduler.run()
 
         except KeyboardInterrupt:
             logger.info("Остановка бота по запросу пользователя")
         except Exception as e:
-            logger.error(f"Критическая ошибка: {e}")
+            logger.error("Критическая ошибка: %s", e)
         finally:
+            if background_checks is not None:
+                background_checks.cancel()
+                await asyncio.gather(background_checks, return_exceptions=True)
+            await self.wb_client.aclose()
+            if outbox_task is not None:
+                # Недоставленное останется в outbox и уйдёт после перезапуска
+                outbox_task.cancel()
+                await asyncio.gather(outbox_task, return_exceptions=True)
+            if commands_task is not None:
+                commands_task.cancel()
+                await asyncio.gather(commands_task, return_exceptions=True)
+            await self.notifier.stop()
+            if coordinator is not None:
+                try:
+                    await coordinator.leave()
+                except Exception as e:
+                    logger.error("Не удалось выйти из состава копий: %s", e)
+            from database.models import dispose_engines
+
+            await dispose_engines()
+            if metrics_server is not None:
+                metrics_server.close()
             logger.info("Бот остановлен")
 
 
 def main():
     """Точка входа"""
+    setup_logging(config.LOG_FILE)
     try:
         bot = WBFineBot()
         asyncio.run(bot.run())
@@ -0,0 +1,450 @@
+"""
+Метрики бота в формате Prometheus
+
+Счётчики, gauge и гистограммы хранятся в памяти процесса и отдаются
+текстом на локальном HTTP-эндпоинте /metrics. При METRICS_ENABLED=false
+(по умолчанию) все метрики - пустые заглушки, и вызовы в горячем пути
+стоят один вызов метода. Настройка читается при импорте модуля.
+"""
+
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм по умолчанию, сек
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Timer:
+    """Контекстный менеджер замера длительности в гистограмму"""
+
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram: "_HistogramChild"):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Значение вычисляется в момент выгрузки метрик"""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    """Метрика с набором меток; без меток ведёт себя как свой единственный child"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self, pairs, child) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for key, child in list(self._children.items()):
+            lines.extend(self._samples(list(zip(self.labelnames, key)), child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def _samples(self, pairs, child) -> List[str]:
+        return [f"{self.name}{_format_labels(pairs)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+    def _samples(self, pairs, child) -> List[str]:
+        return [f"{self.name}{_format_labels(pairs)} {_format_value(child.get())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def _samples(self, pairs, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _format_labels(pairs + [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(pairs)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class _NoopMetric:
+    """Заглушка любой метрики при выключенных метриках"""
+
+    __slots__ = ()
+
+    def labels(self, **labels):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def set_function(self, function: Callable[[], float]):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NOOP = _NoopMetric()
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()):
+    if not config.METRICS_ENABLED:
+        return NOOP
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()):
+    if not config.METRICS_ENABLED:
+        return NOOP
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+):
+    if not config.METRICS_ENABLED:
+        return NOOP
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# === Цикл опроса ===
+CYCLE_STAGE_SECONDS = histogram(
+    "wb_bot_cycle_stage_seconds",
+    "Длительность этапов цикла проверки штрафов",
+    ["stage"],
+)
+STAGE_FETCH = CYCLE_STAGE_SECONDS.labels(stage="fetch")
+STAGE_PARSE = CYCLE_STAGE_SECONDS.labels(stage="parse")
+STAGE_UPSERT = CYCLE_STAGE_SECONDS.labels(stage="upsert")
+STAGE_COMMIT = CYCLE_STAGE_SECONDS.labels(stage="commit")
+STAGE_SEND = CYCLE_STAGE_SECONDS.labels(stage="send")
+STAGE_CYCLE = CYCLE_STAGE_SECONDS.labels(stage="cycle")
+
+FINES_PER_CYCLE = histogram(
+    "wb_bot_fines_per_cycle",
+    "Штрафов в ответе API за цикл",
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+NEW_FINES_TOTAL = counter("wb_bot_new_fines_total", "Новых штрафов сохранено")
+FINE_CHANGES_TOTAL = counter(
+    "wb_bot_fine_changes_total",
+    "Изменений известных штрафов записано в историю",
+    ["field"],
+)
+CYCLE_LAG_SECONDS = gauge(
+    "wb_bot_cycle_lag_seconds",
+    "Отставание начала цикла кабинета от запланированного времени",
+    ["seller"],
+)
+POLL_INTERVAL_SECONDS = gauge(
+    "wb_bot_poll_interval_seconds", "Текущий интервал опроса кабинета", ["seller"]
+)
+LAST_CYCLE_TIMESTAMP = gauge(
+    "wb_bot_last_cycle_timestamp_seconds", "Время завершения последнего цикла"
+)
+FINE_CACHE_LOOKUPS_TOTAL = counter(
+    "wb_bot_fine_cache_lookups_total",
+    "Проверки штрафов по кэшу известных (hit - без запроса к БД)",
+    ["seller", "result"],
+)
+FINE_CACHE_SIZE = gauge(
+    "wb_bot_fine_cache_size", "Штрафов в кэше известных", ["seller"]
+)
+REPLICAS_ALIVE = gauge("wb_bot_replicas_alive", "Живых копий бота (SHARDING)")
+SELLERS_OWNED = gauge("wb_bot_sellers_owned", "Кабинетов, закреплённых за копией")
+LEASE_CONFLICTS_TOTAL = counter(
+    "wb_bot_lease_conflicts_total",
+    "Циклы, пропущенные из-за аренды кабинета другой копией",
+)
+
+# === API Wildberries ===
+WB_REQUEST_SECONDS = histogram(
+    "wb_bot_wb_request_seconds", "Длительность запросов к API WB", ["endpoint"]
+)
+WB_RESPONSES_TOTAL = counter(
+    "wb_bot_wb_responses_total",
+    "Ответы API WB по коду (timeout/error - без ответа)",
+    ["endpoint", "status"],
+)
+WB_INVALID_FINES_TOTAL = counter(
+    "wb_bot_wb_invalid_fines_total", "Отброшенные некорректные штрафы из ответа API"
+)
+WB_RETRIES_TOTAL = counter(
+    "wb_bot_wb_retries_total", "Повторы запросов к API WB", ["endpoint", "reason"]
+)
+WB_HEDGED_TOTAL = counter(
+    "wb_bot_wb_hedged_total", "Дублирующие (hedged) запросы к API WB", ["endpoint"]
+)
+WB_CIRCUIT_STATE = gauge(
+    "wb_bot_wb_circuit_state", "Circuit breaker API WB: 0 closed, 1 half-open, 2 open"
+)
+
+# === Telegram ===
+TELEGRAM_SEND_SECONDS = histogram(
+    "wb_bot_telegram_send_seconds", "Длительность вызова sendMessage"
+)
+TELEGRAM_ERRORS_TOTAL = counter(
+    "wb_bot_telegram_errors_total", "Ошибки вызова sendMessage по типу", ["error"]
+)
+TELEGRAM_MESSAGES_TOTAL = counter(
+    "wb_bot_telegram_messages_total",
+    "Итог доставки сообщений (delivered/failed)",
+    ["result"],
+)
+TELEGRAM_QUEUE_DEPTH = gauge(
+    "wb_bot_telegram_queue_depth", "Сообщений в очереди отправки"
+)
+COMMANDS_TOTAL = counter(
+    "wb_bot_commands_total", "Команд в чатах обработано", ["command"]
+)
+COMMAND_SECONDS = histogram(
+    "wb_bot_command_seconds",
+    "Время построения ответа на команду из итогов в памяти",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Минимальный HTTP/1.0: GET /metrics"""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Заголовки запроса не нужны, но их надо дочитать
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (
+            b"\r\n",
+            b"\n",
+            b"",
+        ):
+            pass
+
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].startswith("/metrics"):
+            status = "200 OK"
+            body = REGISTRY.render().encode()
+        else:
+            status = "404 Not Found"
+            body = b"Not Found\n"
+
+        writer.write(
+            f"HTTP/1.0 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(
+    host: Optional[str] = None, port: Optional[int] = None
+) -> Optional[asyncio.AbstractServer]:
+    """
+    Запуск эндпоинта /metrics в текущем event loop
+
+    Returns:
+        сервер или None, если метрики выключены
+    """
+    if not config.METRICS_ENABLED:
+        return None
+
+    host = host or config.METRICS_HOST
+    port = port if port is not None else config.METRICS_PORT
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return server
@@ -1,90 +1,409 @@
+import asyncio
+import functools
+import importlib
 import logging
-from telegram import Bot
-from telegram.error import TelegramError
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from bot import metrics
 from bot.config import config
+from bot.ratelimit import TokenBucket
+from bot.records import FineRecord
+
+if TYPE_CHECKING:
+    from database.history import FineChange
 
 logger = logging.getLogger(__name__)
 
+# Ограничение Telegram на длину одного сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+# Символы разметки Markdown, которые убираются из текста
+_MARKDOWN_CHARS = str.maketrans("", "", "*_`[]")
+
+
+@functools.lru_cache(maxsize=1024)
+def _clean_text(value: str) -> str:
+    """Удаление символов разметки Markdown (типов штрафов немного - кэш)"""
+    return value.translate(_MARKDOWN_CHARS)
+
+
+@dataclass
+class _OutgoingMessage:
+    """Сообщение в очереди отправки"""
+
+    chat_id: str
+    text: str
+    fallback_text: Optional[str]
+    future: asyncio.Future
+
 
 class TelegramNotifier:
-    """Отправка уведомлений в Telegram"""
+    """
+    Отправка уведомлений в Telegram
+
+    Сообщения проходят через ограниченную очередь, которую разбирают
+    TELEGRAM_WORKERS воркеров. Частота ограничена общим token bucket и
+    отдельным bucket на каждый чат, RetryAfter от сервера соблюдается.
+    """
 
     def __init__(self):
-        self.bot = Bot(token=config.TELEGRAM_BOT_TOKEN)
+        self._bot = None
         self.chat_id = config.TELEGRAM_CHAT_ID
 
-    async def send_fine_alert(self, fine: dict) -> bool:
-        """Отправка уведомления о штрафе"""
-        try:
-            message = self._format_message(fine)
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._global_bucket = TokenBucket(
+            config.TELEGRAM_GLOBAL_RATE, max(1, int(config.TELEGRAM_GLOBAL_RATE))
+        )
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        metrics.TELEGRAM_QUEUE_DEPTH.set_function(lambda: self.queue_depth)
+
+    @property
+    def bot(self):
+        """Клиент Bot API; telegram импортируется при первом обращении"""
+        if self._bot is None:
+            from telegram import Bot
+            from telegram.request import HTTPXRequest
 
-            # Отправляем БЕЗ parse_mode и с очисткой текста
-            await self.bot.send_message(
-                chat_id=self.chat_id,
-                text=message,
-                parse_mode=None,  # Важно: отключаем Markdown/HTML
+            self._bot = Bot(
+                token=config.TELEGRAM_BOT_TOKEN,
+                base_url=config.TELEGRAM_API_URL,
+                request=HTTPXRequest(connection_pool_size=config.TELEGRAM_WORKERS + 1),
             )
+        return self._bot
+
+    async def check(self) -> bool:
+        """
+        Проверка токена (getMe) при запуске
 
-            logger.info(f"Уведомление отправлено: {fine['id']}")
-            return True
+        Модуль telegram импортируется в потоке, чтобы event loop в это
+        время обслуживал остальные проверки.
+        """
+        from telegram.error import TelegramError
 
+        await asyncio.to_thread(importlib.import_module, "telegram.request")
+        try:
+            me = await self.bot.get_me()
         except TelegramError as e:
-            logger.error(f"Ошибка отправки: {e}")
+            logger.error("Telegram недоступен: %s", e)
+            return False
+        logger.info("Telegram: бот @%s", me.username)
+        return True
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество сообщений, ожидающих отправки"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Запуск воркеров очереди (повторный вызов ничего не делает)"""
+        if self._queue is not None:
+            return
+
+        self._queue = asyncio.Queue(maxsize=config.TELEGRAM_QUEUE_SIZE)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"telegram-worker-{i}")
+            for i in range(config.TELEGRAM_WORKERS)
+        ]
+        logger.info("Очередь Telegram запущена: %s воркеров", config.TELEGRAM_WORKERS)
+
+    async def stop(self, timeout: Optional[float] = 30):
+        """Дождаться отправки очереди (не дольше timeout) и остановить воркеры"""
+        if self._queue is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Не отправлено сообщений при остановке: %s", self.queue_depth
+            )
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Неотправленные сообщения считаются недоставленными (outbox повторит)
+        while not self._queue.empty():
+            message = self._queue.get_nowait()
+            if not message.future.done():
+                message.future.set_result(False)
+        self._queue = None
+        if self._bot is not None:
+            await self._bot.shutdown()
+
+    async def submit(
+        self,
+        text: str,
+        fallback_text: Optional[str] = None,
+        chat_id: Optional[str] = None,
+    ) -> asyncio.Future:
+        """
+        Поставить сообщение в очередь отправки
+
+        Ждёт только свободного места в очереди, не доставки.
+
+        Returns:
+            future с результатом доставки (True/False)
+        """
+        await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(
+            _OutgoingMessage(chat_id or self.chat_id, text, fallback_text, future)
+        )
+        return future
+
+    async def submit_fine_alert(
+        self, fine: FineRecord, chat_id: Optional[str] = None
+    ) -> asyncio.Future:
+        """Поставить уведомление о штрафе в очередь"""
+        return await self.submit(
+            self._format_message(fine), self._format_simple(fine), chat_id
+        )
+
+    async def send_fine_alert(self, fine: FineRecord) -> bool:
+        """Отправка уведомления о штрафе (с ожиданием доставки)"""
+        success = await (await self.submit_fine_alert(fine))
+        if success:
+            logger.info("Уведомление отправлено: %s", fine.id)
+        return success
+
+    async def submit_status_change(
+        self, fine: FineRecord, change: "FineChange", chat_id: Optional[str] = None
+    ) -> asyncio.Future:
+        """Поставить уведомление о смене статуса штрафа в очередь"""
+        return await self.submit(
+            self._format_status_change(fine, change),
+            f"СТАТУС ШТРАФА WB\nID: {fine.id}\n"
+            f"{change.old_status} -> {change.new_status}",
+            chat_id,
+        )
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(config.TELEGRAM_CHAT_RATE, config.TELEGRAM_CHAT_BURST)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _worker(self):
+        """Воркер очереди отправки"""
+        while True:
+            message = await self._queue.get()
+            success = False
+            try:
+                success = await self._deliver(message)
+            except Exception as e:
+                logger.error("Ошибка воркера отправки: %s", e)
+            finally:
+                self._queue.task_done()
+                # В том числе при отмене воркера посреди отправки
+                if not message.future.done():
+                    message.future.set_result(success)
+
+            metrics.TELEGRAM_MESSAGES_TOTAL.labels(
+                result="delivered" if success else "failed"
+            ).inc()
+
+    async def _deliver(self, message: _OutgoingMessage) -> bool:
+        """Доставка одного сообщения с учётом лимитов Telegram"""
+        from telegram.error import (
+            BadRequest,
+            Forbidden,
+            NetworkError,
+            RetryAfter,
+            TelegramError,
+        )
+
+        text = message.text
+        chat_bucket = self._chat_bucket(message.chat_id)
+
+        for attempt in range(1, config.TELEGRAM_MAX_RETRIES + 1):
+            await chat_bucket.acquire()
+            await self._global_bucket.acquire()
 
-            # Пробуем отправить максимально простой текст
             try:
-                simple_text = (
-                    f"НОВЫЙ ШТРАФ WB\n"
-                    f"Тип: {fine['type']}\n"
-                    f"Сумма: {fine['amount']} руб\n"
-                    f"ID: {fine['id']}"
-                )
-
-                await self.bot.send_message(chat_id=self.chat_id, text=simple_text)
-                logger.info(f"Уведомление отправлено (простая версия): {fine['id']}")
+                # Отправляем БЕЗ parse_mode и с очисткой текста
+                with metrics.TELEGRAM_SEND_SECONDS.time():
+                    await self.bot.send_message(
+                        chat_id=message.chat_id,
+                        text=text,
+                        parse_mode=None,  # Важно: отключаем Markdown/HTML
+                    )
                 return True
-            except TelegramError as e2:
-                logger.error(f"Ошибка отправки простой версии: {e2}")
+
+            except RetryAfter as e:
+                # Флуд-контроль: сообщение не доставлено, ждём и повторяем его же
+                metrics.TELEGRAM_ERRORS_TOTAL.labels(error="retry_after").inc()
+                logger.warning("Флуд-контроль Telegram, пауза %s сек", e.retry_after)
+                chat_bucket.pause(e.retry_after)
+
+            except BadRequest as e:
+                # Проблема в самом тексте: пробуем максимально простой вариант
+                metrics.TELEGRAM_ERRORS_TOTAL.labels(error="bad_request").inc()
+                logger.error("Ошибка отправки: %s", e)
+                if message.fallback_text is None or text == message.fallback_text:
+                    return False
+                text = message.fallback_text
+
+            except Forbidden as e:
+                metrics.TELEGRAM_ERRORS_TOTAL.labels(error="forbidden").inc()
+                logger.error("Бот не может писать в чат %s: %s", message.chat_id, e)
                 return False
 
-    def _format_message(self, fine: dict) -> str:
+            except NetworkError as e:
+                metrics.TELEGRAM_ERRORS_TOTAL.labels(error="network").inc()
+                logger.warning("Сетевая ошибка Telegram (попытка %s): %s", attempt, e)
+                await asyncio.sleep(min(2**attempt, 30))
+
+            except TelegramError as e:
+                metrics.TELEGRAM_ERRORS_TOTAL.labels(error="other").inc()
+                logger.error("Ошибка отправки: %s", e)
+                return False
+
+        logger.error(
+            "Сообщение в чат %s не доставлено за %s попыток",
+            message.chat_id,
+            config.TELEGRAM_MAX_RETRIES,
+        )
+        return False
+
+    def _format_message(self, fine: FineRecord) -> str:
         """Форматирование сообщения - БЕЗ спецсимволов Markdown"""
         # Очищаем текст от потенциальных символов Markdown
-        clean_type = (
-            fine["type"]
-            .replace("*", "")
-            .replace("_", "")
-            .replace("`", "")
-            .replace("[", "")
-            .replace("]", "")
+        clean_type = _clean_text(fine.type)
+
+        title = (
+            "Крупный штраф Wildberries"
+            if self._is_high(fine)
+            else "Новый штраф Wildberries"
         )
 
-        return f"""Новый штраф Wildberries
+        return f"""{title}
 
 Тип нарушения: {clean_type}
-Сумма штрафа: {fine['amount']} рублей
-Дата: {fine['date'][:10]}
-Номер заказа: {fine.get('order_id', 'не указан')}
-Статус: {fine['status']}
-ID штрафа: {fine['id']}
+Сумма штрафа: {fine.amount} рублей
+Дата: {fine.date.date()}
+Номер заказа: {fine.order_id or 'не указан'}
+Статус: {fine.status}
+ID штрафа: {fine.id}
 
 Мониторинг активен"""
 
-    async def send_status_message(self, new_fines: int, total_fines: int):
-        """Отправка статусного сообщения"""
-        try:
-            message = (
-                f"Статус мониторинга WB\n\n"
-                f"Новых штрафов: {new_fines}\n"
-                f"Всего в базе: {total_fines}\n"
-                f"Режим работы: {config.MODE}\n"
-                f"Бот активен"
-            )
+    def _format_status_change(self, fine: FineRecord, change: "FineChange") -> str:
+        """Сообщение о смене статуса известного штрафа"""
+        old_status = _clean_text(change.old_status or "не указан")
+        new_status = _clean_text(change.new_status or "не указан")
+        return f"""Изменён статус штрафа Wildberries
 
-            await self.bot.send_message(chat_id=self.chat_id, text=message)
+Статус: {old_status} -> {new_status}
+Тип нарушения: {_clean_text(fine.type)}
+Сумма штрафа: {fine.amount} рублей
+Дата: {fine.date.date()}
+Номер заказа: {fine.order_id or 'не указан'}
+ID штрафа: {fine.id}"""
 
-            return True
+    def _is_high(self, fine: FineRecord) -> bool:
+        """Штраф не меньше HIGH_FINE_THRESHOLD"""
+        return fine.amount >= config.HIGH_FINE_THRESHOLD
 
-        except TelegramError as e:
-            logger.error(f"Ошибка отправки статуса: {e}")
-            return False
+    def _format_digest_line(self, fine: FineRecord) -> str:
+        """Строка штрафа в дайджесте"""
+        clean_type = _clean_text(fine.type)
+        return (
+            f"{fine.amount} руб - {clean_type}, {fine.date.date()}, "
+            f"заказ {fine.order_id or 'не указан'}, {fine.status}, "
+            f"ID {fine.id}"
+        )
+
+    def _format_digest(
+        self, fines: List[FineRecord], total_fines: Optional[int] = None
+    ) -> List[Tuple[str, List[str]]]:
+        """
+        Дайджест штрафов, разбитый на сообщения не длиннее MAX_MESSAGE_LENGTH
+
+        Штрафы идут по убыванию суммы.
+
+        Returns:
+            список (текст сообщения, id штрафов в нём)
+        """
+        fines = sorted(fines, key=lambda fine: fine.amount, reverse=True)
+        total_amount = sum(fine.amount for fine in fines)
+
+        header = f"Новые штрафы Wildberries: {len(fines)} на сумму {total_amount} руб\n"
+        footer = f"\n\nВсего в базе: {total_fines}" if total_fines is not None else ""
+
+        messages = []
+        text, ids = header, []
+        for fine in fines:
+            line = "\n" + self._format_digest_line(fine)
+            if ids and len(text) + len(line) + len(footer) > MAX_MESSAGE_LENGTH:
+                messages.append((text, ids))
+                text, ids = "Новые штрафы Wildberries (продолжение)\n", []
+            text += line
+            ids.append(fine.id)
+
+        messages.append((text + footer, ids))
+        return messages
+
+    async def submit_digest(
+        self,
+        fines: List[FineRecord],
+        total_fines: Optional[int] = None,
+        chat_id: Optional[str] = None,
+    ) -> List[Tuple[List[str], asyncio.Future]]:
+        """
+        Поставить дайджест штрафов в очередь
+
+        Крупные штрафы (от HIGH_FINE_THRESHOLD) уходят отдельными
+        сообщениями, остальные пакуются в минимум сообщений.
+
+        Returns:
+            список (id штрафов, future доставки сообщения с ними)
+        """
+        high = [fine for fine in fines if self._is_high(fine)]
+        regular = [fine for fine in fines if not self._is_high(fine)]
+
+        results = []
+        for fine in sorted(high, key=lambda fine: fine.amount, reverse=True):
+            results.append(([fine.id], await self.submit_fine_alert(fine, chat_id)))
+
+        if regular:
+            for text, ids in self._format_digest(regular, total_fines):
+                results.append((ids, await self.submit(text, chat_id=chat_id)))
+
+        return results
+
+    def _format_simple(self, fine: FineRecord) -> str:
+        """Максимально простой текст на случай ошибки форматирования"""
+        return (
+            f"НОВЫЙ ШТРАФ WB\n"
+            f"Тип: {fine.type}\n"
+            f"Сумма: {fine.amount} руб\n"
+            f"ID: {fine.id}"
+        )
+
+    def _format_status(self, new_fines: int, total_fines: int) -> str:
+        return (
+            f"Статус мониторинга WB\n\n"
+            f"Новых штрафов: {new_fines}\n"
+            f"Всего в базе: {total_fines}\n"
+            f"Режим работы: {config.MODE}\n"
+            f"Бот активен"
+        )
+
+    async def submit_status_message(
+        self, new_fines: int, total_fines: int, chat_id: Optional[str] = None
+    ) -> asyncio.Future:
+        """Поставить статусное сообщение в очередь"""
+        return await self.submit(
+            self._format_status(new_fines, total_fines), chat_id=chat_id
+        )
+
+    async def send_status_message(self, new_fines: int, total_fines: int):
+        """Отправка статусного сообщения"""
+        success = await (await self.submit_status_message(new_fines, total_fines))
+        if not success:
+            logger.error("Ошибка отправки статуса")
+        return success
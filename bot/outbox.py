@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import logging
+import os
+import socket
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from bot import metrics
+from bot.config import config
+from bot.logs import setup_logging
+from bot.notifications import TelegramNotifier
+from bot.records import FineRecord
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """
+    Воркер доставки уведомлений из outbox (таблица notifications)
+
+    Забирает пачку pending-строк через SELECT ... FOR UPDATE SKIP LOCKED,
+    отправляет их через TelegramNotifier и записывает результат. Транзакции
+    короткие и не захватывают время отправки. Несколько воркеров, в том
+    числе в разных процессах, разбирают одну очередь параллельно.
+    """
+
+    def __init__(
+        self,
+        notifier: TelegramNotifier,
+        session_factory=None,
+        worker_id: str = None,
+    ):
+        self.notifier = notifier
+        self.session_factory = session_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        # Новые штрафы за текущий проход очереди: (кабинет, чат) -> (штрафов,
+        # всего в БД). Статус уходит один раз после прохода (flush_status)
+        self._status: Dict[Tuple[str, str], Tuple[int, int]] = {}
+
+    def _claim(self, db: "Session") -> List[dict]:
+        """Захват пачки и загрузка штрафов к ней (отдельная транзакция)"""
+        from database.history import FineHistoryRepository
+        from database.repository import FineRepository, NotificationRepository
+
+        notifications = NotificationRepository(db).claim_batch(
+            config.OUTBOX_BATCH_SIZE, self.worker_id, config.OUTBOX_LEASE
+        )
+        claimed = [
+            {
+                "id": notification.id,
+                "seller_id": notification.seller_id,
+                "fine_id": notification.fine_id,
+                "kind": notification.kind or "fine",
+                "history_id": notification.history_id,
+                "chat_id": notification.chat_id or config.TELEGRAM_CHAT_ID,
+                "retry_count": notification.retry_count,
+            }
+            for notification in notifications
+        ]
+
+        # Штрафы и итоги читаются по каждому кабинету отдельно
+        by_seller: Dict[str, List[dict]] = {}
+        for item in claimed:
+            by_seller.setdefault(item["seller_id"], []).append(item)
+
+        for seller_id, items in by_seller.items():
+            fine_repo = FineRepository(db, seller_id)
+            fines = fine_repo.get_by_ids([item["fine_id"] for item in items])
+            total_fines = fine_repo.get_fines_count()
+            # К уведомлению о смене статуса - его строка fine_history; у
+            # поставленных до миграции 11 - последняя смена статуса штрафа
+            status = [item for item in items if item["kind"] == "status"]
+            history = FineHistoryRepository(db, seller_id)
+            changes = history.get_by_ids(
+                [item["history_id"] for item in status if item["history_id"]]
+            )
+            latest = history.get_latest_status(
+                [item["fine_id"] for item in status if not item["history_id"]]
+            )
+            for item in items:
+                fine = fines.get(item["fine_id"])
+                item["fine"] = FineRecord.from_model(fine) if fine else None
+                item["change"] = changes.get(item["history_id"]) or latest.get(
+                    item["fine_id"]
+                )
+                item["total_fines"] = total_fines
+
+        return claimed
+
+    def _record(self, db: "Session", sent: List[dict], failed: List[dict]):
+        """Запись итогов доставки (отдельная транзакция)"""
+        from database.repository import FineRepository, NotificationRepository
+
+        NotificationRepository(db).record_results(
+            [item["id"] for item in sent],
+            [
+                {
+                    "id": item["id"],
+                    "retry_count": item["retry_count"],
+                    "error": item["error"],
+                }
+                for item in failed
+            ],
+            config.OUTBOX_MAX_ATTEMPTS,
+            config.OUTBOX_RETRY_DELAY,
+        )
+
+        sent_by_seller: Dict[str, List[str]] = {}
+        for item in sent:
+            if item["kind"] != "fine":
+                continue
+            sent_by_seller.setdefault(item["seller_id"], []).append(item["fine_id"])
+        for seller_id, fine_ids in sent_by_seller.items():
+            FineRepository(db, seller_id).mark_as_notified_batch(fine_ids)
+
+    async def _submit(
+        self, chat_id: str, items: List[dict]
+    ) -> List[Tuple[List[dict], asyncio.Future]]:
+        """Постановка уведомлений одного кабинета в один чат в очередь отправки"""
+        deliveries = [
+            (
+                [item],
+                await self.notifier.submit_status_change(
+                    item["fine"], item["change"], chat_id
+                ),
+            )
+            for item in items
+            if item["kind"] == "status"
+        ]
+        items = [item for item in items if item["kind"] != "status"]
+        if not items:
+            return deliveries
+
+        total_fines = items[0]["total_fines"]
+        if config.NOTIFY_MODE == "digest":
+            by_fine_id: Dict[str, List[dict]] = {}
+            for item in items:
+                by_fine_id.setdefault(item["fine_id"], []).append(item)
+
+            digest = await self.notifier.submit_digest(
+                [same[0]["fine"] for same in by_fine_id.values()], total_fines, chat_id
+            )
+            return deliveries + [
+                (
+                    [item for fine_id in fine_ids for item in by_fine_id[fine_id]],
+                    future,
+                )
+                for fine_ids, future in digest
+            ]
+
+        for item in items:
+            deliveries.append(
+                ([item], await self.notifier.submit_fine_alert(item["fine"], chat_id))
+            )
+        # Статус отправляем только если есть новые штрафы
+        key = (items[0]["seller_id"], chat_id)
+        count, _ = self._status.get(key, (0, 0))
+        self._status[key] = (count + len(items), total_fines)
+        return deliveries
+
+    async def flush_status(self):
+        """Статусное сообщение о новых штрафах прохода в каждый чат"""
+        status, self._status = self._status, {}
+        for (_, chat_id), (count, total_fines) in status.items():
+            await self.notifier.submit_status_message(count, total_fines, chat_id)
+
+    async def drain_once(self) -> int:
+        """
+        Одна итерация: захват, отправка, запись итогов
+
+        Returns:
+            количество обработанных уведомлений
+        """
+        from database.models import run_db
+
+        claimed = await run_db(self._claim, session_factory=self.session_factory)
+        if not claimed:
+            return 0
+
+        failed = []
+        by_chat: Dict[Tuple[str, str], List[dict]] = {}
+        for item in claimed:
+            if item["fine"] is None or (
+                item["kind"] == "status" and item["change"] is None
+            ):
+                item["error"] = "Штраф не найден в БД"
+                item["retry_count"] = config.OUTBOX_MAX_ATTEMPTS
+                failed.append(item)
+            else:
+                key = (item["seller_id"], item["chat_id"])
+                by_chat.setdefault(key, []).append(item)
+
+        deliveries = []
+        for (_, chat_id), items in by_chat.items():
+            deliveries.extend(await self._submit(chat_id, items))
+
+        sent = []
+        with metrics.STAGE_SEND.time():
+            results = await asyncio.gather(*(future for _, future in deliveries))
+        for (items, _), success in zip(deliveries, results):
+            for item in items:
+                if success:
+                    sent.append(item)
+                else:
+                    item["error"] = "Не доставлено в Telegram"
+                    failed.append(item)
+
+        await run_db(self._record, sent, failed, session_factory=self.session_factory)
+        logger.info(
+            "Outbox [%s]: доставлено %s, ошибок %s",
+            self.worker_id,
+            len(sent),
+            len(failed),
+        )
+        return len(claimed)
+
+    async def run(self):
+        """Бесконечный цикл разбора outbox"""
+        interval = config.OUTBOX_POLL_INTERVAL
+        if config.NOTIFY_MODE == "digest":
+            # Окно дайджеста: копим уведомления между заходами
+            interval = max(interval, config.DIGEST_WINDOW)
+
+        logger.info("Outbox воркер %s запущен", self.worker_id)
+        while True:
+            try:
+                processed = await self.drain_once()
+                # Полная пачка - очередь не пуста, продолжаем без паузы
+                if processed < config.OUTBOX_BATCH_SIZE:
+                    await self.flush_status()
+            except Exception as e:
+                logger.error("Ошибка outbox воркера: %s", e, exc_info=True)
+                processed = 0
+
+            if processed < config.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(interval)
+
+
+async def run_workers(count: int, metrics_port: int = None):
+    """Запуск count воркеров с общим ограничителем отправки"""
+    metrics_server = await metrics.start_metrics_server(port=metrics_port)
+    notifier = TelegramNotifier()
+    await notifier.start()
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    workers = [OutboxWorker(notifier, worker_id=f"{base_id}:{i}") for i in range(count)]
+    try:
+        await asyncio.gather(*(worker.run() for worker in workers))
+    finally:
+        await notifier.stop()
+        if metrics_server is not None:
+            metrics_server.close()
+
+
+def main():
+    """Точка входа: отдельный процесс доставки уведомлений"""
+    parser = argparse.ArgumentParser(description="Доставка уведомлений из outbox")
+    parser.add_argument("--workers", type=int, default=1, help="воркеров в процессе")
+    parser.add_argument(
+        "--metrics-port", type=int, help="порт /metrics (по умолчанию METRICS_PORT)"
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        asyncio.run(run_workers(args.workers, args.metrics_port))
+    except KeyboardInterrupt:
+        print("\nВоркер остановлен")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Ограничение частоты запросов к внешним API (Telegram, WB)"""
+
+import asyncio
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты (token bucket)
+
+    Пропускает в среднем rate операций в секунду, допуская всплеск до
+    capacity. pause() блокирует выдачу токенов, например на время
+    retry_after из ответа Telegram.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated: Optional[float] = None
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        if self._updated is not None:
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+    async def acquire(self):
+        """Дождаться и забрать один токен"""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд"""
+        now = asyncio.get_running_loop().time()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = self._blocked_until
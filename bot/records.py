@@ -0,0 +1,118 @@
+"""
+Штраф в памяти бота
+
+FineRecord создаётся один раз на границе с API (wb_client) и дальше
+передаётся в репозитории и уведомления без повторного разбора: дата уже
+datetime, сумма - Decimal с копейками, строки type и status интернированы
+(их значений немного, а штрафов - миллионы). Некорректные записи
+отбрасываются сразу с InvalidFineError.
+"""
+
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict
+
+CENTS = Decimal("0.01")
+# Ограничения колонок таблицы fines
+MAX_ID_LENGTH = 50
+MAX_TYPE_LENGTH = 200
+MAX_STATUS_LENGTH = 50
+MAX_AMOUNT = Decimal("99999999.99")  # DECIMAL(10, 2)
+
+
+class InvalidFineError(ValueError):
+    """Штраф из API не проходит проверку"""
+
+
+def parse_fine_date(value: str) -> datetime:
+    """
+    Разбор даты штрафа из ISO-строки API
+
+    Зона отбрасывается так же, как это делает PostgreSQL для колонки
+    TIMESTAMP без зоны, чтобы даты из API и из БД были сравнимы.
+    """
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def _text(data: Dict[str, Any], key: str, max_length: int) -> str:
+    value = data.get(key)
+    if not isinstance(value, str) or not value:
+        raise InvalidFineError(f"{key}: ожидается непустая строка, получено {value!r}")
+    if len(value) > max_length:
+        raise InvalidFineError(f"{key}: длиннее {max_length} символов")
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class FineRecord:
+    """Штраф: неизменяемый, со слотами вместо __dict__"""
+
+    id: str
+    date: datetime
+    type: str
+    amount: Decimal
+    order_id: str
+    status: str
+
+    @classmethod
+    def from_api(cls, data: Dict[str, Any]) -> "FineRecord":
+        """
+        Штраф из ответа API
+
+        Raises:
+            InvalidFineError: нет обязательного поля или значение некорректно
+        """
+        if not isinstance(data, dict):
+            raise InvalidFineError(f"ожидается объект, получено {data!r}")
+
+        raw_date = data.get("date")
+        try:
+            fine_date = parse_fine_date(raw_date)
+        except (TypeError, ValueError, AttributeError):
+            raise InvalidFineError(f"date: некорректная дата {raw_date!r}")
+
+        raw_amount = data.get("amount")
+        if isinstance(raw_amount, bool):
+            raise InvalidFineError(f"amount: некорректная сумма {raw_amount!r}")
+        try:
+            amount = Decimal(str(raw_amount)).quantize(CENTS)
+        except (InvalidOperation, ValueError):
+            raise InvalidFineError(f"amount: некорректная сумма {raw_amount!r}")
+        if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+            raise InvalidFineError(f"amount: сумма вне диапазона {raw_amount!r}")
+
+        order_id = data.get("order_id")
+        return cls(
+            id=_text(data, "id", MAX_ID_LENGTH),
+            date=fine_date,
+            type=sys.intern(_text(data, "type", MAX_TYPE_LENGTH)),
+            amount=amount,
+            order_id=str(order_id)[:MAX_ID_LENGTH] if order_id is not None else "",
+            status=sys.intern(_text(data, "status", MAX_STATUS_LENGTH)),
+        )
+
+    @classmethod
+    def from_model(cls, fine) -> "FineRecord":
+        """Штраф из строки таблицы fines"""
+        return cls(
+            id=fine.id,
+            date=fine.date,
+            type=sys.intern(fine.type),
+            amount=Decimal(fine.amount),
+            order_id=fine.order_id or "",
+            status=sys.intern(fine.status or ""),
+        )
+
+    def as_row(self, seller_id: str) -> Dict[str, Any]:
+        """Строка для INSERT в fines"""
+        return {
+            "seller_id": seller_id,
+            "id": self.id,
+            "date": self.date,
+            "type": self.type,
+            "amount": self.amount,
+            "order_id": self.order_id,
+            "status": self.status,
+        }
@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import logging
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bot import metrics
+from bot.config import config
+from bot.sellers import Seller
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CycleResult:
+    """Итог одного цикла опроса кабинета"""
+
+    fetched: int = 0  # штрафов в ответе API
+    new: int = 0  # из них новых
+    error: Optional[str] = None  # throttled, unavailable или error
+    retry_after: Optional[float] = None  # пауза, которую просит API, сек
+
+
+class AdaptiveInterval:
+    """
+    Интервал опроса одного кабинета, подстраиваемый под поток штрафов
+
+    Начинается с check_interval кабинета. Цикл с новыми штрафами сжимает
+    интервал (POLL_BURST_FACTOR), пустой цикл растягивает его
+    (POLL_IDLE_FACTOR); интервал не выходит за POLL_MIN_INTERVAL и
+    POLL_MAX_INTERVAL, но верхняя граница не ниже check_interval: редкий
+    опрос, заданный для кабинета, не ускоряется. Ошибки API подряд
+    увеличивают паузу экспоненциально (POLL_ERROR_FACTOR) и не меняют
+    интервал, к которому опрос вернётся после восстановления. Retry-After
+    от API соблюдается, даже если он больше верхней границы.
+    """
+
+    def __init__(
+        self,
+        base: float,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+    ):
+        self.min_interval = min_interval or config.POLL_MIN_INTERVAL
+        self.max_interval = max(max_interval or config.POLL_MAX_INTERVAL, base)
+        self.current = self._clamp(base)
+        self.failures = 0
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def next_delay(self, result: CycleResult) -> float:
+        """Пауза до следующего цикла по итогу текущего, сек"""
+        if result.error:
+            self.failures += 1
+            delay = min(
+                self.max_interval,
+                self.current * config.POLL_ERROR_FACTOR**self.failures,
+            )
+            return max(delay, result.retry_after or 0.0)
+
+        self.failures = 0
+        factor = config.POLL_BURST_FACTOR if result.new else config.POLL_IDLE_FACTOR
+        self.current = self._clamp(self.current * factor)
+        return self.current
+
+
+class PollingScheduler:
+    """
+    Опрос множества кабинетов продавцов в одном event loop
+
+    У каждого кабинета своя задача: одновременно идёт не больше одного его
+    цикла, в том числе когда настройки кабинета меняются посреди цикла.
+    Циклы запускаются по расписанию от начала предыдущего цикла (fixed
+    rate), интервал подбирает AdaptiveInterval. Если цикл длился
+    дольше интервала, следующий начинается сразу, без догоняющих запусков;
+    после ошибки API пауза отсчитывается от её получения. Первые запуски
+    разнесены случайным сдвигом в пределах периода, чтобы сотни кабинетов
+    не обращались к API одновременно. Всего параллельно выполняется не
+    больше POLL_CONCURRENCY циклов; asyncio.Semaphore пропускает ожидающих
+    по очереди, поэтому ни один кабинет не голодает. Список кабинетов
+    перечитывается раз в SELLERS_RELOAD_INTERVAL секунд.
+    """
+
+    def __init__(
+        self,
+        poll: Callable[[Seller], Awaitable[CycleResult]],
+        load_sellers: Callable[[], Awaitable[List[Seller]]],
+        concurrency: Optional[int] = None,
+        reload_interval: Optional[float] = None,
+    ):
+        self.poll = poll
+        self.load_sellers = load_sellers
+        self.concurrency = concurrency or config.POLL_CONCURRENCY
+        self.reload_interval = reload_interval or config.SELLERS_RELOAD_INTERVAL
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._sellers: Dict[str, Seller] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Идущие циклы кабинетов (переживают отмену задачи кабинета)
+        self._cycles: Dict[str, asyncio.Future] = {}
+
+    @property
+    def sellers(self) -> List[Seller]:
+        return list(self._sellers.values())
+
+    async def run(self):
+        """Опрос до отмены задачи"""
+        try:
+            while True:
+                try:
+                    self._sync(await self.load_sellers())
+                except Exception as e:
+                    # Продолжаем со старым списком кабинетов
+                    logger.error("Не удалось загрузить кабинеты: %s", e)
+                await asyncio.sleep(self.reload_interval)
+        finally:
+            await self.stop()
+
+    def _sync(self, sellers: List[Seller]):
+        """Запуск задач новых и изменённых кабинетов, остановка удалённых"""
+        wanted = {seller.id: seller for seller in sellers}
+
+        for seller_id in list(self._tasks):
+            if wanted.get(seller_id) != self._sellers.get(seller_id):
+                self._tasks.pop(seller_id).cancel()
+                self._sellers.pop(seller_id)
+
+        # Разносим старты, только если кабинетов несколько
+        spread = len(wanted) > 1
+        started = 0
+        for seller_id, seller in wanted.items():
+            if seller_id in self._tasks:
+                continue
+            delay = random.uniform(0, seller.check_interval) if spread else 0
+            self._sellers[seller_id] = seller
+            self._tasks[seller_id] = asyncio.create_task(
+                self._seller_loop(seller, delay, self._cycles.get(seller_id)),
+                name=f"poll-{seller_id}",
+            )
+            started += 1
+
+        if started:
+            logger.info(
+                "Опрос кабинетов: %s (новых %s, параллельно до %s)",
+                len(self._tasks),
+                started,
+                self.concurrency,
+            )
+
+    async def _seller_loop(
+        self, seller: Seller, delay: float, previous: Optional[asyncio.Future] = None
+    ):
+        """
+        Цикл опроса одного кабинета
+
+        Args:
+            previous: цикл прежней задачи кабинета (до смены настроек),
+                новые циклы начинаются только после его завершения
+        """
+        if previous is not None:
+            # wait, а не gather: отмена этой задачи не должна отменить previous
+            await asyncio.wait({previous})
+
+        loop = asyncio.get_running_loop()
+        interval = AdaptiveInterval(seller.check_interval)
+        interval_metric = metrics.POLL_INTERVAL_SECONDS.labels(seller=seller.id)
+        lag_metric = metrics.CYCLE_LAG_SECONDS.labels(seller=seller.id)
+
+        deadline = loop.time() + delay
+        while True:
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+
+            async with self._semaphore:
+                started = loop.time()
+                # Насколько цикл запустился позже запланированного
+                lag_metric.set(max(0.0, started - deadline))
+
+                cycle = asyncio.ensure_future(self.poll(seller))
+                self._cycles[seller.id] = cycle
+                cycle.add_done_callback(functools.partial(self._forget, seller.id))
+                try:
+                    # Отмена задачи (кабинет изменён в _sync) не прерывает
+                    # начатый цикл: запросы к БД в потоках всё равно дойдут
+                    # до конца, и новый цикл не должен пойти параллельно
+                    result = await asyncio.shield(cycle)
+                except Exception as e:
+                    logger.error("[%s] Ошибка цикла опроса: %s", seller.id, e)
+                    result = CycleResult(error="error")
+
+            # Небольшой разброс, чтобы кабинеты не синхронизировались со временем
+            pause = interval.next_delay(result) * random.uniform(0.95, 1.05)
+            interval_metric.set(pause)
+            if result.error:
+                deadline = loop.time() + pause
+                logger.info(
+                    "[%s] API недоступен (%s), повтор через %.1f сек",
+                    seller.id,
+                    result.error,
+                    pause,
+                )
+            else:
+                deadline = max(started + pause, loop.time())
+                logger.debug("[%s] Следующая проверка через %.1f сек", seller.id, pause)
+
+    def _forget(self, seller_id: str, cycle: asyncio.Future):
+        if self._cycles.get(seller_id) is cycle:
+            del self._cycles[seller_id]
+
+    async def stop(self):
+        """Остановка всех задач опроса и начатых циклов"""
+        tasks = list(self._tasks.values()) + list(self._cycles.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._cycles.clear()
+        self._sellers.clear()
@@ -0,0 +1,114 @@
+"""
+Кэш уже сохранённых штрафов в памяти процесса
+
+Почти все штрафы в ответе API бот уже видел в прошлом цикле: окно
+загрузки перекрывается на FETCH_OVERLAP_MINUTES. Кэш помнит id штрафа и
+хэш его изменяемых полей, поэтому неизменившиеся штрафы отбрасываются до
+запроса к БД, а в репозиторий попадают только новые и изменившиеся.
+
+Кэш - только ускорение: промах всегда уходит в БД, где upsert сам
+разбирается, новый штраф или нет. Поэтому после перезапуска (кэш пуст или
+прогрет из БД) и после вытеснения записей результат тот же, что без кэша.
+В кэш попадают только штрафы из закоммиченных транзакций.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Iterable, List, Tuple
+
+from bot import metrics
+from bot.records import FineRecord
+
+
+def fingerprint(
+    fine_date: datetime, fine_type: str, amount: Decimal, status: str
+) -> int:
+    """Хэш полей штрафа, изменение которых нужно сохранить в БД"""
+    return hash((fine_date, fine_type, Decimal(amount), status or ""))
+
+
+class SeenFineCache:
+    """
+    LRU с TTL: id штрафа -> хэш полей, не больше max_size записей
+
+    Один кэш на продавца; циклы одного продавца идут последовательно,
+    поэтому блокировки не нужны.
+    """
+
+    def __init__(
+        self,
+        seller_id: str,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._hit_metric = metrics.FINE_CACHE_LOOKUPS_TOTAL.labels(
+            seller=seller_id, result="hit"
+        )
+        self._miss_metric = metrics.FINE_CACHE_LOOKUPS_TOTAL.labels(
+            seller=seller_id, result="miss"
+        )
+        self._size_metric = metrics.FINE_CACHE_SIZE.labels(seller=seller_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def unseen(self, fines: List[FineRecord]) -> List[FineRecord]:
+        """Штрафы, которых нет в кэше или у которых изменились поля"""
+        if self.max_size <= 0:
+            return fines
+        now = self._clock()
+        entries = self._entries
+        result = []
+        for fine in fines:
+            entry = entries.get(fine.id)
+            if (
+                entry is not None
+                and entry[1] > now
+                and entry[0]
+                == fingerprint(fine.date, fine.type, fine.amount, fine.status)
+            ):
+                entries.move_to_end(fine.id)
+                continue
+            result.append(fine)
+
+        hits = len(fines) - len(result)
+        self.hits += hits
+        self.misses += len(result)
+        self._hit_metric.inc(hits)
+        self._miss_metric.inc(len(result))
+        return result
+
+    def remember(self, fines: Iterable[FineRecord]):
+        """Запомнить штрафы после коммита транзакции, в которой они сохранены"""
+        self.load(
+            (fine.id, fine.date, fine.type, fine.amount, fine.status) for fine in fines
+        )
+
+    def load(self, rows: Iterable[Tuple[str, datetime, str, Decimal, str]]):
+        """Запомнить строки (id, date, type, amount, status), например из БД"""
+        if self.max_size <= 0:
+            return
+        expires = self._clock() + self.ttl
+        entries = self._entries
+        for fine_id, fine_date, fine_type, amount, status in rows:
+            entries[fine_id] = (
+                fingerprint(fine_date, fine_type, amount, status),
+                expires,
+            )
+            entries.move_to_end(fine_id)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+        self._size_metric.set(len(entries))
+
+    def clear(self):
+        self._entries.clear()
+        self._size_metric.set(0)
@@ -0,0 +1,144 @@
+"""
+Кабинеты продавцов WB, которые опрашивает бот
+
+Кабинеты хранятся в таблице seller_accounts. Пока она пуста, бот
+работает с одним кабинетом 'default' из настроек .env (WB_API_KEY,
+TELEGRAM_CHAT_ID, CHECK_INTERVAL), как раньше.
+
+Управление кабинетами:
+    python -m bot.sellers list
+    python -m bot.sellers add shop1 "Магазин 1" --api-key KEY --chat 123 --chat 456
+    python -m bot.sellers disable shop1
+"""
+
+import argparse
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from bot.config import config
+
+if TYPE_CHECKING:
+    # Модули БД импортируются в функциях: бот грузит SQLAlchemy
+    # только при первом обращении к БД
+    from sqlalchemy.orm import Session
+
+    from database.models import SellerAccount
+
+
+@dataclass(frozen=True)
+class Seller:
+    """Настройки опроса одного кабинета (не привязаны к сессии БД)"""
+
+    id: str
+    name: str
+    api_key: str
+    chat_ids: Tuple[str, ...]
+    check_interval: int
+
+    @property
+    def cursor_name(self) -> str:
+        """Имя курсора загрузки в fetch_cursors"""
+        from database.models import DEFAULT_SELLER_ID
+
+        if self.id == DEFAULT_SELLER_ID:
+            # Курсор единственного кабинета существовал до seller_accounts
+            return "fines"
+        return f"fines:{self.id}"
+
+
+def default_seller() -> Seller:
+    """Кабинет из настроек .env"""
+    from database.models import DEFAULT_SELLER_ID
+
+    return Seller(
+        id=DEFAULT_SELLER_ID,
+        name="default",
+        api_key=config.WB_API_KEY,
+        chat_ids=(config.TELEGRAM_CHAT_ID,),
+        check_interval=config.CHECK_INTERVAL,
+    )
+
+
+def _to_seller(account: "SellerAccount") -> Seller:
+    chat_ids = tuple(
+        chat_id.strip() for chat_id in account.chat_ids.split(",") if chat_id.strip()
+    )
+    return Seller(
+        id=account.id,
+        name=account.name,
+        api_key=account.api_key,
+        chat_ids=chat_ids,
+        check_interval=account.check_interval or config.CHECK_INTERVAL,
+    )
+
+
+def load_sellers(db: "Session") -> List[Seller]:
+    """Включённые кабинеты; при пустой таблице - кабинет из .env"""
+    from database.repository import SellerRepository
+
+    accounts = SellerRepository(db).get_all()
+    if not accounts:
+        return [default_seller()]
+    return [_to_seller(account) for account in accounts if account.enabled]
+
+
+def get_seller(db: "Session", seller_id: str) -> Optional[Seller]:
+    """Кабинет по id (включённый или нет); 'default' - из .env, если его нет в БД"""
+    from database.models import DEFAULT_SELLER_ID, SellerAccount
+
+    account = db.get(SellerAccount, seller_id)
+    if account is not None:
+        return _to_seller(account)
+    if seller_id == DEFAULT_SELLER_ID:
+        return default_seller()
+    return None
+
+
+def main(argv: Optional[List[str]] = None):
+    """Управление кабинетами из командной строки"""
+    from database.models import SessionLocal, init_db
+    from database.repository import SellerRepository
+
+    parser = argparse.ArgumentParser(description="Кабинеты продавцов WB")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="список кабинетов")
+
+    add = commands.add_parser("add", help="добавить или обновить кабинет")
+    add.add_argument("seller_id")
+    add.add_argument("name")
+    add.add_argument("--api-key", required=True)
+    add.add_argument("--chat", action="append", required=True, help="id чата")
+    add.add_argument("--interval", type=int, help="период опроса, сек")
+
+    for command in ("enable", "disable"):
+        commands.add_parser(command).add_argument("seller_id")
+
+    args = parser.parse_args(argv)
+    init_db()
+
+    db = SessionLocal()
+    try:
+        repo = SellerRepository(db)
+        if args.command == "list":
+            for account in repo.get_all():
+                state = "вкл" if account.enabled else "выкл"
+                interval = account.check_interval or config.CHECK_INTERVAL
+                print(
+                    f"{account.id:20} {state:5} {interval:>5} сек  "
+                    f"чаты: {account.chat_ids}  {account.name}"
+                )
+        elif args.command == "add":
+            repo.save(
+                args.seller_id, args.name, args.api_key, args.chat, args.interval
+            )
+            print(f"✅ Кабинет {args.seller_id} сохранён")
+        elif not repo.set_enabled(args.seller_id, args.command == "enable"):
+            print(f"❌ Кабинет {args.seller_id} не найден")
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Несколько копий бота: кабинеты делятся между живыми копиями (SHARDING=true)
+
+Каждая копия раз в REPLICA_HEARTBEAT секунд отмечается в bot_replicas;
+копия без отметки дольше REPLICA_TTL считается упавшей и удаляется.
+Кабинет достаётся копии с наибольшим весом hash(кабинет, копия)
+(rendezvous hashing): все копии считают распределение сами, без
+координатора, а при падении или добавлении копии переезжают только её
+кабинеты.
+
+Пока копии не увидели одинаковый состав (до одного периода heartbeat),
+две из них могут считать кабинет своим. Поэтому цикл кабинета идёт только
+под арендой в poll_leases: копия продлевает аренды своих кабинетов при
+каждой отметке и отдаёт остальные, аренда упавшей копии истекает через
+REPLICA_TTL. Даже при гонке уведомление о штрафе ставится один раз: новым
+штраф считает только транзакция, которая его вставила
+(FineRepository.save_fines_batch).
+
+Команды в чатах (getUpdates) читает одна копия - с наименьшим id среди
+живых (is_leader).
+"""
+
+import hashlib
+import logging
+import os
+import socket
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from bot import metrics
+from bot.config import config
+from bot.scheduler import CycleResult
+from bot.sellers import Seller
+from database.models import run_db
+from database.repository import ReplicaRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _weight(key: str, replica_id: str) -> int:
+    digest = hashlib.blake2b(f"{key}\0{replica_id}".encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+def rendezvous_owner(key: str, replicas: List[str]) -> Optional[str]:
+    """Копия, которой достаётся ключ (None, если копий нет)"""
+    return max(replicas, key=lambda replica_id: _weight(key, replica_id), default=None)
+
+
+def default_replica_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ShardCoordinator:
+    """Распределение кабинетов между копиями бота и аренды опроса"""
+
+    def __init__(self, replica_id: Optional[str] = None, ttl: Optional[float] = None):
+        self.replica_id = replica_id or config.REPLICA_ID or default_replica_id()
+        self.ttl = ttl or config.REPLICA_TTL
+        self.replicas: List[str] = []
+
+    @property
+    def is_leader(self) -> bool:
+        """Копия с наименьшим id среди живых (по последней отметке)"""
+        return bool(self.replicas) and self.replicas[0] == self.replica_id
+
+    def _heartbeat(self, db: Session, seller_ids: List[str]):
+        repo = ReplicaRepository(db, self.replica_id)
+        replicas = repo.heartbeat(self.ttl)
+        owned = [
+            seller_id
+            for seller_id in seller_ids
+            if rendezvous_owner(seller_id, replicas) == self.replica_id
+        ]
+        repo.renew(owned, self.ttl)
+        return replicas, owned
+
+    async def assign(self, sellers: List[Seller]) -> List[Seller]:
+        """
+        Отметка копии и её доля кабинетов
+
+        Вызывается при каждой загрузке списка кабинетов, то есть раз в
+        REPLICA_HEARTBEAT секунд.
+        """
+        replicas, owned = await run_db(
+            self._heartbeat, [seller.id for seller in sellers]
+        )
+        if replicas != self.replicas:
+            logger.info(
+                "Копии бота: %s (%s), кабинетов у %s: %s из %s",
+                len(replicas),
+                ", ".join(replicas),
+                self.replica_id,
+                len(owned),
+                len(sellers),
+            )
+        self.replicas = replicas
+        metrics.REPLICAS_ALIVE.set(len(replicas))
+        metrics.SELLERS_OWNED.set(len(owned))
+        owned = set(owned)
+        return [seller for seller in sellers if seller.id in owned]
+
+    def _acquire(self, db: Session, seller_id: str) -> bool:
+        return ReplicaRepository(db, self.replica_id).acquire(seller_id, self.ttl)
+
+    def guard(
+        self, poll: Callable[[Seller], Awaitable[CycleResult]]
+    ) -> Callable[[Seller], Awaitable[CycleResult]]:
+        """Цикл опроса, который выполняется только под арендой кабинета"""
+
+        async def guarded(seller: Seller) -> CycleResult:
+            if not await run_db(self._acquire, seller.id):
+                # Кабинет ещё у прежней копии: она отдаст его при своей отметке
+                metrics.LEASE_CONFLICTS_TOTAL.inc()
+                logger.info("[%s] Кабинет опрашивает другая копия", seller.id)
+                return CycleResult()
+            return await poll(seller)
+
+        return guarded
+
+    def _leave(self, db: Session):
+        ReplicaRepository(db, self.replica_id).leave()
+
+    async def leave(self):
+        """Выход из состава при остановке: кабинеты сразу переходят к другим"""
+        await run_db(self._leave)
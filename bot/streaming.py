@@ -0,0 +1,139 @@
+"""
+Потоковый разбор ответа API со списком штрафов
+
+Ответ вида {"data": [{...}, {...}], "next": "..."} разбирается по мере
+поступления: каждый штраф отдаётся сразу, как только его объект пришёл
+целиком, поэтому в памяти не держится ни тело ответа, ни весь список.
+"""
+
+import codecs
+import json
+from typing import AsyncIterator, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+_WHITESPACE = " \t\r\n"
+
+
+class FinesStreamParser:
+    """
+    Инкрементальный разбор объекта с массивом "data"
+
+    feed() принимает очередной кусок байтов и возвращает штрафы, которые
+    в нём завершились. close() проверяет, что ответ закончился, и
+    возвращает остальные поля верхнего уровня (например "next").
+    """
+
+    def __init__(self, key: str = "data"):
+        self.key = key
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._state = "prefix"
+        self._prefix: List[str] = []
+        self._buffer = ""
+        self._suffix: List[str] = []
+        # Состояние поиска '"data": [' на верхнем уровне
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._token: List[str] = []
+        self._last_key: Optional[str] = None
+        self._after_colon = False
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        text = self._decoder.decode(chunk)
+        if self._state == "prefix":
+            text = self._scan_prefix(text)
+        if self._state == "items":
+            return self._read_items(text)
+        if self._state == "suffix":
+            self._suffix.append(text)
+        return []
+
+    def _scan_prefix(self, text: str) -> str:
+        """Поиск начала массива; возвращает текст после '['"""
+        for index, char in enumerate(text):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = "".join(self._token)
+                else:
+                    self._token.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._token = []
+                if not self._after_colon:
+                    self._last_key = None
+            elif char == ":":
+                self._after_colon = self._depth == 1
+            elif char == "[" and self._depth == 1:
+                if self._after_colon and self._last_key == self.key:
+                    self._prefix.append(text[:index])
+                    self._state = "items"
+                    return text[index + 1 :]
+                self._depth += 1
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+            elif char == ",":
+                self._after_colon = False
+                self._last_key = None
+        self._prefix.append(text)
+        return ""
+
+    def _read_items(self, text: str) -> List[Dict]:
+        buffer = self._buffer + text
+        items = []
+        position = 0
+        length = len(buffer)
+        while True:
+            while position < length and buffer[position] in _WHITESPACE + ",":
+                position += 1
+            if position == length:
+                break
+            if buffer[position] == "]":
+                self._state = "suffix"
+                self._suffix.append(buffer[position + 1 :])
+                position = length
+                break
+            try:
+                item, position = self._json.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Объект ещё не пришёл целиком
+                break
+            items.append(item)
+        self._buffer = buffer[position:]
+        return items
+
+    def close(self) -> Dict:
+        """Поля верхнего уровня, кроме массива; ошибка, если ответ оборван"""
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            self.feed(tail.encode())
+
+        if self._state == "prefix":
+            # Массива нет (например, "data": null) - обычный разбор
+            return json.loads("".join(self._prefix))
+        if self._state == "items":
+            raise ValueError("Ответ API оборван внутри списка штрафов")
+        return json.loads("".join(self._prefix) + "null" + "".join(self._suffix))
+
+
+async def achunks(items: AsyncIterator[T], size: int) -> AsyncIterator[List[T]]:
+    """Пачки по size элементов из асинхронного итератора"""
+    chunk: List[T] = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
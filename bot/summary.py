@@ -0,0 +1,110 @@
+"""
+Итоги штрафов в памяти для команд в чатах (/stats, /today, /top, /unpaid)
+
+SummaryCache - копия daily_stats (день, тип, статус -> количество и сумма)
+по кабинетам. При запуске и раз в SUMMARY_REFRESH секунд она целиком
+перечитывается из daily_stats (строк там O(дней x типов), не штрафов), а
+между перечитываниями цикл опроса применяет к ней те же изменения, что
+записал в daily_stats, сразу после коммита. Так ответы на команды не
+обращаются к БД и не ждут её.
+
+Перечитывание исправляет любые расхождения: загрузки bot.backfill,
+кабинеты, которые опрашивает другая копия бота (SHARDING), и пачку,
+закоммиченную одновременно с чтением daily_stats.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+# Статусы, по которым платить уже не нужно
+CLOSED_STATUSES = frozenset({"Оплачен", "Отменён"})
+
+# (количество, сумма)
+Total = Tuple[int, Decimal]
+ZERO: Total = (0, Decimal(0))
+
+
+def _add(totals: Dict, key, count: int, amount: Decimal):
+    current_count, current_amount = totals.get(key, ZERO)
+    count, amount = current_count + count, current_amount + amount
+    if count or amount:
+        totals[key] = (count, amount)
+    else:
+        totals.pop(key, None)
+
+
+class _SellerSummary:
+    """Итоги одного кабинета: по дням (тип, статус) и по статусам за всё время"""
+
+    __slots__ = ("days", "statuses")
+
+    def __init__(self):
+        self.days: Dict[date, Dict[Tuple[str, str], Total]] = {}
+        self.statuses: Dict[str, Total] = {}
+
+    def add(self, day: date, fine_type: str, status: str, count: int, amount):
+        cells = self.days.setdefault(day, {})
+        _add(cells, (fine_type, status), count, amount)
+        if not cells:
+            del self.days[day]
+        _add(self.statuses, status, count, amount)
+
+
+class SummaryCache:
+    """
+    Итоги штрафов по кабинетам в памяти процесса
+
+    Все методы синхронные и вызываются из event loop, поэтому блокировки
+    не нужны. Ответы складывают итоги нескольких кабинетов (кабинеты
+    одного чата).
+    """
+
+    def __init__(self):
+        self._sellers: Dict[str, _SellerSummary] = {}
+
+    def load(self, rows: Iterable[Tuple[str, date, str, str, int, Decimal]]):
+        """Замена содержимого строками (seller_id, day, type, status, count, sum)"""
+        sellers: Dict[str, _SellerSummary] = {}
+        for seller_id, day, fine_type, status, count, amount in rows:
+            summary = sellers.get(seller_id)
+            if summary is None:
+                summary = sellers[seller_id] = _SellerSummary()
+            summary.add(day, fine_type, status, count, Decimal(amount))
+        self._sellers = sellers
+
+    def apply(self, seller_id: str, deltas: Dict[Tuple, Total]):
+        """Изменения daily_stats из закоммиченной транзакции цикла опроса"""
+        summary = self._sellers.get(seller_id)
+        if summary is None:
+            summary = self._sellers[seller_id] = _SellerSummary()
+        for (day, fine_type, status), (count, amount) in deltas.items():
+            summary.add(day, fine_type, status, count, amount)
+
+    def _summaries(self, seller_ids: Iterable[str]) -> List[_SellerSummary]:
+        return [
+            self._sellers[seller_id]
+            for seller_id in seller_ids
+            if seller_id in self._sellers
+        ]
+
+    def by_status(self, seller_ids: Iterable[str]) -> Dict[str, Total]:
+        """Количество и сумма по статусам за всё время"""
+        totals: Dict[str, Total] = {}
+        for summary in self._summaries(seller_ids):
+            for status, (count, amount) in summary.statuses.items():
+                _add(totals, status, count, amount)
+        return totals
+
+    def by_type(
+        self, seller_ids: Iterable[str], date_from: date, date_to: date
+    ) -> Dict[str, Total]:
+        """Количество и сумма по типам за дни [date_from, date_to]"""
+        totals: Dict[str, Total] = {}
+        for summary in self._summaries(seller_ids):
+            for day, cells in summary.days.items():
+                if not date_from <= day <= date_to:
+                    continue
+                for (fine_type, _), (count, amount) in cells.items():
+                    _add(totals, fine_type, count, amount)
+        return totals
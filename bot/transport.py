@@ -0,0 +1,310 @@
+"""
+Устойчивый HTTP-транспорт для API Wildberries
+
+Под AsyncWBClient: ограниченное число повторов с decorrelated jitter,
+учёт Retry-After, circuit breaker на время недоступности WB и
+необязательный hedging (дублирующий запрос при медленном ответе).
+Сбои возвращаются типизированными исключениями, чтобы вызывающий код
+мог пропустить цикл, а не принять сбой за пустой ответ.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from bot import metrics
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class WBTransportError(Exception):
+    """Запрос к API WB не удался"""
+
+    def __init__(self, message: str, status=None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def throttled(self) -> bool:
+        return self.status == 429
+
+
+class WBUnavailableError(WBTransportError):
+    """API WB временно недоступен: запрос можно повторить позже"""
+
+
+class WBRateLimitError(WBUnavailableError):
+    """429 Too Many Requests"""
+
+
+class WBServerError(WBUnavailableError):
+    """Ответ 5xx"""
+
+
+class WBTimeoutError(WBUnavailableError):
+    """Превышен дедлайн запроса"""
+
+
+class WBConnectionError(WBUnavailableError):
+    """Сетевая ошибка: соединение не установлено или оборвано"""
+
+
+class WBCircuitOpenError(WBUnavailableError):
+    """Запрос не отправлялся: circuit breaker разомкнут"""
+
+
+class WBClientError(WBTransportError):
+    """Ответ 4xx (кроме 429): повтор не поможет"""
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Пауза из заголовка Retry-After (секунды или HTTP-дата), сек"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def raise_for_status(response: httpx.Response):
+    """Типизированное исключение для неуспешного ответа"""
+    status = response.status_code
+    if status < 400:
+        return
+    message = f"Ошибка API {status}: {response.text[:100]}"
+    if status == 429:
+        raise WBRateLimitError(message, status, retry_after_seconds(response))
+    if status >= 500:
+        raise WBServerError(message, status, retry_after_seconds(response))
+    raise WBClientError(message, status)
+
+
+def decorrelated_jitter(previous: float, base: float, cap: float) -> float:
+    """Следующая пауза между повторами: случайная в [base, previous * 3]"""
+    return min(cap, random.uniform(base, max(base, previous * 3)))
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи для одного сервиса
+
+    После threshold сбоев подряд цепь размыкается, и запросы сразу
+    завершаются WBCircuitOpenError. Через reset_timeout пропускается один
+    пробный запрос: успех замыкает цепь, сбой размыкает её снова.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(
+        self,
+        threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold or config.WB_BREAKER_THRESHOLD
+        self.reset_timeout = reset_timeout or config.WB_BREAKER_RESET
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("Circuit breaker WB: %s -> %s", self.state, state)
+            self.state = state
+        metrics.WB_CIRCUIT_STATE.set(
+            (self.CLOSED, self.HALF_OPEN, self.OPEN).index(state)
+        )
+
+    def before_call(self):
+        """Разрешение на запрос; при разомкнутой цепи - WBCircuitOpenError"""
+        if self.state == self.CLOSED:
+            return
+        remaining = self.opened_at + self.reset_timeout - self.clock()
+        if self.state == self.OPEN and remaining <= 0:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        raise WBCircuitOpenError(
+            "API WB недоступен, запросы приостановлены",
+            "circuit_open",
+            max(remaining, 0.0),
+        )
+
+    def release(self):
+        """Пробный запрос завершился без результата (отмена, ошибка в коде)"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probe_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.opened_at = self.clock()
+            self._set_state(self.OPEN)
+
+
+class ResilientTransport:
+    """
+    Выполнение идемпотентного запроса с повторами, breaker и hedging
+
+    Попытка - корутина, которая возвращает ответ или бросает
+    WBTransportError (см. raise_for_status). Повторяются только
+    WBUnavailableError; пауза - decorrelated jitter, но не меньше
+    Retry-After. Все попытки и паузы укладываются в общий бюджет
+    WB_TOTAL_TIMEOUT: если пауза в него не помещается, ошибка
+    возвращается сразу вместе с retry_after.
+    """
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_cap: Optional[float] = None,
+        total_timeout: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts or config.WB_MAX_ATTEMPTS
+        self.backoff_base = backoff_base or config.WB_BACKOFF_BASE
+        self.backoff_cap = backoff_cap or config.WB_BACKOFF_CAP
+        self.total_timeout = total_timeout or config.WB_TOTAL_TIMEOUT
+        self.hedge_after = config.WB_HEDGE_AFTER if hedge_after is None else hedge_after
+
+    async def call(
+        self,
+        attempt: Callable[[], Awaitable[httpx.Response]],
+        endpoint: str,
+        hedge: bool = False,
+    ) -> httpx.Response:
+        """
+        Запрос с повторами
+
+        Args:
+            attempt: одна попытка запроса
+            endpoint: путь для логов и метрик
+            hedge: разрешить дублирующий запрос (только идемпотентные)
+
+        Raises:
+            WBTransportError: запрос не удался
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.total_timeout
+        delay = self.backoff_base
+
+        for number in range(1, self.max_attempts + 1):
+            self.breaker.before_call()
+            try:
+                if hedge and self.hedge_after > 0:
+                    response = await self._hedged(attempt, endpoint)
+                else:
+                    response = await attempt()
+            except WBUnavailableError as e:
+                # 429 - это лимит, а не отказ: сервис ответил
+                if isinstance(e, WBRateLimitError):
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+
+                delay = decorrelated_jitter(delay, self.backoff_base, self.backoff_cap)
+                pause = max(delay, e.retry_after or 0.0)
+                if number == self.max_attempts or loop.time() + pause > deadline:
+                    raise
+                metrics.WB_RETRIES_TOTAL.labels(
+                    endpoint=endpoint, reason=type(e).__name__
+                ).inc()
+                logger.warning(
+                    "%s; попытка %s/%s, повтор через %.1f сек",
+                    e,
+                    number,
+                    self.max_attempts,
+                    pause,
+                )
+                await asyncio.sleep(pause)
+                continue
+            except WBTransportError:
+                # Сервис ответил, значит доступен
+                self.breaker.record_success()
+                raise
+            except BaseException:
+                # Отмена или ошибка не транспорта: результата у пробного
+                # запроса нет, иначе цепь осталась бы в half_open навсегда
+                self.breaker.release()
+                raise
+
+            self.breaker.record_success()
+            return response
+
+    async def _hedged(
+        self, attempt: Callable[[], Awaitable[httpx.Response]], endpoint: str
+    ) -> httpx.Response:
+        """
+        Второй запрос, если первый не ответил за hedge_after; берём первый успех
+
+        Ответы проигравших попыток закрываются: у потоковых ответов
+        (AsyncWBClient.iter_fines) тело не прочитано и держит соединение.
+        """
+        first = asyncio.create_task(attempt())
+        pending = {first}
+        winner = None
+        error = None
+        # Отмена вызывающего на любом ожидании отменяет и попытки
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return first.result()
+
+            metrics.WB_HEDGED_TOTAL.labels(endpoint=endpoint).inc()
+            pending.add(asyncio.create_task(attempt()))
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        _close_response(task)
+            if winner is None:
+                raise error
+            return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_close_response)
+
+
+# Закрытие ответов проигравших попыток (ссылки, чтобы задачи не собрал GC)
+_closing = set()
+
+
+def _close_response(task: asyncio.Task):
+    """Закрыть ответ завершившейся попытки, которая не понадобилась"""
+    if task.cancelled() or task.exception() is not None:
+        return
+    closing = asyncio.ensure_future(task.result().aclose())
+    _closing.add(closing)
+    closing.add_done_callback(_closing.discard)
@@ -1,103 +1,421 @@
-import requests
+import asyncio
+import httpx
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from bot import metrics
 from bot.config import config
+from bot.ratelimit import TokenBucket
+from bot.records import FineRecord, InvalidFineError
+from bot.streaming import FinesStreamParser
+from bot.transport import (
+    ResilientTransport,
+    WBConnectionError,
+    WBTimeoutError,
+    WBTransportError,
+    raise_for_status,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _build_headers(api_key: Optional[str] = None) -> Dict[str, str]:
+    """Заголовки авторизации для API WB (по умолчанию ключ из WB_API_KEY)"""
+    headers = {}
+    api_key = config.WB_API_KEY if api_key is None else api_key
+
+    # Добавляем API ключ только если он есть и не содержит не-ASCII символы
+    if api_key and api_key != "ваш_api_ключ_здесь":
+        # Проверяем, что ключ состоит только из ASCII символов
+        try:
+            api_key.encode("ascii")
+            headers = {"Authorization": api_key}
+        except UnicodeEncodeError:
+            logger.warning("API ключ содержит не-ASCII символы, не использую")
+
+    return headers
+
+
+def _safe_headers(headers: Dict) -> Dict:
+    """Убираем не-ASCII символы из headers если есть"""
+    safe_headers = {}
+    for key, value in headers.items():
+        if isinstance(value, str):
+            # Оставляем только ASCII символы
+            safe_value = "".join(c for c in value if ord(c) < 128)
+            safe_headers[key] = safe_value
+        else:
+            safe_headers[key] = value
+    return safe_headers
+
+
+def _fines_params(
+    days_back: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """Параметры запроса штрафов в зависимости от режима"""
+    if config.MODE == "MOCK":
+        # Для мок-сервера используем параметр days
+        params = {"days": str(days_back)}
+        if date_from is not None:
+            params["dateFrom"] = date_from.isoformat() + "Z"
+    else:
+        # Для реального API
+        if date_from is None:
+            date_from = datetime.now() - timedelta(days=days_back)
+        params = {"dateFrom": date_from.isoformat() + "Z"}
+
+    if date_to is not None:
+        params["dateTo"] = date_to.isoformat() + "Z"
+    return params
+
+
+def _health_request() -> Tuple[str, float]:
+    """Путь и таймаут для проверки подключения"""
+    if config.MODE == "MOCK":
+        return "/health", 5
+    return "/api/v1/info", 10
+
+
+def _observe_response(path: str, started: float, status):
+    """Метрики запроса к API: длительность и код ответа"""
+    metrics.WB_REQUEST_SECONDS.labels(endpoint=path).observe(
+        time.perf_counter() - started
+    )
+    metrics.WB_RESPONSES_TOTAL.labels(endpoint=path, status=status).inc()
+
+
+def _parse_fine(data) -> Optional[FineRecord]:
+    """Штраф из ответа API; некорректный отбрасывается с записью в лог"""
+    try:
+        return FineRecord.from_api(data)
+    except InvalidFineError as e:
+        metrics.WB_INVALID_FINES_TOTAL.inc()
+        logger.error("Отброшен некорректный штраф %r: %s", data, e)
+        return None
+
+
+def _parse_fines(items: List) -> List[FineRecord]:
+    return [fine for fine in map(_parse_fine, items) if fine is not None]
+
+
+def _extract_fines(data: Dict) -> List[FineRecord]:
+    """Достаём список штрафов из ответа API"""
+    fines = _parse_fines(data.get("data") or [])
+
+    logger.info("Получено штрафов: %s", len(fines))
+
+    # Логируем первый штраф для отладки
+    if fines:
+        first_fine = fines[0]
+        logger.debug("Пример штрафа: %s - %s руб", first_fine.type, first_fine.amount)
+
+    return fines
+
+
 class WBClient:
-    """Клиент для работы с API Wildberries"""
+    """
+    Клиент для работы с API Wildberries
 
-    def __init__(self):
-        self.base_url = config.WB_API_URL
-        self.headers = {}
+    Блокирующий, для скриптов и сравнения в бенчмарках; requests
+    импортируется при первом запросе, бот его не загружает.
+    """
 
-        # Добавляем API ключ только если он есть и не содержит не-ASCII символы
-        if config.WB_API_KEY and config.WB_API_KEY != "ваш_api_ключ_здесь":
-            # Проверяем, что ключ состоит только из ASCII символов
-            try:
-                config.WB_API_KEY.encode("ascii")
-                self.headers = {"Authorization": config.WB_API_KEY}
-            except UnicodeEncodeError:
-                logger.warning("API ключ содержит не-ASCII символы, не использую")
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or config.WB_API_URL
+        self.headers = _build_headers()
 
-        logger.info(f"WBClient: режим {config.MODE}, URL: {self.base_url}")
+        logger.info("WBClient: режим %s, URL: %s", config.MODE, self.base_url)
 
-    def get_fines(self, days_back: int = 1) -> List[Dict]:
+    def get_fines(
+        self, days_back: int = 1, date_from: Optional[datetime] = None
+    ) -> List[FineRecord]:
         """
         Получение штрафов
 
         Args:
             days_back: за сколько дней получать штрафы (только для MOCK режима)
+            date_from: начало периода (dateFrom); приоритетнее days_back в PROD
         """
-        try:
-            params = {}
+        import requests
 
-            if config.MODE == "MOCK":
-                # Для мок-сервера используем параметр days
-                params = {"days": str(days_back)}
-                url = f"{self.base_url}/api/v3/fines"
-            else:
-                # Для реального API
-                date_from = (
-                    datetime.now() - timedelta(days=days_back)
-                ).isoformat() + "Z"
-                params = {"dateFrom": date_from}
-                url = f"{self.base_url}/api/v3/fines"
-
-            # Убираем не-ASCII символы из headers если есть
-            safe_headers = {}
-            for key, value in self.headers.items():
-                if isinstance(value, str):
-                    # Оставляем только ASCII символы
-                    safe_value = "".join(c for c in value if ord(c) < 128)
-                    safe_headers[key] = safe_value
-                else:
-                    safe_headers[key] = value
+        try:
+            params = _fines_params(days_back, date_from)
+            url = f"{self.base_url}/api/v3/fines"
 
-            response = requests.get(
-                url, headers=safe_headers, params=params, timeout=30
-            )
+            started = time.perf_counter()
+            try:
+                response = requests.get(
+                    url, headers=_safe_headers(self.headers), params=params, timeout=30
+                )
+            except requests.exceptions.RequestException:
+                _observe_response("/api/v3/fines", started, "error")
+                raise
+            _observe_response("/api/v3/fines", started, response.status_code)
 
             if response.status_code == 200:
-                data = response.json()
-                fines = data.get("data", [])
-
-                logger.info(f"Получено штрафов: {len(fines)}")
-
-                # Логируем первый штраф для отладки
-                if fines:
-                    first_fine = fines[0]
-                    logger.debug(
-                        f"Пример штрафа: {first_fine['type']} - {first_fine['amount']} руб"
-                    )
-
-                return fines
+                with metrics.STAGE_PARSE.time():
+                    return _extract_fines(response.json())
             else:
                 logger.error(
-                    f"Ошибка API {response.status_code}: {response.text[:100]}"
+                    "Ошибка API %s: %s", response.status_code, response.text[:100]
                 )
                 return []
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка подключения: {e}")
+            logger.error("Ошибка подключения: %s", e)
             return []
         except Exception as e:
-            logger.error(f"Неизвестная ошибка: {e}")
+            logger.error("Неизвестная ошибка: %s", e)
             return []
 
     def test_connection(self) -> bool:
         """Тест подключения к API"""
+        import requests
+
+        path, timeout = _health_request()
         try:
-            if config.MODE == "MOCK":
-                response = requests.get(f"{self.base_url}/health", timeout=5)
-                return response.status_code == 200
-            else:
-                response = requests.get(
-                    f"{self.base_url}/api/v1/info", headers=self.headers, timeout=10
-                )
-                return response.status_code == 200
+            response = requests.get(
+                f"{self.base_url}{path}", headers=self.headers, timeout=timeout
+            )
+            return response.status_code == 200
         except requests.exceptions.RequestException:
             return False
+
+
+class AsyncWBClient:
+    """
+    Асинхронный клиент API Wildberries
+
+    Держит пул keep-alive соединений (httpx) и не блокирует event loop.
+    Каждая попытка ограничена дедлайном WB_REQUEST_TIMEOUT, повторы и
+    circuit breaker - в ResilientTransport. Один клиент обслуживает все
+    кабинеты: ключ API передаётся в запросе.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        transport: Optional[ResilientTransport] = None,
+        rate_limit: Optional[TokenBucket] = None,
+    ):
+        self.base_url = base_url or config.WB_API_URL
+        self.headers = _safe_headers(_build_headers())
+        self.transport = transport or ResilientTransport()
+        # Общий лимит частоты запросов (включая повторы), например для backfill
+        self.rate_limit = rate_limit
+        self._client: Optional[httpx.AsyncClient] = None
+
+        logger.info("AsyncWBClient: режим %s, URL: %s", config.MODE, self.base_url)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Ленивое создание пула соединений"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=httpx.Timeout(
+                    config.WB_REQUEST_TIMEOUT, connect=config.WB_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=config.WB_POOL_SIZE,
+                    max_keepalive_connections=config.WB_POOL_SIZE,
+                    keepalive_expiry=config.WB_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self._client
+
+    async def _get(
+        self,
+        path: str,
+        params: Optional[Dict] = None,
+        deadline: float = None,
+        headers: Optional[Dict] = None,
+    ) -> httpx.Response:
+        """GET с общим дедлайном на весь запрос, включая ожидание пула"""
+        deadline = deadline or config.WB_REQUEST_TIMEOUT
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self._get_client().get(path, params=params, headers=headers),
+                timeout=deadline,
+            )
+        except asyncio.TimeoutError:
+            _observe_response(path, started, "timeout")
+            raise
+        except httpx.HTTPError:
+            _observe_response(path, started, "error")
+            raise
+        _observe_response(path, started, response.status_code)
+        return response
+
+    async def _attempt(
+        self, path: str, params: Optional[Dict], headers: Optional[Dict]
+    ) -> httpx.Response:
+        """Одна попытка запроса; сбой - типизированное исключение"""
+        if self.rate_limit is not None:
+            await self.rate_limit.acquire()
+        try:
+            response = await self._get(path, params, headers=headers)
+        except asyncio.TimeoutError:
+            raise WBTimeoutError(
+                f"Превышен дедлайн запроса ({config.WB_REQUEST_TIMEOUT} сек)",
+                "timeout",
+            )
+        except httpx.HTTPError as e:
+            raise WBConnectionError(f"Ошибка подключения: {e}", "error") from e
+        raise_for_status(response)
+        return response
+
+    async def _attempt_stream(
+        self, path: str, params: Optional[Dict], headers: Optional[Dict]
+    ) -> httpx.Response:
+        """Одна попытка: ответ с непрочитанным телом; сбой - исключение"""
+        if self.rate_limit is not None:
+            await self.rate_limit.acquire()
+        client = self._get_client()
+        request = client.build_request("GET", path, params=params, headers=headers)
+        started = time.perf_counter()
+        try:
+            # Дедлайн - до заголовков ответа; тело ограничено таймаутом чтения
+            response = await asyncio.wait_for(
+                client.send(request, stream=True), timeout=config.WB_REQUEST_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            _observe_response(path, started, "timeout")
+            raise WBTimeoutError(
+                f"Превышен дедлайн запроса ({config.WB_REQUEST_TIMEOUT} сек)",
+                "timeout",
+            )
+        except httpx.HTTPError as e:
+            _observe_response(path, started, "error")
+            raise WBConnectionError(f"Ошибка подключения: {e}", "error") from e
+        _observe_response(path, started, response.status_code)
+
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            raise_for_status(response)
+        return response
+
+    async def iter_fines(
+        self,
+        days_back: int = 1,
+        date_from: Optional[datetime] = None,
+        api_key: Optional[str] = None,
+        page_size: Optional[int] = None,
+        date_to: Optional[datetime] = None,
+    ) -> AsyncIterator[FineRecord]:
+        """
+        Потоковое получение штрафов постранично
+
+        Штрафы отдаются по одному по мере чтения ответа; следующая страница
+        запрашивается по курсору "next" из предыдущей. Повторяется (и при
+        WB_HEDGE_AFTER дублируется) только запрос страницы до начала тела:
+        обрыв посреди ответа завершает обход ошибкой, чтобы не отдать
+        штрафы дважды.
+
+        Args:
+            days_back: за сколько дней получать штрафы (только для MOCK режима)
+            date_from: начало периода (dateFrom); приоритетнее days_back в PROD
+            api_key: ключ кабинета (по умолчанию WB_API_KEY)
+            page_size: штрафов на странице (по умолчанию WB_PAGE_SIZE)
+            date_to: конец периода (dateTo, не включая), по умолчанию - сейчас
+
+        Raises:
+            WBUnavailableError: API временно недоступен (429, 5xx, сеть)
+            WBTransportError: прочие ошибки (4xx, некорректный ответ)
+        """
+        headers = None
+        if api_key is not None:
+            headers = _safe_headers(_build_headers(api_key))
+        path = "/api/v3/fines"
+        params = _fines_params(days_back, date_from, date_to)
+        params["limit"] = str(page_size or config.WB_PAGE_SIZE)
+
+        while True:
+            with metrics.STAGE_FETCH.time():
+                response = await self.transport.call(
+                    lambda: self._attempt_stream(path, params, headers),
+                    path,
+                    hedge=True,
+                )
+            parser = FinesStreamParser()
+            try:
+                async for chunk in response.aiter_bytes():
+                    with metrics.STAGE_PARSE.time():
+                        fines = _parse_fines(parser.feed(chunk))
+                    for fine in fines:
+                        yield fine
+                with metrics.STAGE_PARSE.time():
+                    page = parser.close()
+            except httpx.HTTPError as e:
+                raise WBConnectionError(f"Ответ API оборван: {e}", "error") from e
+            except ValueError as e:
+                raise WBTransportError(
+                    f"Некорректный ответ API: {e}", response.status_code
+                ) from e
+            finally:
+                await response.aclose()
+
+            # "data" не массив (например, null) - штрафы пришли в page
+            for fine in _parse_fines(page.get("data") or []):
+                yield fine
+
+            cursor = page.get("next")
+            if not cursor:
+                return
+            params = {**params, "cursor": cursor}
+
+    async def get_fines(
+        self,
+        days_back: int = 1,
+        date_from: Optional[datetime] = None,
+        api_key: Optional[str] = None,
+    ) -> List[FineRecord]:
+        """
+        Получение штрафов
+
+        Args:
+            days_back: за сколько дней получать штрафы (только для MOCK режима)
+            date_from: начало периода (dateFrom); приоритетнее days_back в PROD
+            api_key: ключ кабинета (по умолчанию WB_API_KEY)
+
+        Raises:
+            WBUnavailableError: API временно недоступен (429, 5xx, сеть,
+                разомкнут circuit breaker)
+            WBTransportError: прочие ошибки (4xx, некорректный ответ)
+        """
+        headers = None
+        if api_key is not None:
+            headers = _safe_headers(_build_headers(api_key))
+        path = "/api/v3/fines"
+        params = _fines_params(days_back, date_from)
+
+        response = await self.transport.call(
+            lambda: self._attempt(path, params, headers), path, hedge=True
+        )
+        try:
+            with metrics.STAGE_PARSE.time():
+                return _extract_fines(response.json())
+        except (ValueError, KeyError, AttributeError) as e:
+            raise WBTransportError(
+                f"Некорректный ответ API: {e}", response.status_code
+            ) from e
+
+    async def test_connection(self) -> bool:
+        """Тест подключения к API"""
+        path, timeout = _health_request()
+        try:
+            response = await self._get(path, deadline=timeout)
+            return response.status_code == 200
+        except (asyncio.TimeoutError, httpx.HTTPError):
+            return False
+
+    async def aclose(self):
+        """Закрытие пула соединений"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
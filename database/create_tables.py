@@ -1,19 +1,24 @@
 import sys
 import os
-from database.models import Base, engine
+from database.models import get_engine
+from database.migrations import current_version, latest_version, migrate
 from sqlalchemy import text
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 def create_tables():
-    """Создание таблиц в PostgreSQL"""
-    print("🔄 Создание таблиц в базе данных...")
+    """Создание и обновление таблиц в PostgreSQL через миграции"""
+    print("🔄 Применение миграций схемы...")
 
     try:
-        # Создаём таблицы через SQLAlchemy
-        Base.metadata.create_all(bind=engine)
-        print("✅ Таблицы созданы через SQLAlchemy")
+        engine = get_engine()
+        print(f"📌 Версия схемы: {current_version(engine)} из {latest_version()}")
+        applied = migrate(engine)
+        if applied:
+            print(f"✅ Применены миграции: {', '.join(map(str, applied))}")
+        else:
+            print("✅ Схема уже актуальна")
 
         # Проверяем создание
         with engine.connect() as conn:
@@ -0,0 +1,172 @@
+"""
+История изменений штрафов
+
+WB меняет у уже выданного штрафа статус (Начислен -> Оспорен -> Оплачен),
+реже сумму или тип. При сохранении пачки FineRepository сравнивает поля
+ответа API с тем, что уже лежит в fines (тем же SELECT, которым ищет
+известные id), и пишет только изменившиеся строки. Каждое изменение
+добавляется строкой в fine_history; повторная загрузка без изменений не
+пишет в БД ничего.
+
+Изменения статуса можно отправлять в Telegram (NOTIFY_STATUS_CHANGES):
+уведомление вида status ставится в outbox в той же транзакции и ссылается
+на свою строку fine_history (history_id), текст строится по ней.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from bot.config import config
+from database.models import FineHistory
+
+
+@dataclass(frozen=True, slots=True)
+class FineChange:
+    """Изменение полей штрафа: прежние и новые значения"""
+
+    fine_id: str
+    old_type: str
+    new_type: str
+    old_amount: Decimal
+    new_amount: Decimal
+    old_status: Optional[str]
+    new_status: Optional[str]
+
+    @classmethod
+    def between(cls, known, row: Dict[str, Any]) -> Optional["FineChange"]:
+        """
+        Изменение от сохранённого штрафа known к строке row
+
+        Returns:
+            None, если тип, сумма и статус совпадают
+        """
+        if (known.type, known.amount, known.status) == (
+            row["type"],
+            row["amount"],
+            row["status"],
+        ):
+            return None
+        return cls(
+            fine_id=row["id"],
+            old_type=known.type,
+            new_type=row["type"],
+            old_amount=known.amount,
+            new_amount=row["amount"],
+            old_status=known.status,
+            new_status=row["status"],
+        )
+
+    @classmethod
+    def from_model(cls, entry: FineHistory) -> "FineChange":
+        """Изменение из строки fine_history (пустые поля - без изменений)"""
+        return cls(
+            fine_id=entry.fine_id,
+            old_type=entry.old_type,
+            new_type=entry.new_type,
+            old_amount=entry.old_amount,
+            new_amount=entry.new_amount,
+            old_status=entry.old_status,
+            new_status=entry.new_status,
+        )
+
+    @property
+    def status_changed(self) -> bool:
+        return self.old_status != self.new_status
+
+    def as_row(self, seller_id: str, changed_at: datetime) -> Dict[str, Any]:
+        """Строка fine_history: заполнены только изменившиеся поля"""
+        row = {
+            "seller_id": seller_id,
+            "fine_id": self.fine_id,
+            "changed_at": changed_at,
+        }
+        for field in ("type", "amount", "status"):
+            old, new = getattr(self, f"old_{field}"), getattr(self, f"new_{field}")
+            if old != new:
+                row[f"old_{field}"], row[f"new_{field}"] = old, new
+            else:
+                row[f"old_{field}"] = row[f"new_{field}"] = None
+        return row
+
+
+class FineHistoryRepository:
+    """История изменений штрафов одного продавца"""
+
+    def __init__(self, db: Session, seller_id: str):
+        self.db = db
+        self.seller_id = seller_id
+
+    def append(self, changes: List[FineChange]) -> Dict[str, int]:
+        """
+        Запись изменений одним INSERT (без коммита)
+
+        Returns:
+            id строки fine_history для каждого штрафа
+        """
+        if not changes:
+            return {}
+        now = datetime.utcnow()
+        rows = self.db.execute(
+            insert(FineHistory).returning(FineHistory.id, FineHistory.fine_id),
+            [change.as_row(self.seller_id, now) for change in changes],
+        )
+        return {row.fine_id: row.id for row in rows}
+
+    def get_by_ids(self, history_ids: List[int]) -> Dict[int, FineChange]:
+        """Изменения по id строк fine_history"""
+        changes = {}
+        history_ids = list(history_ids)
+        for start in range(0, len(history_ids), config.DB_BATCH_SIZE):
+            for entry in self.db.scalars(
+                select(FineHistory).where(
+                    FineHistory.seller_id == self.seller_id,
+                    FineHistory.id.in_(
+                        history_ids[start : start + config.DB_BATCH_SIZE]
+                    ),
+                )
+            ):
+                changes[entry.id] = FineChange.from_model(entry)
+        return changes
+
+    def get_for_fine(self, fine_id: str) -> List[FineHistory]:
+        """Все изменения штрафа, от старых к новым"""
+        return self.db.scalars(
+            select(FineHistory)
+            .where(
+                FineHistory.seller_id == self.seller_id,
+                FineHistory.fine_id == fine_id,
+            )
+            .order_by(FineHistory.id)
+        ).all()
+
+    def get_latest_status(self, fine_ids: List[str]) -> Dict[str, FineChange]:
+        """
+        Последняя смена статуса каждого из штрафов
+
+        Для уведомлений, поставленных в outbox без history_id (до миграции
+        11): изменения только суммы или типа пропускаются.
+        """
+        changes = {}
+        fine_ids = list(fine_ids)
+        for start in range(0, len(fine_ids), config.DB_BATCH_SIZE):
+            latest = (
+                select(func.max(FineHistory.id))
+                .where(
+                    FineHistory.seller_id == self.seller_id,
+                    FineHistory.fine_id.in_(
+                        fine_ids[start : start + config.DB_BATCH_SIZE]
+                    ),
+                    FineHistory.new_status.is_not(None),
+                )
+                .group_by(FineHistory.fine_id)
+            )
+            for entry in self.db.scalars(
+                select(FineHistory).where(FineHistory.id.in_(latest))
+            ):
+                changes[entry.fine_id] = FineChange.from_model(entry)
+        return changes
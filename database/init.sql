@@ -1,3 +1,7 @@
+-- Начальная схема для docker-compose. Дальнейшие изменения схемы
+-- (партиционирование fines, индексы) применяет database/migrations.py:
+--   python -m database.create_tables
+
 -- Таблица штрафов
 CREATE TABLE IF NOT EXISTS fines (
     id VARCHAR(50) PRIMARY KEY,
@@ -25,17 +29,35 @@ CREATE TABLE IF NOT EXISTS notifications (
     sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     success BOOLEAN DEFAULT TRUE,
     error_message TEXT,
-    retry_count INTEGER DEFAULT 0
+    retry_count INTEGER DEFAULT 0,
+    -- outbox: очередь доставки уведомлений
+    kind VARCHAR(20) DEFAULT 'fine',
+    chat_id VARCHAR(50),
+    status VARCHAR(20) DEFAULT 'sent',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP,
+    locked_by VARCHAR(100)
+);
+
+CREATE INDEX IF NOT EXISTS idx_notifications_pending
+    ON notifications(next_attempt_at) WHERE status IN ('pending', 'sending');
+
+-- Курсоры инкрементальной загрузки штрафов
+CREATE TABLE IF NOT EXISTS fetch_cursors (
+    name VARCHAR(100) PRIMARY KEY,
+    position TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Статистика
+-- Дневной агрегат: количество и сумма по дню, типу и статусу
 CREATE TABLE IF NOT EXISTS daily_stats (
-    date DATE PRIMARY KEY,
-    total_fines INTEGER DEFAULT 0,
-    total_amount DECIMAL(15, 2) DEFAULT 0,
-    new_fines INTEGER DEFAULT 0,
-    disputed_fines INTEGER DEFAULT 0,
-    average_amount DECIMAL(10, 2) DEFAULT 0
+    day DATE NOT NULL,
+    type VARCHAR(200) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    fines_count INTEGER NOT NULL DEFAULT 0,
+    total_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, type, status)
 );
 
 -- Создаём представление для удобства
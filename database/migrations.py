@@ -0,0 +1,552 @@
+"""
+Версионные миграции схемы PostgreSQL
+
+Каждая миграция применяется один раз в своей транзакции, номер версии
+записывается в schema_migrations. Параллельные запуски сериализуются
+advisory-блокировкой. Для других СУБД (SQLite в бенчмарках) схема
+создаётся по моделям через create_all.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки на время миграций
+MIGRATION_LOCK_KEY = 7_242_001
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Одна миграция схемы"""
+
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def _execute_all(conn: Connection, statements: List[str]):
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(value: date) -> date:
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"fines_y{month.year}m{month.month:02d}"
+
+
+def ensure_fine_partitions(conn: Connection, start: date, end: date) -> List[str]:
+    """
+    Создание месячных партиций fines, покрывающих [start, end]
+
+    Строки этого месяца, уже попавшие в fines_default, переносятся в новую
+    партицию до её подключения, иначе ATTACH PARTITION не пройдёт.
+
+    Returns:
+        имена созданных партиций
+    """
+    created = []
+    month = _month_start(start)
+    while month <= end:
+        following = _next_month(month)
+        name = _partition_name(month)
+
+        exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": name})
+        if exists.scalar() is None:
+            bounds = {"start": month, "end": following}
+            conn.execute(text(f"CREATE TABLE {name} (LIKE fines INCLUDING DEFAULTS)"))
+            conn.execute(
+                text(f"""
+                WITH moved AS (
+                    DELETE FROM fines_default
+                    WHERE date >= :start AND date < :end
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+                """),
+                bounds,
+            )
+            conn.execute(
+                text(
+                    f"ALTER TABLE fines ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{month}') TO ('{following}')"
+                )
+            )
+            created.append(name)
+
+        month = following
+
+    if created:
+        logger.info("Созданы партиции: %s", ", ".join(created))
+    return created
+
+
+def _upcoming_months_end() -> date:
+    """Последний месяц, для которого партиции создаются заранее"""
+    month = _month_start(date.today())
+    for _ in range(config.DB_PARTITION_MONTHS_AHEAD):
+        month = _next_month(month)
+    return month
+
+
+# Представление из init.sql; зависит от fines и пересоздаётся вместе с ней
+FINES_SUMMARY_VIEW = """
+CREATE OR REPLACE VIEW fines_summary AS
+SELECT
+    DATE(date) as fine_date,
+    COUNT(*) as fines_count,
+    SUM(amount) as total_amount,
+    AVG(amount) as average_amount,
+    SUM(CASE WHEN status = 'Оспорен' THEN 1 ELSE 0 END) as disputed_count
+FROM fines
+GROUP BY DATE(date)
+ORDER BY fine_date DESC
+"""
+
+
+def _m001_baseline(conn: Connection):
+    """Исходная схема; доводит до неё и БД, созданные через create_all"""
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS fines (
+                id VARCHAR(50) PRIMARY KEY,
+                date TIMESTAMP NOT NULL,
+                type VARCHAR(200) NOT NULL,
+                amount DECIMAL(10, 2) NOT NULL,
+                order_id VARCHAR(50),
+                status VARCHAR(50),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                notified BOOLEAN DEFAULT FALSE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS notifications (
+                id SERIAL PRIMARY KEY,
+                fine_id VARCHAR(50),
+                channel VARCHAR(50) NOT NULL,
+                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                success BOOLEAN DEFAULT TRUE
+            )
+            """,
+            """
+            ALTER TABLE notifications
+                ADD COLUMN IF NOT EXISTS error_message TEXT,
+                ADD COLUMN IF NOT EXISTS retry_count INTEGER DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS kind VARCHAR(20) DEFAULT 'fine',
+                ADD COLUMN IF NOT EXISTS chat_id VARCHAR(50),
+                ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'sent',
+                ADD COLUMN IF NOT EXISTS created_at TIMESTAMP
+                    DEFAULT CURRENT_TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP
+                    DEFAULT CURRENT_TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS locked_by VARCHAR(100)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_notifications_pending
+                ON notifications (next_attempt_at)
+                WHERE status IN ('pending', 'sending')
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS fetch_cursors (
+                name VARCHAR(100) PRIMARY KEY,
+                position TIMESTAMP NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    )
+
+
+def _m002_partition_fines(conn: Connection):
+    """
+    Помесячное range-партиционирование fines по date
+
+    Первичный ключ партиционированной таблицы обязан включать ключ
+    партиционирования, поэтому он становится (id, date). Данные
+    переносятся одним INSERT ... SELECT внутри транзакции миграции.
+    """
+    partitioned = conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass('fines')"
+        )
+    ).scalar()
+    if partitioned:
+        return
+
+    bounds = conn.execute(text("SELECT min(date), max(date) FROM fines")).one()
+    has_summary = conn.execute(text("SELECT to_regclass('fines_summary')")).scalar()
+
+    _execute_all(
+        conn,
+        [
+            "DROP VIEW IF EXISTS fines_summary",
+            "ALTER TABLE fines RENAME TO fines_unpartitioned",
+            "ALTER INDEX IF EXISTS fines_pkey RENAME TO fines_unpartitioned_pkey",
+            """
+            CREATE TABLE fines (LIKE fines_unpartitioned INCLUDING DEFAULTS)
+                PARTITION BY RANGE (date)
+            """,
+            "ALTER TABLE fines ADD PRIMARY KEY (id, date)",
+            "CREATE TABLE fines_default PARTITION OF fines DEFAULT",
+        ],
+    )
+
+    start = bounds[0].date() if bounds[0] else date.today()
+    end = max(bounds[1].date() if bounds[1] else date.today(), _upcoming_months_end())
+    ensure_fine_partitions(conn, start, end)
+
+    _execute_all(
+        conn,
+        [
+            "INSERT INTO fines SELECT * FROM fines_unpartitioned",
+            "DROP TABLE fines_unpartitioned",
+        ],
+    )
+    if has_summary:
+        conn.execute(text(FINES_SUMMARY_VIEW))
+
+
+def _m003_fines_indexes(conn: Connection):
+    """Индексы fines: неуведомлённые, дата, тип, заказ"""
+    _execute_all(
+        conn,
+        [
+            # Частичный индекс: в нём только хвост неуведомлённых штрафов
+            """
+            CREATE INDEX IF NOT EXISTS idx_fines_unnotified
+                ON fines (date) WHERE notified = FALSE
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_fines_date ON fines (date)",
+            "CREATE INDEX IF NOT EXISTS idx_fines_type ON fines (type)",
+            "CREATE INDEX IF NOT EXISTS idx_fines_order_id ON fines (order_id)",
+        ],
+    )
+
+
+def _m004_notifications_fine_id(conn: Connection):
+    """Индекс notifications по fine_id"""
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS idx_notifications_fine_id "
+            "ON notifications (fine_id)"
+        )
+    )
+
+
+def _m005_daily_stats(conn: Connection):
+    """
+    Агрегат daily_stats (день, тип, статус) с заполнением по fines
+
+    Таблица daily_stats из init.sql кодом не заполнялась и заменяется.
+    """
+    _execute_all(
+        conn,
+        [
+            "DROP TABLE IF EXISTS daily_stats",
+            """
+            CREATE TABLE daily_stats (
+                day DATE NOT NULL,
+                type VARCHAR(200) NOT NULL,
+                status VARCHAR(50) NOT NULL,
+                fines_count INTEGER NOT NULL DEFAULT 0,
+                total_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, type, status)
+            )
+            """,
+            """
+            INSERT INTO daily_stats (day, type, status, fines_count, total_amount)
+            SELECT date::date, type, coalesce(status, ''), count(*), sum(amount)
+            FROM fines
+            GROUP BY 1, 2, 3
+            """,
+        ],
+    )
+
+
+def _primary_key_name(conn: Connection, table: str) -> str:
+    return conn.execute(
+        text(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = to_regclass(:table) AND contype = 'p'"
+        ),
+        {"table": table},
+    ).scalar()
+
+
+def _m006_sellers(conn: Connection):
+    """
+    Несколько кабинетов продавцов в одном процессе
+
+    Таблица seller_accounts и ключ продавца seller_id в fines,
+    notifications и daily_stats. Существующие строки относятся к
+    продавцу 'default' (настройки из .env). seller_id становится
+    первой колонкой первичных ключей fines и daily_stats.
+    """
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS seller_accounts (
+                id VARCHAR(50) PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                api_key TEXT NOT NULL,
+                chat_ids TEXT NOT NULL,
+                check_interval INTEGER,
+                enabled BOOLEAN NOT NULL DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            # Константный DEFAULT не переписывает таблицу (PostgreSQL 11+)
+            """
+            ALTER TABLE fines
+                ADD COLUMN IF NOT EXISTS seller_id VARCHAR(50)
+                NOT NULL DEFAULT 'default'
+            """,
+            """
+            ALTER TABLE notifications
+                ADD COLUMN IF NOT EXISTS seller_id VARCHAR(50)
+                NOT NULL DEFAULT 'default'
+            """,
+            """
+            ALTER TABLE daily_stats
+                ADD COLUMN IF NOT EXISTS seller_id VARCHAR(50)
+                NOT NULL DEFAULT 'default'
+            """,
+        ],
+    )
+
+    for table, columns in (
+        ("fines", "seller_id, id, date"),
+        ("daily_stats", "seller_id, day, type, status"),
+    ):
+        name = _primary_key_name(conn, table)
+        if name:
+            conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {name}"))
+        conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({columns})"))
+
+
+def _m007_backfill_windows(conn: Connection):
+    """Чекпоинты исторической загрузки (bot/backfill.py)"""
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS backfill_windows (
+            seller_id VARCHAR(50) NOT NULL,
+            window_start TIMESTAMP NOT NULL,
+            window_end TIMESTAMP NOT NULL,
+            fines_count INTEGER NOT NULL DEFAULT 0,
+            finished_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (seller_id, window_start, window_end)
+        )
+        """))
+
+
+def _m008_replicas(conn: Connection):
+    """Копии бота и аренды опроса кабинетов (режим SHARDING)"""
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS bot_replicas (
+                id VARCHAR(100) PRIMARY KEY,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                heartbeat_at TIMESTAMP NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS poll_leases (
+                seller_id VARCHAR(50) PRIMARY KEY,
+                owner VARCHAR(100) NOT NULL,
+                expires_at TIMESTAMP NOT NULL
+            )
+            """,
+        ],
+    )
+
+
+def _m009_fine_history(conn: Connection):
+    """История изменений штрафов (database/history.py)"""
+    _execute_all(
+        conn,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS fine_history (
+                id BIGSERIAL PRIMARY KEY,
+                seller_id VARCHAR(50) NOT NULL,
+                fine_id VARCHAR(50) NOT NULL,
+                changed_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                old_type VARCHAR(200),
+                new_type VARCHAR(200),
+                old_amount DECIMAL(10, 2),
+                new_amount DECIMAL(10, 2),
+                old_status VARCHAR(50),
+                new_status VARCHAR(50)
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_fine_history_fine
+            ON fine_history (seller_id, fine_id, id)
+            """,
+        ],
+    )
+
+
+def _m010_fines_seller_date(conn: Connection):
+    """Индекс для выборок штрафов кабинета по дате (keyset pagination в API)"""
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS idx_fines_seller_date "
+            "ON fines (seller_id, date, id)"
+        )
+    )
+
+
+def _m011_notifications_history_id(conn: Connection):
+    """Ссылка уведомления о смене статуса на его строку fine_history"""
+    conn.execute(
+        text("ALTER TABLE notifications ADD COLUMN IF NOT EXISTS history_id BIGINT")
+    )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _m001_baseline),
+    Migration(2, "partition_fines_by_month", _m002_partition_fines),
+    Migration(3, "fines_indexes", _m003_fines_indexes),
+    Migration(4, "notifications_fine_id_index", _m004_notifications_fine_id),
+    Migration(5, "daily_stats_rollup", _m005_daily_stats),
+    Migration(6, "seller_accounts", _m006_sellers),
+    Migration(7, "backfill_windows", _m007_backfill_windows),
+    Migration(8, "bot_replicas", _m008_replicas),
+    Migration(9, "fine_history", _m009_fine_history),
+    Migration(10, "fines_seller_date_index", _m010_fines_seller_date),
+    Migration(11, "notifications_history_id", _m011_notifications_history_id),
+]
+
+
+def latest_version() -> int:
+    """Версия схемы, которую ожидает код"""
+    return MIGRATIONS[-1].version
+
+
+def _ensure_version_table(conn: Connection):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """))
+
+
+def current_version(engine: Engine) -> int:
+    """Текущая версия схемы в БД (0, если миграции не применялись)"""
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT to_regclass('schema_migrations')"))
+        if exists.scalar() is None:
+            return 0
+        version = conn.execute(text("SELECT max(version) FROM schema_migrations"))
+        return version.scalar() or 0
+
+
+def schema_is_current(engine: Engine, target: Optional[int] = None) -> bool:
+    """
+    Схема уже не ниже target и партиции на ближайшие месяцы созданы
+
+    Два коротких запроса без блокировок: при обычном перезапуске бота
+    migrate() на этом заканчивается, не открывая транзакцию с
+    advisory-блокировкой на каждую миграцию.
+    """
+    target = latest_version() if target is None else target
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT to_regclass('schema_migrations'), to_regclass(:partition)"),
+            {"partition": _partition_name(_upcoming_months_end())},
+        ).one()
+        if row[0] is None:
+            return False
+        version = conn.execute(text("SELECT max(version) FROM schema_migrations"))
+        if (version.scalar() or 0) < target:
+            return False
+        # С версии 2 fines партиционирована, партиции создаёт migrate()
+        return target < 2 or row[1] is not None
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """
+    Применение недостающих миграций
+
+    Args:
+        engine: подключение к БД
+        target: до какой версии мигрировать (по умолчанию до последней)
+
+    Returns:
+        номера применённых миграций
+    """
+    if engine.dialect.name != "postgresql":
+        # Для SQLite и прочих локальных подмен схема берётся из моделей
+        from database.models import Base
+
+        Base.metadata.create_all(bind=engine)
+        return []
+
+    target = latest_version() if target is None else target
+    if schema_is_current(engine, target):
+        logger.debug("Схема БД актуальна (версия %s)", target)
+        return []
+    applied = []
+
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": MIGRATION_LOCK_KEY},
+            )
+            _ensure_version_table(conn)
+            done = conn.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+                {"version": migration.version},
+            ).scalar()
+            if done:
+                continue
+
+            logger.info("Миграция %s: %s", migration.version, migration.name)
+            migration.upgrade(conn)
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (version, name) "
+                    "VALUES (:version, :name)"
+                ),
+                {"version": migration.version, "name": migration.name},
+            )
+            applied.append(migration.version)
+
+    if target >= 2:
+        # Партиции на ближайшие месяцы создаются при каждом запуске
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": MIGRATION_LOCK_KEY},
+            )
+            ensure_fine_partitions(conn, date.today(), _upcoming_months_end())
+
+    return applied
@@ -1,30 +1,212 @@
 from sqlalchemy import (
     create_engine,
+    BigInteger,
     Column,
     String,
+    Date,
     DateTime,
     Boolean,
     Integer,
     DECIMAL,
+    Text,
+    Index,
 )
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from datetime import datetime
+from typing import Callable, Optional, TypeVar
+import asyncio
+from bot import metrics
 from bot.config import config
 
-# Создаём подключение к БД с использованием свойства
-engine = create_engine(config.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+T = TypeVar("T")
+
+# Продавец (кабинет WB) по умолчанию: настройки из .env, данные до появления
+# seller_accounts
+DEFAULT_SELLER_ID = "default"
+
+# Подключения создаются лениво: импорт модуля не открывает соединений
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_async_engine = None
+_async_session_factory = None
+
+
+def _engine_options(url: str, driver: str) -> dict:
+    """Параметры пула и таймаут запросов из конфигурации"""
+    if url.startswith("sqlite"):
+        return {}
+
+    options = {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+    }
+    connect_args = {}
+    if config.DB_CONNECT_TIMEOUT:
+        # Недоступная БД не задерживает запуск дольше таймаута
+        key = "timeout" if driver == "asyncpg" else "connect_timeout"
+        connect_args[key] = config.DB_CONNECT_TIMEOUT
+    if config.DB_STATEMENT_TIMEOUT:
+        timeout = str(config.DB_STATEMENT_TIMEOUT)
+        if driver == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": timeout}
+        else:
+            connect_args["options"] = f"-c statement_timeout={timeout}"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def get_engine() -> Engine:
+    """Синхронный engine (создаётся при первом обращении)"""
+    global _engine
+    if _engine is None:
+        url = config.DATABASE_URL
+        _engine = create_engine(url, **_engine_options(url, "psycopg2"))
+    return _engine
+
+
+def SessionLocal() -> Session:
+    """Новая синхронная сессия БД"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(
+            autocommit=False, autoflush=False, bind=get_engine()
+        )
+    return _session_factory()
+
+
+def create_report_engine() -> Engine:
+    """
+    Отдельный engine для отчётов (api/main.py)
+
+    Свой небольшой пул (API_DB_POOL_SIZE, без overflow): тяжёлые выборки
+    ждут соединения в нём, а не занимают пул цикла опроса. Транзакции
+    только на чтение, свой statement_timeout; API_DATABASE_URL может
+    указывать на реплику.
+    """
+    url = config.API_DATABASE_URL or config.DATABASE_URL
+    if url.startswith("sqlite"):
+        return create_engine(url)
+
+    options = _engine_options(url, "psycopg2")
+    options.update(pool_size=config.API_DB_POOL_SIZE, max_overflow=0)
+    settings = "-c default_transaction_read_only=on"
+    if config.API_STATEMENT_TIMEOUT:
+        settings += f" -c statement_timeout={config.API_STATEMENT_TIMEOUT}"
+    options.setdefault("connect_args", {})["options"] = settings
+    return create_engine(url, **options)
+
+
+def get_async_engine():
+    """Асинхронный engine на asyncpg (создаётся при первом обращении)"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = config.ASYNC_DATABASE_URL
+        _async_engine = create_async_engine(url, **_engine_options(url, "asyncpg"))
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    """Новая асинхронная сессия БД"""
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _async_session_factory = async_sessionmaker(
+            get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory()
+
+
+def _run_in_session(
+    session_factory: Callable[[], Session], fn: Callable[..., T], *args
+) -> T:
+    db = session_factory()
+    try:
+        result = fn(db, *args)
+        with metrics.STAGE_COMMIT.time():
+            db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_db(
+    fn: Callable[..., T],
+    *args,
+    session_factory: Optional[Callable[[], Session]] = None,
+) -> T:
+    """
+    Выполнение fn(db, *args) в отдельной транзакции, не блокируя event loop
+
+    При DB_ASYNC сессия асинхронная (asyncpg), а fn работает с ней через
+    run_sync, поэтому репозитории остаются синхронными. Иначе fn
+    выполняется в пуле потоков с обычной сессией. Коммит после fn,
+    откат при исключении.
+
+    Args:
+        fn: функция, первым аргументом получает сессию
+        session_factory: явная фабрика синхронных сессий
+    """
+    if session_factory is None and config.DB_ASYNC:
+        async with AsyncSessionLocal() as session:
+            try:
+                result = await session.run_sync(fn, *args)
+                with metrics.STAGE_COMMIT.time():
+                    await session.commit()
+                return result
+            except Exception:
+                await session.rollback()
+                raise
+
+    return await asyncio.to_thread(
+        _run_in_session, session_factory or SessionLocal, fn, *args
+    )
+
+
+async def dispose_engines():
+    """Закрытие пулов соединений"""
+    global _engine, _session_factory, _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+    _engine = _session_factory = _async_engine = _async_session_factory = None
+
+
+def __getattr__(name: str):
+    # Совместимость: database.models.engine раньше создавался при импорте
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class Fine(Base):
     """Модель для хранения штрафов"""
 
     __tablename__ = "fines"
 
+    # Ключ продавца: один процесс и одна таблица обслуживают все кабинеты
+    seller_id = Column(
+        String(50),
+        primary_key=True,
+        default=DEFAULT_SELLER_ID,
+        server_default=DEFAULT_SELLER_ID,
+    )
     id = Column(String(50), primary_key=True)
-    date = Column(DateTime, nullable=False)
+    # В PostgreSQL таблица партиционирована по date, поэтому date входит в PK
+    date = Column(DateTime, primary_key=True, nullable=False)
     type = Column(String(200), nullable=False)
     amount = Column(DECIMAL(10, 2), nullable=False)
     order_id = Column(String(50))
@@ -32,19 +214,193 @@ class Fine(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     notified = Column(Boolean, default=False)
 
+    # Индексы повторяют миграции (database/migrations.py) для create_all
+    __table_args__ = (
+        Index(
+            "idx_fines_unnotified",
+            "date",
+            postgresql_where=notified == False,  # noqa: E712
+            sqlite_where=notified == False,  # noqa: E712
+        ),
+        Index("idx_fines_date", "date"),
+        Index("idx_fines_seller_date", "seller_id", "date", "id"),
+        Index("idx_fines_type", "type"),
+        Index("idx_fines_order_id", "order_id"),
+    )
+
 
 class Notification(Base):
-    """Модель для логов уведомлений"""
+    """
+    Модель уведомлений (transactional outbox)
+
+    Строка со статусом pending создаётся в одной транзакции с новым
+    штрафом, воркер доставки забирает её, отправляет и записывает итог.
+    """
 
     __tablename__ = "notifications"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    seller_id = Column(
+        String(50),
+        nullable=False,
+        default=DEFAULT_SELLER_ID,
+        server_default=DEFAULT_SELLER_ID,
+    )
     fine_id = Column(String(50))
     channel = Column(String(50), nullable=False)
     sent_at = Column(DateTime, default=datetime.utcnow)
     success = Column(Boolean, default=True)
+    error_message = Column(Text)
+    retry_count = Column(Integer, default=0)
+
+    # Поля outbox
+    kind = Column(String(20), default="fine")
+    # Для kind="status": изменение в fine_history, о котором уведомление
+    history_id = Column(BigInteger().with_variant(Integer, "sqlite"))
+    chat_id = Column(String(50))
+    status = Column(String(20), default="sent")  # pending/sending/sent/failed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    locked_until = Column(DateTime)
+    locked_by = Column(String(100))
+
+    __table_args__ = (
+        # Очередь воркера: только недоставленные строки
+        Index(
+            "idx_notifications_pending",
+            "next_attempt_at",
+            postgresql_where=status.in_(["pending", "sending"]),
+            sqlite_where=status.in_(["pending", "sending"]),
+        ),
+        Index("idx_notifications_fine_id", "fine_id"),
+    )
+
+
+class FetchCursor(Base):
+    """Курсор инкрементальной загрузки (high-water mark по дате штрафа)"""
+
+    __tablename__ = "fetch_cursors"
+
+    name = Column(String(100), primary_key=True)
+    position = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailyStat(Base):
+    """
+    Дневной агрегат штрафов: количество и сумма по продавцу, дню, типу и статусу
+
+    Обновляется инкрементально в одной транзакции с сохранением штрафов,
+    поэтому итоги и отчёты читают O(дней) строк, а не всю таблицу fines.
+    """
+
+    __tablename__ = "daily_stats"
+
+    seller_id = Column(
+        String(50),
+        primary_key=True,
+        default=DEFAULT_SELLER_ID,
+        server_default=DEFAULT_SELLER_ID,
+    )
+    day = Column(Date, primary_key=True)
+    type = Column(String(200), primary_key=True)
+    status = Column(String(50), primary_key=True)
+    fines_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(DECIMAL(15, 2), nullable=False, default=0)
+
+
+class SellerAccount(Base):
+    """
+    Кабинет продавца WB, который опрашивает бот
+
+    chat_ids - id чатов Telegram через запятую, check_interval - период
+    опроса в секундах (пусто = CHECK_INTERVAL).
+    """
+
+    __tablename__ = "seller_accounts"
+
+    id = Column(String(50), primary_key=True)
+    name = Column(String(200), nullable=False)
+    api_key = Column(Text, nullable=False)
+    chat_ids = Column(Text, nullable=False)
+    check_interval = Column(Integer)
+    enabled = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BackfillWindow(Base):
+    """
+    Окно исторической загрузки (python -m bot.backfill), уже загруженное
+
+    Чекпоинт для возобновления: после перезапуска окна с записью здесь
+    пропускаются.
+    """
+
+    __tablename__ = "backfill_windows"
+
+    seller_id = Column(String(50), primary_key=True)
+    window_start = Column(DateTime, primary_key=True)
+    window_end = Column(DateTime, primary_key=True)
+    fines_count = Column(Integer, nullable=False, default=0)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BotReplica(Base):
+    """
+    Запущенная копия бота в режиме SHARDING
+
+    Копия отмечается раз в REPLICA_HEARTBEAT секунд; без отметки дольше
+    REPLICA_TTL она считается упавшей, и её кабинеты переходят к живым.
+    """
+
+    __tablename__ = "bot_replicas"
+
+    id = Column(String(100), primary_key=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, nullable=False)
+
+
+class PollLease(Base):
+    """Аренда опроса кабинета: циклы кабинета идут только у её держателя"""
+
+    __tablename__ = "poll_leases"
+
+    seller_id = Column(String(50), primary_key=True)
+    owner = Column(String(100), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class FineHistory(Base):
+    """
+    Изменение уже известного штрафа (тип, сумма или статус)
+
+    Строка добавляется только при реальном изменении; у неизменившихся
+    полей old_* и new_* пустые.
+    """
+
+    __tablename__ = "fine_history"
+
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    seller_id = Column(String(50), nullable=False)
+    fine_id = Column(String(50), nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    old_type = Column(String(200))
+    new_type = Column(String(200))
+    old_amount = Column(DECIMAL(10, 2))
+    new_amount = Column(DECIMAL(10, 2))
+    old_status = Column(String(50))
+    new_status = Column(String(50))
+
+    __table_args__ = (Index("idx_fine_history_fine", "seller_id", "fine_id", "id"),)
 
 
 def init_db():
-    """Инициализация базы данных"""
-    Base.metadata.create_all(bind=engine)
+    """Инициализация базы данных: применение миграций схемы"""
+    from database.migrations import migrate
+
+    migrate(get_engine())
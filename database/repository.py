@@ -1,61 +1,753 @@
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from sqlalchemy import and_, delete, func, insert, or_, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List, Optional
-from database.models import Fine, Notification
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+from bot.config import config
+from bot.records import FineRecord, InvalidFineError
+from database.history import FineChange, FineHistoryRepository
+from database.models import (
+    DEFAULT_SELLER_ID,
+    BackfillWindow,
+    BotReplica,
+    DailyStat,
+    FetchCursor,
+    Fine,
+    Notification,
+    PollLease,
+    SellerAccount,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    """Разбиение списка на части фиксированного размера"""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _to_record(fine: Union[FineRecord, dict]) -> FineRecord:
+    """Штраф из API в виде FineRecord (словари разбираются здесь)"""
+    if isinstance(fine, FineRecord):
+        return fine
+    return FineRecord.from_api(fine)
+
+
+def _stat_key(fine_date: datetime, fine_type: str, status: Optional[str]) -> Tuple:
+    """Ключ строки daily_stats для штрафа"""
+    return (fine_date.date(), fine_type, status or "")
+
+
+def _add_delta(deltas: Dict, key: Tuple, count: int, amount: Decimal):
+    current = deltas.get(key, (0, Decimal(0)))
+    deltas[key] = (current[0] + count, current[1] + amount)
+
+
+@dataclass(frozen=True)
+class FineFilter:
+    """Условия выборки штрафов; пустые поля не ограничивают"""
+
+    date_from: Optional[datetime] = None  # включительно
+    date_to: Optional[datetime] = None  # не включая
+    type: Optional[str] = None
+    status: Optional[str] = None
+    min_amount: Optional[Decimal] = None  # включительно
+    order_id: Optional[str] = None
+
+    def apply(self, query):
+        if self.date_from is not None:
+            query = query.where(Fine.date >= self.date_from)
+        if self.date_to is not None:
+            query = query.where(Fine.date < self.date_to)
+        if self.type is not None:
+            query = query.where(Fine.type == self.type)
+        if self.status is not None:
+            query = query.where(Fine.status == self.status)
+        if self.min_amount is not None:
+            query = query.where(Fine.amount >= self.min_amount)
+        if self.order_id is not None:
+            query = query.where(Fine.order_id == self.order_id)
+        return query
+
+
+def _insert(db: Session, model):
+    """INSERT с поддержкой ON CONFLICT для текущего диалекта БД"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Upsert не поддерживается для {dialect}")
 
 
 class FineRepository:
-    def __init__(self, db: Session):
+    """Штрафы одного продавца (seller_id)"""
+
+    def __init__(self, db: Session, seller_id: str = DEFAULT_SELLER_ID):
         self.db = db
+        self.seller_id = seller_id
+        # Изменения известных штрафов, записанные этим репозиторием
+        self.changes: List[FineChange] = []
+        # id строк fine_history для этих изменений, по id штрафа
+        self.history_ids: Dict[str, int] = {}
+        # Изменения daily_stats, внесённые этим репозиторием (для SummaryCache)
+        self.deltas: Dict[Tuple, Tuple[int, Decimal]] = {}
 
-    def save_fine(self, fine_data: dict) -> Optional[Fine]:
-        """Сохранение или обновление штрафа"""
+    def save_fine(self, fine_data: Union[FineRecord, dict]) -> Optional[Fine]:
+        """Сохранение или обновление штрафа (без изменений - без записи в БД)"""
+        record = _to_record(fine_data)
         try:
             # Проверяем, есть ли уже такой штраф
-            fine = self.db.query(Fine).filter(Fine.id == fine_data["id"]).first()
+            fine = (
+                self.db.query(Fine)
+                .filter(Fine.seller_id == self.seller_id, Fine.id == record.id)
+                .first()
+            )
 
+            deltas = {}
             if fine:
+                change = FineChange.between(fine, record.as_row(self.seller_id))
+                if change is None:
+                    return fine, False
+
                 # Обновляем существующий
-                fine.type = fine_data["type"]
-                fine.amount = fine_data["amount"]
-                fine.status = fine_data["status"]
+                _add_delta(
+                    deltas,
+                    _stat_key(fine.date, fine.type, fine.status),
+                    -1,
+                    -Decimal(str(fine.amount)),
+                )
+                fine.type = record.type
+                fine.amount = record.amount
+                fine.status = record.status
+                self.history_ids.update(
+                    FineHistoryRepository(self.db, self.seller_id).append([change])
+                )
+                self.changes.append(change)
                 is_new = False
             else:
                 # Создаём новый
-                fine = Fine(
-                    id=fine_data["id"],
-                    date=datetime.fromisoformat(
-                        fine_data["date"].replace("Z", "+00:00")
-                    ),
-                    type=fine_data["type"],
-                    amount=fine_data["amount"],
-                    order_id=fine_data.get("order_id", ""),
-                    status=fine_data["status"],
-                )
+                fine = Fine(**record.as_row(self.seller_id))
                 self.db.add(fine)
                 is_new = True
 
+            _add_delta(
+                deltas,
+                _stat_key(fine.date, fine.type, fine.status),
+                1,
+                Decimal(str(fine.amount)),
+            )
+            StatsRepository(self.db, self.seller_id).apply(deltas)
             self.db.commit()
+            self._merge_deltas(deltas)
             return fine, is_new
 
         except Exception as e:
             self.db.rollback()
             raise e
 
+    def save_fines_batch(self, fines: List[Union[FineRecord, dict]]) -> List[str]:
+        """
+        Пакетное сохранение штрафов без коммита
+
+        На каждую пачку из DB_BATCH_SIZE штрафов: один SELECT для поиска
+        уже известных id и их полей, INSERT ... ON CONFLICT DO NOTHING для
+        новых и INSERT ... ON CONFLICT DO UPDATE для изменившихся строк
+        (каждый - только если такие строки есть). Неизменившиеся штрафы не
+        пишутся вовсе. Если WB вернул известный id с другой датой, строка
+        под старой датой удаляется (дата входит в первичный ключ), и штраф
+        записывается под новой - без уведомления, как изменение. В той же
+        транзакции обновляется daily_stats, а изменения попадают в
+        fine_history и self.changes. Коммит остаётся за вызывающим кодом.
+
+        Returns:
+            id новых штрафов в порядке их появления в ответе API
+        """
+        # Повторы id внутри ответа схлопываем, побеждает последний
+        rows_by_id = {}
+        for fine_data in fines:
+            try:
+                record = _to_record(fine_data)
+            except InvalidFineError as e:
+                logger.error("Пропущен некорректный штраф %r: %s", fine_data, e)
+                continue
+            rows_by_id[record.id] = record.as_row(self.seller_id)
+        rows = list(rows_by_id.values())
+        new_ids, changes = [], []
+        deltas = {}
+
+        for chunk in _chunks(rows, config.DB_BATCH_SIZE):
+            existing = {
+                (row.id, row.date): row
+                for row in self.db.execute(
+                    select(
+                        Fine.id, Fine.date, Fine.type, Fine.amount, Fine.status
+                    ).where(
+                        Fine.seller_id == self.seller_id,
+                        Fine.id.in_([row["id"] for row in chunk]),
+                    )
+                )
+            }
+            known_by_id = {fine_id: known for (fine_id, _), known in existing.items()}
+
+            to_insert, to_update, to_move, chunk_changes = [], [], {}, {}
+            for row in chunk:
+                known = existing.get((row["id"], row["date"]))
+                if known is not None:
+                    change = FineChange.between(known, row)
+                    if change is None:
+                        continue
+                    chunk_changes[row["id"]] = change
+                    # Изменившийся штраф переезжает в другую ячейку агрегата
+                    _add_delta(
+                        deltas,
+                        _stat_key(known.date, known.type, known.status),
+                        -1,
+                        -known.amount,
+                    )
+                    to_update.append(row)
+                elif row["id"] not in known_by_id:
+                    to_insert.append(row)
+                else:
+                    # WB сменил дату штрафа: переносим строку на новую дату
+                    change = FineChange.between(known_by_id[row["id"]], row)
+                    if change is not None:
+                        chunk_changes[row["id"]] = change
+                    to_move[row["id"]] = row
+
+                _add_delta(
+                    deltas,
+                    _stat_key(row["date"], row["type"], row["status"]),
+                    1,
+                    row["amount"],
+                )
+
+            if to_insert:
+                new_ids.extend(self._insert_new(to_insert, deltas))
+            written = []
+            if to_move:
+                moved = self._delete_moved(to_move, deltas)
+                if moved:
+                    written += self._update_changed(moved, chunk_changes, deltas)
+            if to_update:
+                written += self._update_changed(to_update, chunk_changes, deltas)
+            changes.extend(
+                chunk_changes[fine_id]
+                for fine_id in written
+                if fine_id in chunk_changes
+            )
+
+        StatsRepository(self.db, self.seller_id).apply(deltas)
+        self.history_ids.update(
+            FineHistoryRepository(self.db, self.seller_id).append(changes)
+        )
+        self.changes.extend(changes)
+        self._merge_deltas(deltas)
+        return new_ids
+
+    def _merge_deltas(self, deltas: Dict):
+        for key, (count, amount) in deltas.items():
+            if count or amount:
+                _add_delta(self.deltas, key, count, amount)
+
+    def _update_changed(
+        self, rows: List[dict], changes: Dict[str, FineChange], deltas: Dict
+    ) -> List[str]:
+        """
+        Upsert изменившихся штрафов; возвращает id записанных строк
+
+        Строка обновляется, только если поля в БД всё ещё отличаются: если
+        то же изменение успела записать другая транзакция, строка не
+        пишется повторно, а её вклад в агрегат и историю отменяется.
+        """
+        stmt = _insert(self.db, Fine).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Fine.seller_id, Fine.id, Fine.date],
+            set_={
+                "type": stmt.excluded.type,
+                "amount": stmt.excluded.amount,
+                "status": stmt.excluded.status,
+            },
+            where=or_(
+                Fine.type != stmt.excluded.type,
+                Fine.amount != stmt.excluded.amount,
+                Fine.status.is_distinct_from(stmt.excluded.status),
+            ),
+        ).returning(Fine.id)
+        written = set(self.db.scalars(stmt))
+        for row in rows:
+            if row["id"] in written:
+                continue
+            _add_delta(
+                deltas,
+                _stat_key(row["date"], row["type"], row["status"]),
+                -1,
+                -row["amount"],
+            )
+            change = changes.get(row["id"])
+            if change is not None:
+                _add_delta(
+                    deltas,
+                    _stat_key(row["date"], change.old_type, change.old_status),
+                    1,
+                    change.old_amount,
+                )
+        return [row["id"] for row in rows if row["id"] in written]
+
+    def _delete_moved(self, rows: Dict[str, dict], deltas: Dict) -> List[dict]:
+        """
+        Удаление строк штрафов, у которых WB сменил дату
+
+        Каждая удалённая строка вычитается из своей ячейки агрегата.
+        Возвращает строки с новой датой, которые надо записать (с прежними
+        notified и created_at); если старую строку уже перенесла другая
+        транзакция, штраф не пишется повторно и его вклад в агрегат
+        отменяется.
+        """
+        stmt = (
+            delete(Fine)
+            .where(
+                Fine.seller_id == self.seller_id,
+                or_(
+                    *(
+                        and_(Fine.id == fine_id, Fine.date != row["date"])
+                        for fine_id, row in rows.items()
+                    )
+                ),
+            )
+            .returning(
+                Fine.id,
+                Fine.date,
+                Fine.type,
+                Fine.amount,
+                Fine.status,
+                Fine.notified,
+                Fine.created_at,
+            )
+        )
+        deleted = {}
+        for old in self.db.execute(stmt):
+            deleted[old.id] = {"notified": old.notified, "created_at": old.created_at}
+            _add_delta(
+                deltas, _stat_key(old.date, old.type, old.status), -1, -old.amount
+            )
+        for fine_id, row in rows.items():
+            if fine_id not in deleted:
+                _add_delta(
+                    deltas,
+                    _stat_key(row["date"], row["type"], row["status"]),
+                    -1,
+                    -row["amount"],
+                )
+        return [
+            {**row, **deleted[fine_id]}
+            for fine_id, row in rows.items()
+            if fine_id in deleted
+        ]
+
+    def _insert_new(self, rows: List[dict], deltas: Dict) -> List[str]:
+        """
+        Вставка штрафов, которых SELECT не нашёл; возвращает id вставленных
+
+        Новым штраф считается, только если строку вставила эта транзакция
+        (ON CONFLICT DO NOTHING RETURNING). Если тот же штраф одновременно
+        сохраняет другая копия бота, вставка в ней дождётся коммита и не
+        вернёт id: уведомление поставит только одна из копий. Такой штраф
+        не пишется повторно и не учитывается в агрегате - его учла вставившая
+        транзакция; отличия, если есть, подхватит следующий цикл.
+        """
+        stmt = (
+            _insert(self.db, Fine)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[Fine.seller_id, Fine.id, Fine.date])
+            .returning(Fine.id)
+        )
+        inserted = set(self.db.scalars(stmt))
+        for row in rows:
+            if row["id"] not in inserted:
+                _add_delta(
+                    deltas,
+                    _stat_key(row["date"], row["type"], row["status"]),
+                    -1,
+                    -row["amount"],
+                )
+        return [row["id"] for row in rows if row["id"] in inserted]
+
+    def get_recent(
+        self, since: datetime, limit: int
+    ) -> List[Tuple[str, datetime, str, Decimal, str]]:
+        """
+        Последние штрафы с датой не раньше since (для прогрева кэша)
+
+        Returns:
+            не больше limit строк (id, date, type, amount, status) по
+            возрастанию даты
+        """
+        rows = self.db.execute(
+            select(Fine.id, Fine.date, Fine.type, Fine.amount, Fine.status)
+            .where(Fine.seller_id == self.seller_id, Fine.date >= since)
+            .order_by(Fine.date.desc())
+            .limit(limit)
+        ).all()
+        return [tuple(row) for row in reversed(rows)]
+
+    def load_historical(self, fines: List[FineRecord]) -> int:
+        """
+        Загрузка исторических штрафов без уведомлений (без коммита)
+
+        Уже известные штрафы (по seller_id и id, без даты) проходят через
+        save_fines_batch: изменения записываются, а штраф, у которого WB
+        сменил дату, переносится, а не дублируется. Новые строки сразу
+        notified; повторная загрузка того же окна ничего не добавляет.
+        В PostgreSQL новые штрафы идут через COPY во временную таблицу и
+        переносятся в fines одним INSERT ... ON CONFLICT DO NOTHING,
+        daily_stats обновляется тем же запросом. В других СУБД все
+        штрафы идут через save_fines_batch.
+
+        Returns:
+            сколько штрафов добавлено
+        """
+        if not fines:
+            return 0
+        if self.db.get_bind().dialect.name != "postgresql":
+            new_ids = self.save_fines_batch(fines)
+            self.mark_as_notified_batch(new_ids)
+            return len(new_ids)
+
+        # Повторы id внутри пачки схлопываем, как в save_fines_batch
+        by_id = {fine.id: fine for fine in fines}
+        known = self._known_ids(list(by_id))
+        added = 0
+        if known:
+            new_ids = self.save_fines_batch(
+                [fine for fine_id, fine in by_id.items() if fine_id in known]
+            )
+            self.mark_as_notified_batch(new_ids)
+            added += len(new_ids)
+        fines = [fine for fine_id, fine in by_id.items() if fine_id not in known]
+        if not fines:
+            return added
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for fine in fines:
+            writer.writerow(
+                (fine.id, fine.date, fine.type, fine.amount, fine.order_id, fine.status)
+            )
+        buffer.seek(0)
+
+        self.db.execute(text("""
+            CREATE TEMP TABLE IF NOT EXISTS fines_load (
+                id VARCHAR(50), date TIMESTAMP, type VARCHAR(200),
+                amount DECIMAL(10, 2), order_id VARCHAR(50), status VARCHAR(50)
+            ) ON COMMIT DELETE ROWS
+            """))
+        cursor = self.db.connection().connection.cursor()
+        try:
+            # Пустое поле CSV без кавычек COPY читает как NULL; order_id ""
+            # (нет номера заказа) должен остаться "", как при upsert
+            cursor.copy_expert(
+                "COPY fines_load (id, date, type, amount, order_id, status) "
+                "FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (order_id, status))",
+                buffer,
+            )
+        finally:
+            cursor.close()
+
+        # Порядок строк daily_stats - как в StatsRepository.apply
+        return added + self.db.execute(
+            text("""
+            WITH inserted AS (
+                INSERT INTO fines (
+                    seller_id, id, date, type, amount, order_id, status,
+                    created_at, notified
+                )
+                SELECT :seller_id, id, date, type, amount, order_id, status,
+                       timezone('utc', now()), TRUE
+                FROM fines_load
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM fines
+                    WHERE fines.seller_id = :seller_id AND fines.id = fines_load.id
+                )
+                ON CONFLICT (seller_id, id, date) DO NOTHING
+                RETURNING date, type, status, amount
+            ), stats AS (
+                INSERT INTO daily_stats (
+                    seller_id, day, type, status, fines_count, total_amount
+                )
+                SELECT :seller_id, date::date, type, coalesce(status, ''),
+                       count(*), sum(amount)
+                FROM inserted
+                GROUP BY 2, 3, 4
+                ORDER BY 2, 3, 4
+                ON CONFLICT (seller_id, day, type, status) DO UPDATE SET
+                    fines_count = daily_stats.fines_count + excluded.fines_count,
+                    total_amount = daily_stats.total_amount + excluded.total_amount
+            )
+            SELECT count(*) FROM inserted
+            """),
+            {"seller_id": self.seller_id},
+        ).scalar()
+
+    def _known_ids(self, fine_ids: List[str]) -> Set[str]:
+        """Какие из fine_ids уже сохранены (под любой датой)"""
+        known = set()
+        for chunk in _chunks(fine_ids, config.DB_BATCH_SIZE):
+            known.update(
+                self.db.scalars(
+                    select(Fine.id).where(
+                        Fine.seller_id == self.seller_id, Fine.id.in_(chunk)
+                    )
+                )
+            )
+        return known
+
+    def find(
+        self,
+        fine_filter: FineFilter,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None,
+    ) -> List[Fine]:
+        """
+        Страница штрафов по фильтру, от новых к старым
+
+        Keyset pagination: следующая страница начинается после последней
+        строки предыдущей, after = (date, id). Без OFFSET каждая страница
+        читается по индексу (seller_id, date, id) за одно и то же время,
+        а вставки между запросами не сдвигают и не дублируют строки.
+        """
+        query = fine_filter.apply(select(Fine).where(Fine.seller_id == self.seller_id))
+        if after is not None:
+            # Отдельное условие по date - для отсечения партиций
+            query = query.where(
+                Fine.date <= after[0], tuple_(Fine.date, Fine.id) < tuple_(*after)
+            )
+        query = query.order_by(Fine.date.desc(), Fine.id.desc()).limit(limit)
+        return self.db.scalars(query).all()
+
     def get_unnotified_fines(self) -> List[Fine]:
         """Получение неуведомленных штрафов"""
-        return self.db.query(Fine).filter(Fine.notified == False).all()
+        return (
+            self.db.query(Fine)
+            .filter(Fine.seller_id == self.seller_id, Fine.notified == False)
+            .all()
+        )
 
     def mark_as_notified(self, fine_id: str):
         """Отметить штраф как уведомлённый"""
-        fine = self.db.query(Fine).filter(Fine.id == fine_id).first()
+        fine = (
+            self.db.query(Fine)
+            .filter(Fine.seller_id == self.seller_id, Fine.id == fine_id)
+            .first()
+        )
         if fine:
             fine.notified = True
             self.db.commit()
 
+    def get_by_ids(self, fine_ids: List[str]) -> Dict[str, Fine]:
+        """Штрафы по списку id"""
+        fines = {}
+        for chunk in _chunks(list(fine_ids), config.DB_BATCH_SIZE):
+            query = select(Fine).where(
+                Fine.seller_id == self.seller_id, Fine.id.in_(chunk)
+            )
+            for fine in self.db.scalars(query):
+                fines[fine.id] = fine
+        return fines
+
+    def mark_as_notified_batch(self, fine_ids: List[str]):
+        """Отметить штрафы как уведомлённые одним UPDATE (без коммита)"""
+        for chunk in _chunks(list(fine_ids), config.DB_BATCH_SIZE):
+            self.db.execute(
+                update(Fine)
+                .where(Fine.seller_id == self.seller_id, Fine.id.in_(chunk))
+                .values(notified=True)
+            )
+
     def get_fines_count(self) -> int:
+        """Общее количество штрафов (по daily_stats, без скана fines)"""
+        return StatsRepository(self.db, self.seller_id).get_total_count()
+
+
+class StatsRepository:
+    """
+    Дневной агрегат штрафов daily_stats
+
+    seller_id=None в отчётах означает все кабинеты; apply() требует
+    конкретного продавца.
+    """
+
+    def __init__(self, db: Session, seller_id: Optional[str] = DEFAULT_SELLER_ID):
+        self.db = db
+        self.seller_id = seller_id
+
+    def apply(self, deltas: Dict[Tuple, Tuple[int, Decimal]]):
+        """
+        Применение изменений агрегата одним upsert (без коммита)
+
+        Args:
+            deltas: {(день, тип, статус): (изменение количества, изменение суммы)}
+        """
+        rows = [
+            {
+                "seller_id": self.seller_id,
+                "day": key[0],
+                "type": key[1],
+                "status": key[2],
+                "fines_count": count,
+                "total_amount": amount,
+            }
+            # Сортировка: одинаковый порядок блокировок у параллельных транзакций
+            for key, (count, amount) in sorted(deltas.items())
+            if count or amount
+        ]
+        for chunk in _chunks(rows, config.DB_BATCH_SIZE):
+            stmt = _insert(self.db, DailyStat).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[
+                    DailyStat.seller_id,
+                    DailyStat.day,
+                    DailyStat.type,
+                    DailyStat.status,
+                ],
+                set_={
+                    "fines_count": DailyStat.fines_count + stmt.excluded.fines_count,
+                    "total_amount": DailyStat.total_amount + stmt.excluded.total_amount,
+                },
+            )
+            self.db.execute(stmt)
+
+    def get_rows(self) -> List[Tuple]:
+        """Все строки агрегата: (seller_id, день, тип, статус, количество, сумма)"""
+        query = self._filtered(
+            select(
+                DailyStat.seller_id,
+                DailyStat.day,
+                DailyStat.type,
+                DailyStat.status,
+                DailyStat.fines_count,
+                DailyStat.total_amount,
+            ),
+            None,
+            None,
+        )
+        return [tuple(row) for row in self.db.execute(query)]
+
+    def get_total_count(self) -> int:
         """Общее количество штрафов"""
-        return self.db.query(Fine).count()
+        query = self._filtered(select(func.sum(DailyStat.fines_count)), None, None)
+        return int(self.db.scalar(query) or 0)
+
+    def _filtered(
+        self,
+        query,
+        date_from: Optional[date],
+        date_to: Optional[date],
+        fine_type: Optional[str] = None,
+        status: Optional[str] = None,
+    ):
+        if self.seller_id is not None:
+            query = query.where(DailyStat.seller_id == self.seller_id)
+        if date_from is not None:
+            query = query.where(DailyStat.day >= date_from)
+        if date_to is not None:
+            query = query.where(DailyStat.day <= date_to)
+        if fine_type is not None:
+            query = query.where(DailyStat.type == fine_type)
+        if status is not None:
+            query = query.where(DailyStat.status == status)
+        return query
+
+    def get_daily(
+        self,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        fine_type: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> List[Dict]:
+        """Количество и сумма штрафов по дням, от новых к старым"""
+        query = self._filtered(
+            select(
+                DailyStat.day,
+                func.sum(DailyStat.fines_count).label("fines_count"),
+                func.sum(DailyStat.total_amount).label("total_amount"),
+            ).group_by(DailyStat.day),
+            date_from,
+            date_to,
+            fine_type,
+            status,
+        )
+        return [
+            {
+                "day": row.day,
+                "fines_count": int(row.fines_count),
+                "total_amount": row.total_amount,
+            }
+            for row in self.db.execute(query.order_by(DailyStat.day.desc()))
+        ]
+
+    def get_breakdown(
+        self,
+        by: str = "type",
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        fine_type: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Количество и сумма штрафов по типу или статусу за период
+
+        Args:
+            by: "type" или "status"
+        """
+        if by not in ("type", "status"):
+            raise ValueError(f"Неизвестная группировка: {by}")
+        column = getattr(DailyStat, by)
+        total_amount = func.sum(DailyStat.total_amount)
+        query = self._filtered(
+            select(
+                column,
+                func.sum(DailyStat.fines_count).label("fines_count"),
+                total_amount.label("total_amount"),
+            ).group_by(column),
+            date_from,
+            date_to,
+            fine_type,
+            status,
+        )
+        return [
+            {
+                by: row[0],
+                "fines_count": int(row.fines_count),
+                "total_amount": row.total_amount,
+            }
+            for row in self.db.execute(query.order_by(total_amount.desc()))
+        ]
+
+    def rebuild(self):
+        """Пересчёт агрегата по таблице fines целиком (без коммита)"""
+        self.db.execute(delete(DailyStat))
+        day = func.date(Fine.date)
+        status = func.coalesce(Fine.status, "")
+        self.db.execute(
+            insert(DailyStat).from_select(
+                ["seller_id", "day", "type", "status", "fines_count", "total_amount"],
+                select(
+                    Fine.seller_id,
+                    day,
+                    Fine.type,
+                    status,
+                    func.count(),
+                    func.sum(Fine.amount),
+                ).group_by(Fine.seller_id, day, Fine.type, status),
+            )
+        )
 
 
 class NotificationRepository:
@@ -69,3 +761,324 @@ class NotificationRepository:
         notification = Notification(fine_id=fine_id, channel=channel, success=success)
         self.db.add(notification)
         self.db.commit()
+
+    def enqueue(
+        self,
+        fine_ids: List[str],
+        chat_id: str,
+        channel: str = "telegram",
+        kind: str = "fine",
+        seller_id: str = DEFAULT_SELLER_ID,
+        history_ids: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Постановка уведомлений в outbox (без коммита, в транзакции upsert)
+
+        Args:
+            history_ids: строка fine_history для каждого штрафа (kind="status")
+        """
+        if not fine_ids:
+            return
+        now = datetime.utcnow()
+        self.db.execute(
+            insert(Notification),
+            [
+                {
+                    "seller_id": seller_id,
+                    "fine_id": fine_id,
+                    "channel": channel,
+                    "kind": kind,
+                    "history_id": (history_ids or {}).get(fine_id),
+                    "chat_id": chat_id,
+                    "status": "pending",
+                    "success": None,
+                    "sent_at": None,
+                    "created_at": now,
+                    "next_attempt_at": now,
+                }
+                for fine_id in fine_ids
+            ],
+        )
+
+    def claim_batch(self, limit: int, worker_id: str, lease: int) -> List[Notification]:
+        """
+        Захват пачки уведомлений воркером (коммит за вызывающим кодом)
+
+        SELECT ... FOR UPDATE SKIP LOCKED позволяет нескольким воркерам
+        разбирать одну очередь, не мешая друг другу. Строки, чья аренда
+        истекла (воркер упал), снова доступны.
+        """
+        now = datetime.utcnow()
+        notifications = self.db.scalars(
+            select(Notification)
+            .where(
+                or_(
+                    and_(
+                        Notification.status == "pending",
+                        Notification.next_attempt_at <= now,
+                    ),
+                    and_(
+                        Notification.status == "sending",
+                        Notification.locked_until < now,
+                    ),
+                )
+            )
+            .order_by(Notification.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+        for notification in notifications:
+            notification.status = "sending"
+            notification.locked_until = now + timedelta(seconds=lease)
+            notification.locked_by = worker_id
+            notification.retry_count = (notification.retry_count or 0) + 1
+        return notifications
+
+    def record_results(
+        self,
+        sent_ids: List[int],
+        failures: List[Dict],
+        max_attempts: int,
+        retry_delay: int,
+    ):
+        """
+        Запись итогов доставки (без коммита)
+
+        Args:
+            sent_ids: id доставленных уведомлений
+            failures: [{"id", "retry_count", "error"}] для недоставленных
+            max_attempts: после стольких попыток уведомление failed
+            retry_delay: базовая пауза до повтора, удваивается с каждой попыткой
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": notification_id,
+                "status": "sent",
+                "success": True,
+                "sent_at": now,
+                "error_message": None,
+                "locked_until": None,
+            }
+            for notification_id in sent_ids
+        ]
+        for failure in failures:
+            attempts = failure["retry_count"]
+            delay = min(retry_delay * 2 ** (attempts - 1), 3600)
+            rows.append(
+                {
+                    "id": failure["id"],
+                    "status": "failed" if attempts >= max_attempts else "pending",
+                    "success": False,
+                    "error_message": failure["error"],
+                    "next_attempt_at": now + timedelta(seconds=delay),
+                    "locked_until": None,
+                }
+            )
+        if rows:
+            self.db.execute(update(Notification), rows)
+
+    def log_notifications(
+        self, fine_ids: List[str], channel: str = "telegram", success: bool = True
+    ):
+        """Пакетное логирование уведомлений (без коммита)"""
+        if not fine_ids:
+            return
+        self.db.execute(
+            insert(Notification),
+            [
+                {"fine_id": fine_id, "channel": channel, "success": success}
+                for fine_id in fine_ids
+            ],
+        )
+
+
+class CursorRepository:
+    """Хранение курсоров инкрементальной загрузки рядом с таблицей fines"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_position(self, name: str) -> Optional[datetime]:
+        """Текущая позиция курсора или None, если загрузок ещё не было"""
+        cursor = self.db.get(FetchCursor, name)
+        return cursor.position if cursor else None
+
+    def advance(self, name: str, position: datetime):
+        """Сдвиг курсора вперёд (назад не двигается), без коммита"""
+        cursor = self.db.get(FetchCursor, name)
+        if cursor is None:
+            self.db.add(FetchCursor(name=name, position=position))
+        elif position > cursor.position:
+            cursor.position = position
+
+
+class BackfillRepository:
+    """Чекпоинты исторической загрузки одного продавца (backfill_windows)"""
+
+    def __init__(self, db: Session, seller_id: str = DEFAULT_SELLER_ID):
+        self.db = db
+        self.seller_id = seller_id
+
+    def get_finished(
+        self, start: datetime, end: datetime
+    ) -> List[Tuple[datetime, datetime]]:
+        """Загруженные окна (начало, конец) внутри [start, end]"""
+        rows = self.db.execute(
+            select(BackfillWindow.window_start, BackfillWindow.window_end).where(
+                BackfillWindow.seller_id == self.seller_id,
+                BackfillWindow.window_start >= start,
+                BackfillWindow.window_end <= end,
+            )
+        )
+        return [tuple(row) for row in rows]
+
+    def finish(self, start: datetime, end: datetime, fines_count: int):
+        """Отметить окно загруженным (без коммита)"""
+        stmt = _insert(self.db, BackfillWindow).values(
+            seller_id=self.seller_id,
+            window_start=start,
+            window_end=end,
+            fines_count=fines_count,
+            finished_at=datetime.utcnow(),
+        )
+        self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[
+                    BackfillWindow.seller_id,
+                    BackfillWindow.window_start,
+                    BackfillWindow.window_end,
+                ],
+                set_={
+                    "fines_count": stmt.excluded.fines_count,
+                    "finished_at": stmt.excluded.finished_at,
+                },
+            )
+        )
+
+
+class SellerRepository:
+    """Кабинеты продавцов (seller_accounts)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_enabled(self) -> List[SellerAccount]:
+        """Включённые кабинеты"""
+        return self.db.scalars(
+            select(SellerAccount)
+            .where(SellerAccount.enabled == True)  # noqa: E712
+            .order_by(SellerAccount.id)
+        ).all()
+
+    def get_all(self) -> List[SellerAccount]:
+        return self.db.scalars(select(SellerAccount).order_by(SellerAccount.id)).all()
+
+    def save(
+        self,
+        seller_id: str,
+        name: str,
+        api_key: str,
+        chat_ids: List[str],
+        check_interval: Optional[int] = None,
+    ) -> SellerAccount:
+        """Добавление или обновление кабинета (без коммита)"""
+        account = self.db.get(SellerAccount, seller_id)
+        if account is None:
+            account = SellerAccount(id=seller_id)
+            self.db.add(account)
+        account.name = name
+        account.api_key = api_key
+        account.chat_ids = ",".join(chat_ids)
+        account.check_interval = check_interval
+        account.enabled = True
+        return account
+
+    def set_enabled(self, seller_id: str, enabled: bool) -> bool:
+        """Включение/выключение кабинета (без коммита)"""
+        account = self.db.get(SellerAccount, seller_id)
+        if account is None:
+            return False
+        account.enabled = enabled
+        return True
+
+
+class ReplicaRepository:
+    """Копии бота (bot_replicas) и их аренды опроса кабинетов (poll_leases)"""
+
+    def __init__(self, db: Session, replica_id: str):
+        self.db = db
+        self.replica_id = replica_id
+
+    def heartbeat(self, ttl: float) -> List[str]:
+        """
+        Отметка своей копии и удаление упавших (без коммита)
+
+        Returns:
+            id живых копий, включая свою, по возрастанию
+        """
+        now = datetime.utcnow()
+        stmt = _insert(self.db, BotReplica).values(
+            id=self.replica_id, started_at=now, heartbeat_at=now
+        )
+        self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[BotReplica.id],
+                set_={"heartbeat_at": stmt.excluded.heartbeat_at},
+            )
+        )
+        self.db.execute(
+            delete(BotReplica).where(
+                BotReplica.heartbeat_at < now - timedelta(seconds=ttl)
+            )
+        )
+        return list(self.db.scalars(select(BotReplica.id).order_by(BotReplica.id)))
+
+    def acquire(self, seller_id: str, ttl: float) -> bool:
+        """
+        Взять или продлить аренду кабинета (без коммита)
+
+        Аренда достаётся, если она своя, истекла или её нет. Проверка и
+        запись - один INSERT ... ON CONFLICT, поэтому из двух копий
+        аренду получит только одна.
+        """
+        now = datetime.utcnow()
+        stmt = _insert(self.db, PollLease).values(
+            seller_id=seller_id,
+            owner=self.replica_id,
+            expires_at=now + timedelta(seconds=ttl),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PollLease.seller_id],
+            set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+            where=or_(PollLease.owner == self.replica_id, PollLease.expires_at < now),
+        ).returning(PollLease.seller_id)
+        return self.db.execute(stmt).first() is not None
+
+    def renew(self, seller_ids: List[str], ttl: float):
+        """
+        Продление своих аренд кабинетов seller_ids, отказ от остальных своих
+        (без коммита)
+        """
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        if seller_ids:
+            self.db.execute(
+                update(PollLease)
+                .where(
+                    PollLease.owner == self.replica_id,
+                    PollLease.seller_id.in_(seller_ids),
+                )
+                .values(expires_at=expires_at)
+            )
+        self.db.execute(
+            delete(PollLease).where(
+                PollLease.owner == self.replica_id,
+                PollLease.seller_id.not_in(seller_ids),
+            )
+        )
+
+    def leave(self):
+        """Удаление своей копии и её аренд при остановке (без коммита)"""
+        self.db.execute(delete(PollLease).where(PollLease.owner == self.replica_id))
+        self.db.execute(delete(BotReplica).where(BotReplica.id == self.replica_id))
@@ -1,11 +1,55 @@
-from fastapi import FastAPI
-from datetime import datetime
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse, StreamingResponse
+from datetime import datetime, timedelta
+import asyncio
+import bisect
+import itertools
+import json
+import math
+import os
 import random
-from typing import List
+import time
+import zlib
+from typing import Iterable, List, Optional, Tuple
 from pydantic import BaseModel
 
 app = FastAPI(title="Mock WB API")
 
+# Поток штрафов во времени (для симуляции опроса). При MOCK_ARRIVAL_RATE=0
+# каждый запрос, как раньше, возвращает 1-3 новых штрафа
+MOCK_ARRIVAL_RATE = float(os.getenv("MOCK_ARRIVAL_RATE", 0))  # штрафов/сек
+MOCK_BURST_RATE = float(os.getenv("MOCK_BURST_RATE", 0))  # штрафов/сек во всплеске
+MOCK_BURST_EVERY = float(os.getenv("MOCK_BURST_EVERY", 60))  # период всплесков, сек
+MOCK_BURST_DURATION = float(os.getenv("MOCK_BURST_DURATION", 10))  # сек
+
+# Детерминированный набор штрафов (нагрузочные тесты и бенчмарки): штрафы
+# вычисляются по номеру и отдаются потоком, без хранения в памяти
+MOCK_DATASET_SIZE = int(os.getenv("MOCK_DATASET_SIZE", 0))
+MOCK_SEED = int(os.getenv("MOCK_SEED", 42))
+MOCK_DATASET_STEP = float(os.getenv("MOCK_DATASET_STEP", 7))  # сек между штрафами
+# Дата последнего штрафа набора (ISO), по умолчанию - момент запуска сервера
+MOCK_DATASET_END = os.getenv("MOCK_DATASET_END", "")
+# После MOCK_DATASET_END набор растёт: новый штраф каждые MOCK_DATASET_STEP сек
+MOCK_DATASET_GROW = os.getenv("MOCK_DATASET_GROW", "false").lower() == "true"
+# Доля штрафов набора, у которых меняется статус, и за сколько секунд после
+# запуска сервера эти смены распределены
+MOCK_STATUS_CHANGE_RATE = float(os.getenv("MOCK_STATUS_CHANGE_RATE", 0))
+MOCK_STATUS_CHANGE_WITHIN = float(os.getenv("MOCK_STATUS_CHANGE_WITHIN", 600))
+
+# Внедрение сбоев в /api/v3/fines (доли запросов от 0 до 1). Меняются и на
+# ходу: POST /mock/faults {"outage": true}
+faults = {
+    "error_rate": float(os.getenv("MOCK_ERROR_RATE", 0)),  # ответ 503
+    "rate_limit_rate": float(os.getenv("MOCK_RATE_LIMIT_RATE", 0)),  # ответ 429
+    "retry_after": int(os.getenv("MOCK_RETRY_AFTER", 1)),  # Retry-After для 429, сек
+    "slow_rate": float(os.getenv("MOCK_SLOW_RATE", 0)),  # медленные ответы
+    "slow_ms": int(os.getenv("MOCK_SLOW_MS", 2000)),  # задержка медленного ответа
+    "outage": os.getenv("MOCK_OUTAGE", "false").lower() == "true",  # всё 503
+    "latency_ms": int(os.getenv("MOCK_LATENCY_MS", 0)),  # задержка каждого ответа
+    "latency_jitter_ms": int(os.getenv("MOCK_LATENCY_JITTER_MS", 0)),  # + до стольких
+}
+stats = {"requests": 0, "errors": 0, "rate_limited": 0, "slow": 0, "fines": 0}
+
 
 # Модели
 class Fine(BaseModel):
@@ -19,6 +63,7 @@ class Fine(BaseModel):
 
 class FinesResponse(BaseModel):
     data: List[Fine]
+    next: Optional[str] = None  # курсор следующей страницы
 
 
 # Определяем fine_types ДО использования
@@ -31,6 +76,9 @@ fine_types = [
 ]
 
 
+_fine_numbers = itertools.count(1)
+
+
 # Генератор штрафов
 def generate_fines(count: int = 3):
     """Генерация тестовых штрафов с уникальными ID"""
@@ -39,10 +87,9 @@ def generate_fines(count: int = 3):
     for i in range(count):
         fine_type, min_amount, max_amount = random.choice(fine_types)
 
-        # Уникальный ID на основе timestamp и случайного числа
+        # Уникальный ID: timestamp и сквозной номер штрафа в процессе
         timestamp = int(datetime.now().timestamp())
-        random_suffix = random.randint(1000, 9999)
-        unique_id = f"FINE_{timestamp}_{random_suffix}"
+        unique_id = f"FINE_{timestamp}_{next(_fine_numbers):06d}"
 
         fine = Fine(
             id=unique_id,
@@ -58,35 +105,366 @@ def generate_fines(count: int = 3):
     return fines
 
 
+class ArrivalStream:
+    """
+    Штрафы, появляющиеся со временем (пуассоновский поток со всплесками)
+
+    Фоновый поток в MOCK_BURST_DURATION секунд каждые MOCK_BURST_EVERY
+    сменяется интенсивностью MOCK_BURST_RATE. Штрафы создаются лениво при
+    запросе, дата штрафа - момент его появления.
+    """
+
+    def __init__(self):
+        self.started = datetime.now().timestamp()
+        self.fines: List[Fine] = []
+        self.next_at = self.started
+        self._schedule_next()
+
+    def _rate(self, moment: float) -> float:
+        phase = (moment - self.started) % MOCK_BURST_EVERY
+        if MOCK_BURST_RATE and phase < MOCK_BURST_DURATION:
+            return MOCK_BURST_RATE
+        return MOCK_ARRIVAL_RATE
+
+    def _schedule_next(self):
+        # Шаг не длиннее секунды, чтобы не проскочить начало всплеска
+        while True:
+            rate = self._rate(self.next_at)
+            step = random.expovariate(rate) if rate else float("inf")
+            if step <= 1:
+                self.next_at += step
+                return
+            self.next_at += 1
+
+    def poll(
+        self, date_from: Optional[datetime], date_to: Optional[datetime] = None
+    ) -> List[Fine]:
+        now = datetime.now().timestamp()
+        while self.next_at <= now:
+            fine_type, min_amount, max_amount = random.choice(fine_types)
+            self.fines.append(
+                Fine(
+                    id=f"FINE_{int(self.next_at)}_{len(self.fines):06d}",
+                    date=datetime.fromtimestamp(self.next_at).isoformat(),
+                    type=fine_type,
+                    amount=round(random.uniform(min_amount, max_amount), 2),
+                    order_id=f"ORDER_{random.randint(100000, 999999)}",
+                    status=random.choice(["Начислен", "Оспорен", "Оплачен"]),
+                )
+            )
+            self._schedule_next()
+
+        if date_from is None and date_to is None:
+            return list(self.fines)
+        return [
+            fine
+            for fine in self.fines
+            if (date_from is None or datetime.fromisoformat(fine.date) >= date_from)
+            and (date_to is None or datetime.fromisoformat(fine.date) < date_to)
+        ]
+
+
+arrivals = ArrivalStream() if MOCK_ARRIVAL_RATE or MOCK_BURST_RATE else None
+
+
+_MASK64 = (1 << 64) - 1
+# Смена статуса штрафа набора
+STATUS_CHANGES = {"Начислен": "Оспорен", "Оспорен": "Отменён", "Оплачен": "Оспорен"}
+DATASET_STATUSES = ("Начислен", "Оспорен", "Оплачен")
+
+
+def _mix(value: int) -> int:
+    """SplitMix64: псевдослучайное 64-битное число, зависящее только от value"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class Dataset:
+    """
+    Детерминированный набор штрафов
+
+    Штраф с номером i датирован start + i * step, последний из size штрафов -
+    end. Тип, сумма, заказ и исходный статус вычисляются из seed, номера и
+    ключа API (у разных ключей - разные штрафы), поэтому набор одинаков при
+    каждом запуске и не хранится в памяти. С grow после end штрафы
+    продолжают появляться каждые step секунд.
+
+    Доля change_rate штрафов из size меняет статус в течение change_within
+    секунд после запуска. Как в API WB, фильтр dateFrom относится к дате
+    последнего изменения: изменившийся штраф снова попадает в ответ.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        seed: int,
+        step: float,
+        end: Optional[datetime] = None,
+        grow: bool = False,
+        change_rate: float = 0,
+        change_within: float = 600,
+    ):
+        self.size = size
+        self.seed = seed
+        self.step = step
+        self.started = time.time()
+        self.end = end.timestamp() if end is not None else float(int(self.started))
+        self.start = self.end - (size - 1) * step
+        self.grow = grow
+
+        # Смены статуса: момент смены по номеру штрафа и номера по моменту
+        rnd = random.Random(seed)
+        changed = rnd.sample(range(size), int(size * change_rate))
+        self.changed_at = {
+            index: self.started + rnd.random() * change_within for index in changed
+        }
+        self._changes = sorted(
+            (moment, index) for index, moment in self.changed_at.items()
+        )
+        self._change_moments = [moment for moment, _ in self._changes]
+
+    def visible(self, now: float) -> int:
+        """Сколько штрафов уже появилось"""
+        if not self.grow or now <= self.end:
+            return self.size
+        return self.size + math.floor((now - self.end) / self.step)
+
+    def select(
+        self, date_from: float, date_to: float, now: float
+    ) -> Tuple[range, List[int]]:
+        """
+        Штрафы, появившиеся или изменившиеся в [date_from, date_to)
+
+        Returns:
+            номера штрафов с датой в периоде и номера более ранних штрафов,
+            изменившихся в периоде
+        """
+        visible = self.visible(now)
+        first = max(0, math.ceil((date_from - self.start) / self.step))
+        last = visible
+        if date_to - self.start < visible * self.step:
+            last = math.ceil((date_to - self.start) / self.step)
+        created = range(first, max(first, last))
+
+        low = bisect.bisect_left(self._change_moments, date_from)
+        high = bisect.bisect_left(self._change_moments, min(date_to, now))
+        updated = [
+            index
+            for _, index in self._changes[low:high]
+            if self.start + index * self.step < date_from
+        ]
+        return created, updated
+
+    def fine_json(self, index: int, now: float, key_tag: int = 0) -> str:
+        """Штраф в виде JSON (шаблон вместо json.dumps: поля известны)"""
+        mixed = _mix((self.seed << 32) ^ (key_tag << 48) ^ index)
+        fine_type, min_amount, max_amount = fine_types[mixed % len(fine_types)]
+        amount = min_amount + (mixed >> 8 & 0xFFFFF) / 0xFFFFF * (
+            max_amount - min_amount
+        )
+        status = DATASET_STATUSES[(mixed >> 28) % 3]
+        changed_at = self.changed_at.get(index)
+        if changed_at is not None and changed_at <= now:
+            status = STATUS_CHANGES[status]
+        fine_date = datetime.fromtimestamp(self.start + index * self.step)
+        prefix = f"DS{key_tag:04d}_" if key_tag else "DS_"
+        return (
+            f'{{"id": "{prefix}{index:09d}", "date": "{fine_date.isoformat()}", '
+            f'"type": "{fine_type}", "amount": {amount:.2f}, '
+            f'"order_id": "ORDER_{100000 + (mixed >> 32) % 900000}", '
+            f'"status": "{status}"}}'
+        )
+
+    def stream(
+        self,
+        indices: Iterable[int],
+        now: float,
+        key_tag: int,
+        next_cursor: Optional[str],
+    ):
+        """Тело ответа кусками по 1000 штрафов"""
+        yield '{"data": ['
+        indices = iter(indices)
+        separator = ""
+        while True:
+            chunk = list(itertools.islice(indices, 1000))
+            if not chunk:
+                break
+            stats["fines"] += len(chunk)
+            yield separator + ",".join(
+                self.fine_json(index, now, key_tag) for index in chunk
+            )
+            separator = ","
+        yield f'], "next": {json.dumps(next_cursor)}}}'
+
+
+def _dataset_end() -> Optional[datetime]:
+    return datetime.fromisoformat(MOCK_DATASET_END) if MOCK_DATASET_END else None
+
+
+dataset = (
+    Dataset(
+        MOCK_DATASET_SIZE,
+        MOCK_SEED,
+        MOCK_DATASET_STEP,
+        _dataset_end(),
+        MOCK_DATASET_GROW,
+        MOCK_STATUS_CHANGE_RATE,
+        MOCK_STATUS_CHANGE_WITHIN,
+    )
+    if MOCK_DATASET_SIZE
+    else None
+)
+
+
+def _key_tag(authorization: Optional[str]) -> int:
+    """Номер набора для ключа API (0 - без ключа)"""
+    if not authorization:
+        return 0
+    return zlib.crc32(authorization.encode()) % 9999 + 1
+
+
+def _page(total: int, limit: Optional[int], cursor: Optional[str]):
+    """Границы страницы и курсор следующей"""
+    start = int(cursor) if cursor and cursor.isdigit() else 0
+    stop = total if not limit else min(total, start + limit)
+    return start, stop, (str(stop) if stop < total else None)
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        return None
+
+
+def _injected_fault():
+    """Ответ-сбой для текущего запроса или None"""
+    if faults["outage"] or random.random() < faults["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"detail": "Service Unavailable"})
+    if random.random() < faults["rate_limit_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too Many Requests"},
+            headers={"Retry-After": str(faults["retry_after"])},
+        )
+    return None
+
+
 @app.get("/")
 def root():
     return {
         "message": "Mock Wildberries API",
-        "endpoints": {"fines": "/api/v3/fines?days=1", "health": "/health"},
+        "endpoints": {
+            "fines": "/api/v3/fines?days=1",
+            "health": "/health",
+            "faults": "/mock/faults",
+        },
     }
 
 
 @app.get("/health")
-def health():
+async def health():
+    # Та же сетевая задержка, что у штрафов: проверка подключения при запуске
+    if faults["latency_ms"]:
+        await asyncio.sleep(faults["latency_ms"] / 1000)
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
 
+@app.get("/mock/faults")
+def get_faults():
+    return {"faults": faults, "stats": stats}
+
+
+@app.post("/mock/faults")
+def set_faults(update: dict):
+    faults.update({key: value for key, value in update.items() if key in faults})
+    return {"faults": faults, "stats": stats}
+
+
+@app.post("/mock/faults/reset")
+def reset_faults():
+    faults.update(
+        error_rate=0,
+        rate_limit_rate=0,
+        slow_rate=0,
+        outage=False,
+        retry_after=1,
+        latency_ms=0,
+        latency_jitter_ms=0,
+    )
+    stats.update(requests=0, errors=0, rate_limited=0, slow=0, fines=0)
+    return {"faults": faults, "stats": stats}
+
+
 @app.get("/api/v3/fines", response_model=FinesResponse)
-def get_fines(days: str = "1"):
+async def get_fines(
+    days: str = "1",
+    dateFrom: Optional[str] = None,
+    dateTo: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    authorization: Optional[str] = Header(None),
+):
     """
     Получение штрафов
 
     Parameters:
-    - days: за сколько дней (по умолчанию "1")
+    - days: за сколько дней (по умолчанию "1"), если нет dateFrom
+    - dateFrom, dateTo: период [dateFrom, dateTo) (учитывается при
+      MOCK_ARRIVAL_RATE и MOCK_DATASET_SIZE)
+    - limit, cursor: постраничная выдача (при MOCK_ARRIVAL_RATE и
+      MOCK_DATASET_SIZE); курсор следующей страницы - в поле "next"
     """
-    try:
-        days_int = int(days)
-    except ValueError:
-        days_int = 1
+    stats["requests"] += 1
+    latency = faults["latency_ms"] + random.random() * faults["latency_jitter_ms"]
+    if latency:
+        await asyncio.sleep(latency / 1000)
+    if random.random() < faults["slow_rate"]:
+        stats["slow"] += 1
+        await asyncio.sleep(faults["slow_ms"] / 1000)
 
-    # Всегда генерируем 1-3 новых штрафа
-    import random
+    fault = _injected_fault()
+    if fault is not None:
+        return fault
+
+    date_from = _parse_date(dateFrom)
+    if date_from is None:
+        try:
+            date_from = datetime.now() - timedelta(days=int(days))
+        except ValueError:
+            date_from = datetime.now() - timedelta(days=1)
+    date_to = _parse_date(dateTo)
+
+    if dataset is not None:
+        now = time.time()
+        created, updated = dataset.select(
+            date_from.timestamp(),
+            date_to.timestamp() if date_to is not None else math.inf,
+            now,
+        )
+        start, stop, next_cursor = _page(len(created) + len(updated), limit, cursor)
+        indices = itertools.chain(
+            created[start:stop],
+            updated[max(0, start - len(created)) : max(0, stop - len(created))],
+        )
+        return StreamingResponse(
+            dataset.stream(indices, now, _key_tag(authorization), next_cursor),
+            media_type="application/json",
+        )
 
+    if arrivals is not None:
+        fines = arrivals.poll(date_from, date_to)
+        start, stop, next_cursor = _page(len(fines), limit, cursor)
+        return FinesResponse(data=fines[start:stop], next=next_cursor)
+
+    # Всегда генерируем 1-3 новых штрафа
     count = random.randint(1, 3)
 
     fines = generate_fines(count)
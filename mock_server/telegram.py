@@ -0,0 +1,177 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from datetime import datetime
+import asyncio
+import os
+import time
+from collections import deque
+from urllib.parse import parse_qsl
+
+app = FastAPI(title="Mock Telegram Bot API")
+
+# Лимиты как у настоящего Telegram (настраиваются для бенчмарков)
+MOCK_TG_LATENCY_MS = int(os.getenv("MOCK_TG_LATENCY_MS", 30))
+MOCK_TG_CHAT_RATE = float(os.getenv("MOCK_TG_CHAT_RATE", 1))  # сообщ/сек на чат
+MOCK_TG_CHAT_BURST = int(os.getenv("MOCK_TG_CHAT_BURST", 3))
+MOCK_TG_GLOBAL_RATE = float(os.getenv("MOCK_TG_GLOBAL_RATE", 30))  # сообщ/сек
+MOCK_TG_RETRY_AFTER = int(os.getenv("MOCK_TG_RETRY_AFTER", 1))
+
+stats = {"requests": 0, "delivered": 0, "rate_limited": 0, "chats": {}}
+_buckets = {}
+_message_id = 0
+# Входящие сообщения для getUpdates и последние отправленные тексты
+_updates = []
+_update_id = 0
+_new_update = asyncio.Event()
+_sent = deque(maxlen=100)
+
+
+def _take_token(key: str, rate: float, capacity: int) -> bool:
+    """Token bucket: True, если запрос укладывается в лимит"""
+    now = time.monotonic()
+    tokens, updated = _buckets.get(key, (float(capacity), now))
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens < 1:
+        _buckets[key] = (tokens, now)
+        return False
+    _buckets[key] = (tokens - 1, now)
+    return True
+
+
+async def _params(request: Request) -> dict:
+    """Параметры метода: Bot API принимает и форму, и JSON"""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        return await request.json()
+    return dict(parse_qsl((await request.body()).decode()))
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+
+@app.post("/stats/reset")
+def reset_stats():
+    stats.update({"requests": 0, "delivered": 0, "rate_limited": 0, "chats": {}})
+    _buckets.clear()
+    return stats
+
+
+@app.post("/bot{token}/getMe")
+async def get_me(token: str):
+    if MOCK_TG_LATENCY_MS:
+        await asyncio.sleep(MOCK_TG_LATENCY_MS / 1000)
+    return {
+        "ok": True,
+        "result": {
+            "id": 1,
+            "is_bot": True,
+            "first_name": "Mock",
+            "username": "mock_wb_fines_bot",
+        },
+    }
+
+
+@app.post("/bot{token}/sendMessage")
+async def send_message(token: str, request: Request):
+    """Отправка сообщения с эмуляцией флуд-контроля (429 + retry_after)"""
+    global _message_id
+
+    params = await _params(request)
+    chat_id = str(params.get("chat_id"))
+    stats["requests"] += 1
+
+    if MOCK_TG_LATENCY_MS:
+        await asyncio.sleep(MOCK_TG_LATENCY_MS / 1000)
+
+    if not _take_token("global", MOCK_TG_GLOBAL_RATE, int(MOCK_TG_GLOBAL_RATE)) or (
+        not _take_token(f"chat:{chat_id}", MOCK_TG_CHAT_RATE, MOCK_TG_CHAT_BURST)
+    ):
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={
+                "ok": False,
+                "error_code": 429,
+                "description": (
+                    f"Too Many Requests: retry after {MOCK_TG_RETRY_AFTER}"
+                ),
+                "parameters": {"retry_after": MOCK_TG_RETRY_AFTER},
+            },
+        )
+
+    _message_id += 1
+    stats["delivered"] += 1
+    _sent.append({"chat_id": chat_id, "text": params.get("text", "")})
+    stats["chats"][chat_id] = stats["chats"].get(chat_id, 0) + 1
+    return {
+        "ok": True,
+        "result": {
+            "message_id": _message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "text": params.get("text", ""),
+        },
+    }
+
+
+@app.post("/bot{token}/getUpdates")
+async def get_updates(token: str, request: Request):
+    """Long polling: ждёт сообщений до timeout секунд"""
+    params = await _params(request)
+    offset = int(params.get("offset") or 0)
+    _updates[:] = [update for update in _updates if update["update_id"] >= offset]
+    if not _updates:
+        _new_update.clear()
+        try:
+            await asyncio.wait_for(
+                _new_update.wait(), timeout=float(params.get("timeout") or 0)
+            )
+        except asyncio.TimeoutError:
+            pass
+    return {"ok": True, "result": list(_updates)}
+
+
+@app.post("/mock/updates")
+async def push_update(request: Request):
+    """Сообщение в чат бота: {"chat_id": ..., "text": "/stats"}"""
+    global _update_id, _message_id
+
+    params = await request.json()
+    _update_id += 1
+    _message_id += 1
+    chat_id = int(params["chat_id"])
+    _updates.append(
+        {
+            "update_id": _update_id,
+            "message": {
+                "message_id": _message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params["text"],
+            },
+        }
+    )
+    _new_update.set()
+    return {"update_id": _update_id}
+
+
+@app.get("/mock/sent")
+def sent_messages():
+    """Последние отправленные ботом сообщения"""
+    return list(_sent)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    print("=" * 50)
+    print("Mock Telegram API запущен: http://localhost:8081")
+    print("Для бота: TELEGRAM_API_URL=http://localhost:8081/bot")
+    print("=" * 50)
+    uvicorn.run(app, host="0.0.0.0", port=8081)
@@ -0,0 +1,167 @@
+import csv
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+import api.main
+from api.main import app, get_db
+from bot.config import config
+from database.repository import FineRepository
+
+
+def fine(fine_id, date, fine_type="Брак товара", status="Начислен", amount=500):
+    return {
+        "id": fine_id,
+        "date": date,
+        "type": fine_type,
+        "amount": amount,
+        "order_id": f"ORDER_{fine_id}",
+        "status": status,
+    }
+
+
+# По три штрафа на одну и ту же дату: страницы режут их посередине
+FINES = [
+    fine(f"F{i:02}", f"2026-01-{10 + i // 3:02}T12:00:00", amount=100 * (i + 1))
+    for i in range(20)
+] + [
+    fine("P1", "2026-01-05T09:00:00", "Просрочка поставки", "Оплачен", 2000),
+    fine("P2", "2026-01-05T10:00:00", "Просрочка поставки", "Оплачен", 3000),
+]
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    factory = sessionmaker(engine)
+    with factory() as db:
+        repo = FineRepository(db)
+        repo.save_fines_batch(FINES)
+        db.commit()
+        repo.save_fines_batch([{**FINES[0], "status": "Оспорен"}])
+        db.commit()
+
+    def session():
+        with Session(engine) as db:
+            yield db
+
+    monkeypatch.setattr(api.main, "_session_factory", factory)
+    monkeypatch.setattr(config, "API_TOKEN", "")
+    app.dependency_overrides[get_db] = session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def pages(client, limit, **params):
+    cursor, result = None, []
+    while True:
+        query = {"limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/fines", params=query)
+        assert response.status_code == 200
+        body = response.json()
+        result.append([row["id"] for row in body["data"]])
+        cursor = body["next"]
+        if cursor is None:
+            return result
+
+
+@pytest.mark.parametrize("limit", [1, 4, 5, 22, 100])
+def test_keyset_pages_have_no_gaps_or_duplicates(client, limit):
+    result = pages(client, limit)
+    ids = [fine_id for page in result for fine_id in page]
+
+    expected = sorted(FINES, key=lambda row: (row["date"], row["id"]), reverse=True)
+    assert ids == [row["id"] for row in expected]
+    assert all(len(page) == limit for page in result[:-1])
+
+
+def test_pages_with_filters(client):
+    # Полная последняя страница: следующая пустая
+    assert pages(client, 2, type="Просрочка поставки") == [["P2", "P1"], []]
+
+    ids = [i for page in pages(client, 3, min_amount=1500) for i in page]
+    assert sorted(ids) == ["F14", "F15", "F16", "F17", "F18", "F19", "P1", "P2"]
+
+    ids = [
+        i
+        for page in pages(
+            client, 3, date_from="2026-01-11T00:00:00", date_to="2026-01-12T00:00:00"
+        )
+        for i in page
+    ]
+    assert ids == ["F05", "F04", "F03"]
+
+
+@pytest.mark.parametrize("cursor", ["!!!", "bm90LWEtY3Vyc29y", "eHx5"])
+def test_bad_cursor(client, cursor):
+    response = client.get("/fines", params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_csv_export(client, monkeypatch):
+    monkeypatch.setattr(config, "DB_BATCH_SIZE", 4)
+    response = client.get("/fines/export.csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "date", "type", "amount", "order_id", "status"]
+    assert len(rows) == len(FINES) + 1
+    assert len({row[0] for row in rows[1:]}) == len(FINES)
+
+    response = client.get("/fines/export.csv", params={"status": "Оплачен"})
+    assert [row[0] for row in csv.reader(io.StringIO(response.text))] == [
+        "id",
+        "P2",
+        "P1",
+    ]
+
+
+def test_fine_history(client):
+    data = client.get("/fines/F00/history").json()["data"]
+    assert len(data) == 1
+    assert (data[0]["old_status"], data[0]["new_status"]) == ("Начислен", "Оспорен")
+
+    assert client.get("/fines/F01/history").json() == {"data": []}
+
+
+def test_stats_daily(client):
+    data = client.get("/stats/daily").json()["data"]
+    assert [row["day"] for row in data][:2] == ["2026-01-16", "2026-01-15"]
+    assert sum(row["fines_count"] for row in data) == len(FINES)
+
+    data = client.get(
+        "/stats/daily",
+        params={"date_from": "2026-01-05", "date_to": "2026-01-10"},
+    ).json()["data"]
+    assert data == [
+        {"day": "2026-01-10", "fines_count": 3, "total_amount": "600.00"},
+        {"day": "2026-01-05", "fines_count": 2, "total_amount": "5000.00"},
+    ]
+
+    data = client.get("/stats/daily", params={"status": "Оспорен"}).json()["data"]
+    assert data == [{"day": "2026-01-10", "fines_count": 1, "total_amount": "100.00"}]
+    assert client.get("/stats/daily", params={"seller": "other"}).json() == {
+        "data": []
+    }
+
+
+def test_stats_breakdown(client):
+    data = client.get("/stats/breakdown").json()["data"]
+    assert [(row["type"], row["fines_count"]) for row in data] == [
+        ("Брак товара", 20),
+        ("Просрочка поставки", 2),
+    ]
+
+    data = client.get(
+        "/stats/breakdown", params={"by": "status", "type": "Брак товара"}
+    ).json()["data"]
+    assert {row["status"]: row["fines_count"] for row in data} == {
+        "Начислен": 19,
+        "Оспорен": 1,
+    }
+
+    assert client.get("/stats/breakdown", params={"by": "order"}).status_code == 422
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from bot import backfill
+from bot.backfill import Backfill, split_windows
+from bot.config import config
+from bot.records import FineRecord
+from bot.sellers import Seller
+from bot.transport import WBServerError
+from database.models import Fine
+from database.repository import BackfillRepository
+
+SELLER = Seller("default", "Кабинет", "key", ("100",), 60)
+START = datetime(2026, 1, 1)
+END = datetime(2026, 1, 4)
+DAY = timedelta(days=1)
+
+
+class FakeClient:
+    """По одному штрафу на окно; failures - сколько раз окно падает"""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    async def iter_fines(self, date_from, date_to, api_key):
+        self.calls.append(date_from)
+        error = self.failures.get(date_from)
+        if error is not None:
+            count, exc = error
+            if count:
+                self.failures[date_from] = (count - 1, exc)
+                raise exc
+        yield FineRecord.from_api(
+            {
+                "id": f"F{date_from:%d}",
+                "date": date_from.isoformat(),
+                "type": "Брак товара",
+                "amount": 500,
+                "status": "Начислен",
+            }
+        )
+
+
+@pytest.fixture
+def sessions(engine, monkeypatch):
+    factory = sessionmaker(engine)
+    monkeypatch.setattr(backfill, "SessionLocal", factory)
+    monkeypatch.setattr(config, "WB_BACKOFF_CAP", 0)
+    return factory
+
+
+def fines_count(sessions):
+    with sessions() as db:
+        return db.scalar(select(func.count()).select_from(Fine))
+
+
+def test_split_windows_newest_first():
+    assert split_windows(START, START + timedelta(hours=60), DAY) == [
+        (START + 2 * DAY, START + timedelta(hours=60)),
+        (START + DAY, START + 2 * DAY),
+        (START, START + DAY),
+    ]
+    assert split_windows(START, START, DAY) == []
+
+
+async def test_finished_windows_are_skipped(sessions):
+    with sessions() as db:
+        BackfillRepository(db).finish(START + DAY, START + 2 * DAY, 0)
+        db.commit()
+    client = FakeClient()
+
+    result = await Backfill(SELLER, client, workers=2).run(START, END, DAY)
+
+    assert (result.windows, result.skipped, result.failed) == (2, 1, 0)
+    assert sorted(client.calls) == [START, START + 2 * DAY]
+    assert fines_count(sessions) == 2
+
+    result = await Backfill(SELLER, client, workers=2).run(START, END, DAY)
+    assert (result.windows, result.skipped) == (0, 3)
+
+
+async def test_unavailable_window_is_requeued(sessions):
+    client = FakeClient({START: (1, WBServerError("502", status=502))})
+
+    result = await Backfill(SELLER, client, workers=1).run(START, END, DAY)
+
+    assert (result.windows, result.failed, result.fines) == (3, 0, 3)
+    assert client.calls.count(START) == 2
+
+
+async def test_window_fails_after_attempts(sessions):
+    client = FakeClient({START: (10, WBServerError("502", status=502))})
+
+    result = await Backfill(SELLER, client, workers=1).run(START, END, DAY)
+
+    assert (result.windows, result.failed) == (2, 1)
+    assert client.calls.count(START) == backfill.WINDOW_ATTEMPTS
+    with sessions() as db:
+        finished = BackfillRepository(db).get_finished(START, END)
+    assert (START, START + DAY) not in finished
+
+
+async def test_unexpected_error_does_not_stop_other_windows(sessions):
+    client = FakeClient({START + DAY: (1, RuntimeError("DB down"))})
+
+    result = await Backfill(SELLER, client, workers=2).run(START, END, DAY)
+
+    assert (result.windows, result.failed) == (2, 1)
+    assert fines_count(sessions) == 2
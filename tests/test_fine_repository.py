@@ -0,0 +1,114 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from bot.records import FineRecord
+from database.history import FineHistoryRepository
+from database.models import DailyStat, Fine
+from database.repository import FineRepository, StatsRepository
+
+
+def fine(fine_id="F1", date="2026-01-10T12:00:00", status="Начислен", amount=500):
+    return {
+        "id": fine_id,
+        "date": date,
+        "type": "Брак товара",
+        "amount": amount,
+        "order_id": "ORDER_1",
+        "status": status,
+    }
+
+
+def stats(db):
+    return sorted(
+        (row.day, row.type, row.status, row.fines_count, Decimal(row.total_amount))
+        for row in db.scalars(select(DailyStat))
+        if row.fines_count
+    )
+
+
+def save(db, fines):
+    repo = FineRepository(db)
+    new_ids = repo.save_fines_batch(fines)
+    db.commit()
+    return repo, new_ids
+
+
+def test_new_and_unchanged_fines(db):
+    _, new_ids = save(db, [fine("F1"), fine("F2")])
+    assert new_ids == ["F1", "F2"]
+
+    repo, new_ids = save(db, [fine("F1"), fine("F2")])
+    assert new_ids == [] and repo.changes == [] and repo.deltas == {}
+
+
+def test_status_change_moves_stat_cell(db):
+    save(db, [fine()])
+    repo, new_ids = save(db, [fine(status="Оплачен")])
+
+    assert new_ids == []
+    assert [change.new_status for change in repo.changes] == ["Оплачен"]
+    assert db.scalar(select(Fine.status)) == "Оплачен"
+    before = stats(db)
+    StatsRepository(db).rebuild()
+    assert stats(db) == before
+
+
+def test_changed_date_moves_fine(db):
+    save(db, [fine()])
+    FineRepository(db).mark_as_notified_batch(["F1"])
+    db.commit()
+
+    repo, new_ids = save(db, [fine(date="2026-01-12T09:00:00", status="Оспорен")])
+
+    assert new_ids == []
+    rows = db.execute(select(Fine.date, Fine.status, Fine.notified)).all()
+    assert rows == [(datetime(2026, 1, 12, 9, 0), "Оспорен", True)]
+    # Старая ячейка агрегата вычтена, новая учтена один раз
+    before = stats(db)
+    assert [(day.day, count) for day, _, _, count, _ in before] == [(12, 1)]
+    StatsRepository(db).rebuild()
+    assert stats(db) == before
+    assert [change.new_status for change in repo.changes] == ["Оспорен"]
+    assert len(FineHistoryRepository(db, "default").get_for_fine("F1")) == 1
+
+
+def test_changed_date_only_is_not_history(db):
+    save(db, [fine()])
+    repo, _ = save(db, [fine(date="2026-01-11T12:00:00")])
+
+    assert db.scalar(select(func.count()).select_from(Fine)) == 1
+    assert repo.changes == []
+    StatsRepository(db).rebuild()
+    assert sum(count for *_, count, _ in stats(db)) == 1
+
+
+def load(db, fines):
+    repo = FineRepository(db)
+    added = repo.load_historical([FineRecord.from_api(data) for data in fines])
+    db.commit()
+    return repo, added
+
+
+def test_load_historical_inserts_notified_once(db):
+    _, added = load(db, [fine("F1"), fine("F2")])
+    assert added == 2
+    assert db.scalars(select(Fine.notified)).all() == [True, True]
+
+    _, added = load(db, [fine("F1"), fine("F2")])
+    assert added == 0
+    assert db.scalar(select(func.count()).select_from(Fine)) == 2
+
+
+def test_load_historical_moves_fine_with_changed_date(db):
+    save(db, [fine()])
+    _, added = load(db, [fine(date="2026-01-12T09:00:00", status="Оплачен")])
+
+    assert added == 0
+    rows = db.execute(select(Fine.date, Fine.status)).all()
+    assert rows == [(datetime(2026, 1, 12, 9, 0), "Оплачен")]
+    before = stats(db)
+    assert sum(count for *_, count, _ in before) == 1
+    StatsRepository(db).rebuild()
+    assert stats(db) == before
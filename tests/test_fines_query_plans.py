@@ -0,0 +1,128 @@
+"""
+Планы запросов к fines после миграций (нужен PostgreSQL)
+
+В отдельной схеме применяется миграция 1, заливаются синтетические
+штрафы (benchmarks/bench_fines_indexes.py), затем остальные миграции. По
+EXPLAIN проверяется, что запросы идут по индексам, а выборка за месяц
+читает одну партицию. Без TEST_DATABASE_URL тесты пропускаются.
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from benchmarks.bench_fines_indexes import (
+    LOAD_FINES,
+    LOAD_NOTIFICATIONS,
+    SCHEMA,
+    _month_bounds,
+    queries,
+)
+from database.migrations import migrate
+
+ROWS = 200_000
+
+EXPECTED_INDEX = {
+    "unnotified": "idx_fines_unnotified",
+    "by_type": "idx_fines_type",
+    "by_order_id": "idx_fines_order_id",
+    "notifications_by_fine_id": "idx_notifications_fine_id",
+}
+
+
+@pytest.fixture(scope="module")
+def conn(postgres_url):
+    engine = create_engine(
+        postgres_url, connect_args={"options": f"-csearch_path={SCHEMA}"}
+    )
+    with engine.begin() as setup:
+        setup.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        setup.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        migrate(engine, target=1)
+        with engine.begin() as setup:
+            setup.execute(text(LOAD_FINES), {"rows": ROWS})
+            setup.execute(text(LOAD_NOTIFICATIONS), {"rows": ROWS})
+        migrate(engine)
+        with engine.connect() as connection:
+            connection.execution_options(isolation_level="AUTOCOMMIT").execute(
+                text("ANALYZE")
+            )
+            yield connection
+    finally:
+        with engine.begin() as cleanup:
+            cleanup.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        engine.dispose()
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _root_index(conn, name: str) -> str:
+    """Индекс партиционированной таблицы, к которому относится индекс партиции"""
+    while True:
+        parent = conn.execute(
+            text(
+                "SELECT p.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE c.relname = :name AND n.nspname = :schema"
+            ),
+            {"name": name, "schema": SCHEMA},
+        ).scalar()
+        if parent is None:
+            return name
+        name = parent
+
+
+def _has_rows(conn, relation: str) -> bool:
+    """Есть ли строки в таблице по статистике (после ANALYZE)"""
+    tuples = conn.execute(
+        text(
+            "SELECT c.reltuples FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :name AND n.nspname = :schema"
+        ),
+        {"name": relation, "schema": SCHEMA},
+    ).scalar()
+    return bool(tuples and tuples > 0)
+
+
+def explain(conn, name: str) -> dict:
+    """Используемые индексы и прочитанные таблицы по EXPLAIN"""
+    sql, params = queries(ROWS)[name]
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    nodes = list(_plan_nodes(plan[0]["Plan"]))
+    return {
+        "indexes": {
+            _root_index(conn, node["Index Name"])
+            for node in nodes
+            if "Index Name" in node
+        },
+        "relations": {
+            node["Relation Name"] for node in nodes if "Relation Name" in node
+        },
+        # Пустые партиции (будущие месяцы) планировщик честно читает целиком
+        "seq_scans": {
+            node["Relation Name"]
+            for node in nodes
+            if node["Node Type"] == "Seq Scan"
+            and _has_rows(conn, node["Relation Name"])
+        },
+    }
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED_INDEX))
+def test_query_uses_index(conn, name):
+    plan = explain(conn, name)
+    assert EXPECTED_INDEX[name] in plan["indexes"]
+    assert not plan["seq_scans"]
+
+
+def test_month_range_reads_one_partition(conn):
+    start = _month_bounds()["start"]
+    plan = explain(conn, "month_range")
+    assert plan["relations"] == {f"fines_y{start.year}m{start.month:02d}"}
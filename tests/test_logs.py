@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+from bot.config import config
+from bot.logs import cycle_id, new_cycle_id, setup_logging, stop_logging
+
+logger = logging.getLogger("tests.logs")
+
+
+@pytest.fixture
+def json_log(tmp_path, monkeypatch):
+    """Лог в JSON-файл; возвращает функцию чтения записей"""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    monkeypatch.setattr(config, "LOG_FORMAT", "json")
+    monkeypatch.setattr(config, "LOG_LEVEL", "INFO")
+    monkeypatch.setattr(config, "LOG_ROTATE_WHEN", "")
+    path = tmp_path / "bot.log"
+
+    def read():
+        stop_logging()
+        return [json.loads(line) for line in path.read_text("utf-8").splitlines()]
+
+    def setup(queued: bool = True):
+        monkeypatch.setattr(config, "LOG_QUEUE", queued)
+        setup_logging(str(path))
+
+    yield setup, read
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+@pytest.mark.parametrize("queued", [True, False])
+def test_json_records(json_log, queued):
+    setup, read = json_log
+    setup(queued)
+    values = ["первое"]
+    logger.info("Штраф %s на %s руб", values, 500)
+    # Аргументы подставлены в момент вызова, а не при записи в потоке
+    values.append("второе")
+    logger.debug("не пишется")
+    try:
+        raise RuntimeError("сбой")
+    except RuntimeError:
+        logger.error("Ошибка", exc_info=True)
+
+    info, error = read()
+    assert info["message"] == "Штраф ['первое'] на 500 руб"
+    assert info["level"] == "INFO" and info["logger"] == "tests.logs"
+    assert "cycle_id" not in info and "exc" not in info
+    assert error["level"] == "ERROR"
+    assert "RuntimeError: сбой" in error["exc"]
+
+
+def test_cycle_id_reaches_threads_and_tasks(json_log):
+    setup, read = json_log
+    setup()
+
+    async def in_task():
+        logger.info("в задаче")
+
+    async def cycle():
+        token = new_cycle_id("shop1")
+        try:
+            logger.info("в цикле")
+            await asyncio.to_thread(logger.info, "в потоке БД")
+            await asyncio.create_task(in_task())
+            return cycle_id.get()
+        finally:
+            cycle_id.reset(token)
+
+    current = asyncio.run(cycle())
+    logger.info("вне цикла")
+
+    records = read()
+    assert current.startswith("shop1-")
+    assert [record.get("cycle_id") for record in records] == [
+        current,
+        current,
+        current,
+        None,
+    ]
+    assert cycle_id.get() is None
@@ -0,0 +1,103 @@
+import asyncio
+
+from bot.config import config
+from bot.notifications import MAX_MESSAGE_LENGTH, TelegramNotifier
+from bot.records import FineRecord
+
+
+def notifier(monkeypatch, delay: float) -> TelegramNotifier:
+    """Нотификатор с одним воркером и доставкой за delay сек"""
+    monkeypatch.setattr(config, "TELEGRAM_WORKERS", 1)
+    notifier = TelegramNotifier()
+
+    async def deliver(message):
+        await asyncio.sleep(delay)
+        return True
+
+    monkeypatch.setattr(notifier, "_deliver", deliver)
+    return notifier
+
+
+async def test_stop_waits_for_queue(monkeypatch):
+    telegram = notifier(monkeypatch, 0)
+    futures = [await telegram.submit(f"сообщение {i}") for i in range(3)]
+    await telegram.stop(timeout=1)
+    assert [future.result() for future in futures] == [True, True, True]
+
+
+async def test_stop_timeout_resolves_queued_futures(monkeypatch):
+    telegram = notifier(monkeypatch, 0.05)
+    futures = [await telegram.submit(f"сообщение {i}") for i in range(5)]
+    await telegram.stop(timeout=0.07)
+    assert all(future.done() for future in futures)
+    results = [future.result() for future in futures]
+    assert results[0] is True
+    assert results[-1] is False
+
+
+async def test_worker_cancelled_mid_delivery_resolves_future(monkeypatch):
+    telegram = notifier(monkeypatch, 10)
+    future = await telegram.submit("сообщение")
+    await asyncio.sleep(0.01)
+    telegram._workers[0].cancel()
+    assert await asyncio.wait_for(future, 1) is False
+    await telegram.stop(timeout=0)
+
+
+def digest_fines(count: int) -> list:
+    """Штрафы с длинными типами: дайджест намного длиннее одного сообщения"""
+    return [
+        FineRecord.from_api(
+            {
+                "id": f"F{i:04}",
+                "date": "2026-01-10T12:00:00",
+                "type": f"Нарушение правил {i} " + "x" * 150,
+                "amount": 10000 if i % 25 == 0 else 100 + i,
+                "order_id": f"ORDER_{i}",
+                "status": "Начислен",
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def test_digest_is_split_at_message_limit():
+    fines = digest_fines(200)
+    messages = TelegramNotifier()._format_digest(fines, total_fines=12345)
+
+    assert len(messages) > 1
+    assert all(len(text) <= MAX_MESSAGE_LENGTH for text, _ in messages)
+    ids = [fine_id for _, message_ids in messages for fine_id in message_ids]
+    assert sorted(ids) == sorted(fine.id for fine in fines)
+    for text, message_ids in messages:
+        assert all(f"ID {fine_id}" in text for fine_id in message_ids)
+    assert messages[-1][0].endswith("Всего в базе: 12345")
+    assert "Всего в базе" not in messages[0][0]
+
+
+async def test_high_fines_are_sent_separately(monkeypatch):
+    monkeypatch.setattr(config, "HIGH_FINE_THRESHOLD", 5000)
+    sent = []
+    telegram = notifier(monkeypatch, 0)
+
+    async def deliver(message):
+        sent.append(message.text)
+        return True
+
+    monkeypatch.setattr(telegram, "_deliver", deliver)
+    fines = digest_fines(200)
+    high = {fine.id for fine in fines if fine.amount >= 5000}
+
+    results = await telegram.submit_digest(fines, total_fines=200, chat_id="100")
+    await telegram.stop(timeout=1)
+
+    assert all([await future for _, future in results])
+    assert len(sent) == len(results)
+    assert all(len(text) <= MAX_MESSAGE_LENGTH for text in sent)
+    ids = [fine_id for message_ids, _ in results for fine_id in message_ids]
+    assert sorted(ids) == sorted(fine.id for fine in fines)
+
+    single = [message_ids for message_ids, _ in results if set(message_ids) & high]
+    assert sorted(single) == sorted([fine_id] for fine_id in high)
+    assert all(text.startswith("Крупный штраф") for text in sent[: len(high)])
+    assert all(text.startswith("Новые штрафы") for text in sent[len(high) :])
@@ -0,0 +1,117 @@
+import asyncio
+
+from sqlalchemy import update
+from sqlalchemy.orm import sessionmaker
+
+from bot.config import config
+from bot.notifications import TelegramNotifier
+from bot.outbox import OutboxWorker
+from database.models import Notification
+from database.repository import FineRepository, NotificationRepository
+
+
+class FakeNotifier:
+    """Отправка без Telegram: все сообщения доставлены"""
+
+    def __init__(self):
+        self.alerts = []
+        self.statuses = []
+        self.status_changes = []
+
+    def _delivered(self) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(True)
+        return future
+
+    async def submit_fine_alert(self, fine, chat_id=None):
+        self.alerts.append((fine.id, chat_id))
+        return self._delivered()
+
+    async def submit_status_change(self, fine, change, chat_id=None):
+        self.status_changes.append(
+            TelegramNotifier()._format_status_change(fine, change)
+        )
+        return self._delivered()
+
+    async def submit_status_message(self, new_fines, total_fines, chat_id=None):
+        self.statuses.append((new_fines, total_fines, chat_id))
+        return self._delivered()
+
+
+def fine(fine_id, status="Начислен", amount=500):
+    return {
+        "id": fine_id,
+        "date": "2026-01-10T12:00:00",
+        "type": "Брак товара",
+        "amount": amount,
+        "status": status,
+    }
+
+
+def enqueue(engine, fine_ids, chat_ids):
+    with sessionmaker(engine)() as db:
+        FineRepository(db).save_fines_batch([fine(fine_id) for fine_id in fine_ids])
+        for chat_id in chat_ids:
+            NotificationRepository(db).enqueue(fine_ids, chat_id)
+        db.commit()
+
+
+async def test_one_status_message_per_drain(engine, monkeypatch):
+    monkeypatch.setattr(config, "NOTIFY_MODE", "single")
+    monkeypatch.setattr(config, "OUTBOX_BATCH_SIZE", 2)
+    enqueue(engine, [f"F{i}" for i in range(5)], ["100", "200"])
+    notifier = FakeNotifier()
+    worker = OutboxWorker(notifier, session_factory=sessionmaker(engine))
+
+    processed = []
+    while True:
+        processed.append(await worker.drain_once())
+        if processed[-1] < config.OUTBOX_BATCH_SIZE:
+            break
+    assert sum(processed) == 10 and len(processed) > 2
+    assert notifier.statuses == []
+
+    await worker.flush_status()
+    assert len(notifier.alerts) == 10
+    assert sorted(notifier.statuses) == [(5, 5, "100"), (5, 5, "200")]
+
+    await worker.flush_status()
+    assert len(notifier.statuses) == 2
+
+
+def change(engine, **fields):
+    """Изменение штрафа F1 с уведомлением о смене статуса, как в цикле опроса"""
+    with sessionmaker(engine)() as db:
+        repo = FineRepository(db)
+        repo.save_fines_batch([fine("F1", **fields)])
+        status_ids = [c.fine_id for c in repo.changes if c.status_changed]
+        NotificationRepository(db).enqueue(
+            status_ids, "100", kind="status", history_ids=repo.history_ids
+        )
+        db.commit()
+
+
+async def test_status_alert_uses_its_own_history_row(engine):
+    enqueue(engine, ["F1"], [])
+    change(engine, status="Оспорен")
+    # Изменение только суммы до доставки не должно подменить текст
+    change(engine, status="Оспорен", amount=700)
+    notifier = FakeNotifier()
+    worker = OutboxWorker(notifier, session_factory=sessionmaker(engine))
+
+    assert await worker.drain_once() == 1
+    [text] = notifier.status_changes
+    assert "Статус: Начислен -> Оспорен" in text
+
+
+async def test_status_alert_without_history_id_skips_amount_changes(engine):
+    enqueue(engine, ["F1"], [])
+    change(engine, status="Оспорен")
+    change(engine, status="Оспорен", amount=700)
+    with sessionmaker(engine)() as db:
+        db.execute(update(Notification).values(history_id=None))
+        db.commit()
+    notifier = FakeNotifier()
+
+    await OutboxWorker(notifier, session_factory=sessionmaker(engine)).drain_once()
+    assert "Статус: Начислен -> Оспорен" in notifier.status_changes[0]
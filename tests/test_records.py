@@ -0,0 +1,116 @@
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from bot.records import FineRecord, InvalidFineError
+
+
+def fine(**fields):
+    data = {
+        "id": "F1",
+        "date": "2026-01-10T12:00:00",
+        "type": "Брак товара",
+        "amount": 500,
+        "order_id": "ORDER_1",
+        "status": "Начислен",
+    }
+    data.update(fields)
+    return {key: value for key, value in data.items() if value is not ...}
+
+
+def test_from_api():
+    record = FineRecord.from_api(fine())
+    assert record == FineRecord(
+        "F1",
+        datetime(2026, 1, 10, 12, 0),
+        "Брак товара",
+        Decimal("500.00"),
+        "ORDER_1",
+        "Начислен",
+    )
+    assert record.as_row("shop1")["seller_id"] == "shop1"
+    assert not hasattr(record, "__dict__")
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("2026-01-10T12:00:00Z", datetime(2026, 1, 10, 12, 0)),
+        ("2026-01-10T12:00:00+03:00", datetime(2026, 1, 10, 12, 0)),
+        ("2026-01-10", datetime(2026, 1, 10)),
+    ],
+)
+def test_date_zone_is_dropped(raw, expected):
+    assert FineRecord.from_api(fine(date=raw)).date == expected
+
+
+@pytest.mark.parametrize("raw", [..., None, "", "вчера", "2026-13-01", 1736500000])
+def test_bad_date(raw):
+    with pytest.raises(InvalidFineError, match="date"):
+        FineRecord.from_api(fine(date=raw))
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        (500, "500.00"),
+        ("1234.5", "1234.50"),
+        (0.1 + 0.2, "0.30"),
+        ("10.005", "10.00"),
+        ("10.015", "10.02"),
+        (-150, "-150.00"),
+    ],
+)
+def test_amount_is_quantized(raw, expected):
+    amount = FineRecord.from_api(fine(amount=raw)).amount
+    assert amount == Decimal(expected)
+    assert amount.as_tuple().exponent == -2
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        ...,
+        None,
+        "",
+        "пятьсот",
+        True,
+        False,
+        float("nan"),
+        "NaN",
+        float("inf"),
+        "-Infinity",
+        "100000000",
+        "1e100",
+    ],
+)
+def test_bad_amount(raw):
+    with pytest.raises(InvalidFineError, match="amount"):
+        FineRecord.from_api(fine(amount=raw))
+
+
+@pytest.mark.parametrize("key, max_length", [("id", 50), ("type", 200), ("status", 50)])
+def test_text_fields(key, max_length):
+    assert getattr(FineRecord.from_api(fine(**{key: "x" * max_length})), key)
+    for raw in (..., None, "", 123, "x" * (max_length + 1)):
+        with pytest.raises(InvalidFineError, match=key):
+            FineRecord.from_api(fine(**{key: raw}))
+
+
+def test_order_id_is_optional_and_truncated():
+    assert FineRecord.from_api(fine(order_id=...)).order_id == ""
+    assert FineRecord.from_api(fine(order_id=12345)).order_id == "12345"
+    assert len(FineRecord.from_api(fine(order_id="9" * 80)).order_id) == 50
+
+
+def test_not_a_dict():
+    with pytest.raises(InvalidFineError):
+        FineRecord.from_api(["F1", "2026-01-10"])
+
+
+def test_type_and_status_are_interned():
+    first = FineRecord.from_api(fine(type="".join(["Брак ", "товара"])))
+    second = FineRecord.from_api(fine(type="".join(["Брак", " товара"])))
+    assert first.type is second.type
+    assert first.status is second.status
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from bot.config import config
+from bot.scheduler import AdaptiveInterval, CycleResult, PollingScheduler
+from bot.sellers import Seller
+
+
+def seller(check_interval: int) -> Seller:
+    return Seller("shop1", "Магазин", "KEY", ("100",), check_interval)
+
+
+def test_interval_within_bounds():
+    interval = AdaptiveInterval(60, min_interval=10, max_interval=120)
+    for _ in range(50):
+        interval.next_delay(CycleResult(fetched=1, new=1))
+    assert interval.current == 10
+    for _ in range(50):
+        interval.next_delay(CycleResult(fetched=1))
+    assert interval.current == 120
+
+
+def test_configured_interval_above_max_is_kept(monkeypatch):
+    monkeypatch.setattr(config, "POLL_MAX_INTERVAL", 120)
+    interval = AdaptiveInterval(300)
+    assert interval.current == 300
+    for _ in range(50):
+        interval.next_delay(CycleResult(fetched=1))
+    assert interval.current == 300
+    # Ошибки тоже не сокращают паузу ниже заданного интервала
+    assert interval.next_delay(CycleResult(error="unavailable")) >= 300
+
+
+def test_retry_after_is_respected():
+    interval = AdaptiveInterval(60, min_interval=10, max_interval=120)
+    delay = interval.next_delay(CycleResult(error="throttled", retry_after=600))
+    assert delay == 600
+
+
+async def test_changed_seller_waits_for_running_cycle():
+    running, overlaps, finished = set(), [], []
+
+    async def poll(seller):
+        if seller.id in running:
+            overlaps.append(seller.id)
+        running.add(seller.id)
+        try:
+            # Цикл в потоке БД: отмена задачи его не прерывает
+            await asyncio.to_thread(time.sleep, 0.1)
+        finally:
+            running.discard(seller.id)
+        finished.append(seller.check_interval)
+        return CycleResult()
+
+    scheduler = PollingScheduler(poll, None, concurrency=4)
+    scheduler._sync([seller(60)])
+    await asyncio.sleep(0.02)
+    # Настройки кабинета изменились посреди цикла
+    scheduler._sync([seller(30)])
+    await asyncio.sleep(0.25)
+    await scheduler.stop()
+
+    assert overlaps == []
+    assert finished == [60, 30]
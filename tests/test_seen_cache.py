@@ -0,0 +1,91 @@
+from dataclasses import replace
+from datetime import datetime
+from decimal import Decimal
+
+from bot.records import FineRecord
+from bot.seen_cache import SeenFineCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def fine(fine_id: str, status: str = "Начислен") -> FineRecord:
+    return FineRecord(
+        fine_id,
+        datetime(2026, 1, 10, 12, 0),
+        "Брак товара",
+        Decimal("500.00"),
+        "ORDER_1",
+        status,
+    )
+
+
+def cache(max_size=10, ttl=60.0, clock=None) -> SeenFineCache:
+    return SeenFineCache("test", max_size, ttl, clock or Clock())
+
+
+def ids(fines):
+    return [fine.id for fine in fines]
+
+
+def test_remembered_fines_are_skipped():
+    seen = cache()
+    fines = [fine("F1"), fine("F2")]
+    assert ids(seen.unseen(fines)) == ["F1", "F2"]
+    seen.remember(fines)
+    assert seen.unseen(fines + [fine("F3")]) == [fine("F3")]
+    assert (seen.hits, seen.misses) == (2, 3)
+
+
+def test_changed_fields_invalidate_entry():
+    seen = cache()
+    seen.remember([fine("F1")])
+    changed = [
+        fine("F1", status="Оплачен"),
+        replace(fine("F1"), amount=Decimal("600.00")),
+        replace(fine("F1"), type="Просрочка поставки"),
+        replace(fine("F1"), date=datetime(2026, 1, 11)),
+    ]
+    for record in changed:
+        assert seen.unseen([record]) == [record]
+    # order_id в отпечаток не входит: в БД он не обновляется
+    assert seen.unseen([replace(fine("F1"), order_id="ORDER_2")]) == []
+
+
+def test_loaded_rows_match_api_records():
+    seen = cache()
+    record = fine("F1")
+    seen.load([(record.id, record.date, record.type, 500, record.status)])
+    assert seen.unseen([record]) == []
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    seen = cache(ttl=60, clock=clock)
+    seen.remember([fine("F1")])
+    clock.now = 59
+    assert seen.unseen([fine("F1")]) == []
+    clock.now = 60
+    assert ids(seen.unseen([fine("F1")])) == ["F1"]
+
+
+def test_least_recently_used_is_evicted():
+    seen = cache(max_size=2)
+    seen.remember([fine("F1"), fine("F2")])
+    # Попадание освежает F1, вытесняется F2
+    assert seen.unseen([fine("F1")]) == []
+    seen.remember([fine("F3")])
+    assert len(seen) == 2
+    assert ids(seen.unseen([fine("F1"), fine("F2"), fine("F3")])) == ["F2"]
+
+
+def test_zero_size_disables_cache():
+    seen = cache(max_size=0)
+    seen.remember([fine("F1")])
+    assert len(seen) == 0
+    assert ids(seen.unseen([fine("F1")])) == ["F1"]
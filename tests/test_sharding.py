@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import sessionmaker
+
+import database.models
+from bot.config import config
+from bot.scheduler import CycleResult
+from bot.sellers import Seller
+from bot.sharding import ShardCoordinator, rendezvous_owner
+from database.models import Notification, PollLease
+from database.repository import FineRepository, NotificationRepository
+
+SELLERS = [Seller(f"shop{i}", f"Кабинет {i}", "key", ("100",), 60) for i in range(20)]
+
+
+@pytest.fixture
+def sessions(engine, monkeypatch):
+    factory = sessionmaker(engine)
+    monkeypatch.setattr(database.models, "SessionLocal", factory)
+    monkeypatch.setattr(config, "DB_ASYNC", False)
+    return factory
+
+
+def expire_leases(sessions, owner):
+    """Копия owner упала: её аренды истекли"""
+    with sessions() as db:
+        db.execute(
+            update(PollLease)
+            .where(PollLease.owner == owner)
+            .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+        )
+        db.commit()
+
+
+def test_rendezvous_owner_moves_only_keys_of_removed_replica():
+    keys = [f"shop{i}" for i in range(200)]
+    replicas = ["bot-1", "bot-2", "bot-3"]
+    before = {key: rendezvous_owner(key, replicas) for key in keys}
+    assert set(before.values()) == set(replicas)
+    assert before == {key: rendezvous_owner(key, replicas[::-1]) for key in keys}
+
+    after = {key: rendezvous_owner(key, ["bot-1", "bot-3"]) for key in keys}
+    moved = {key for key in keys if before[key] != after[key]}
+    assert moved == {key for key in keys if before[key] == "bot-2"}
+    assert rendezvous_owner("shop1", []) is None
+
+
+async def test_assign_splits_sellers_between_replicas(sessions):
+    first = ShardCoordinator("bot-1", ttl=30)
+    second = ShardCoordinator("bot-2", ttl=30)
+
+    assert await first.assign(SELLERS) == SELLERS
+    assert first.is_leader
+
+    owned_second = await second.assign(SELLERS)
+    owned_first = await first.assign(SELLERS)
+    assert first.replicas == second.replicas == ["bot-1", "bot-2"]
+    assert first.is_leader and not second.is_leader
+    assert owned_first and owned_second
+    assert sorted(owned_first + owned_second, key=SELLERS.index) == SELLERS
+    assert not set(owned_first) & set(owned_second)
+
+    await first.leave()
+    assert await second.assign(SELLERS) == SELLERS
+    assert second.is_leader
+
+
+async def test_seller_moves_only_after_lease_expires(sessions):
+    first = ShardCoordinator("bot-1", ttl=30)
+    second = ShardCoordinator("bot-2", ttl=30)
+    seller = next(
+        seller
+        for seller in SELLERS
+        if rendezvous_owner(seller.id, ["bot-1", "bot-2"]) == "bot-2"
+    )
+    polled = []
+
+    async def poll(seller):
+        polled.append(seller.id)
+        return CycleResult(fetched=1)
+
+    await first.assign(SELLERS)
+    assert (await first.guard(poll)(seller)).fetched == 1
+
+    # bot-2 уже считает кабинет своим, но bot-1 ещё держит аренду
+    assert seller in await second.assign(SELLERS)
+    assert await second.guard(poll)(seller) == CycleResult()
+    assert polled == [seller.id]
+
+    expire_leases(sessions, "bot-1")
+    assert (await second.guard(poll)(seller)).fetched == 1
+    assert polled == [seller.id, seller.id]
+    # Аренда перешла: прежняя копия кабинет больше не опрашивает
+    assert await first.guard(poll)(seller) == CycleResult()
+
+
+async def test_one_fine_one_outbox_row_across_replicas(sessions):
+    first = ShardCoordinator("bot-1", ttl=30)
+    second = ShardCoordinator("bot-2", ttl=30)
+    seller = next(
+        seller
+        for seller in SELLERS
+        if rendezvous_owner(seller.id, ["bot-1", "bot-2"]) == "bot-2"
+    )
+
+    def save(db, seller_id):
+        repo = FineRepository(db, seller_id)
+        new_ids = repo.save_fines_batch(
+            [
+                {
+                    "id": "F1",
+                    "date": "2026-01-10T12:00:00",
+                    "type": "Брак товара",
+                    "amount": 500,
+                    "status": "Начислен",
+                }
+            ]
+        )
+        NotificationRepository(db).enqueue(new_ids, "100", seller_id=seller_id)
+        return new_ids
+
+    async def poll(seller):
+        new_ids = await database.models.run_db(save, seller.id)
+        return CycleResult(fetched=1, new=len(new_ids))
+
+    # bot-1 опрашивает кабинет, пока не увидел bot-2; bot-2 уже считает
+    # кабинет своим, но ждёт аренду, а потом видит штраф уже сохранённым
+    await first.assign(SELLERS)
+    results = [await first.guard(poll)(seller)]
+    assert seller in await second.assign(SELLERS)
+    results.append(await second.guard(poll)(seller))
+    expire_leases(sessions, "bot-1")
+    results.append(await second.guard(poll)(seller))
+
+    assert [result.new for result in results] == [1, 0, 0]
+    with sessions() as db:
+        assert db.scalar(select(func.count()).select_from(Notification)) == 1
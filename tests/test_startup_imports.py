@@ -0,0 +1,41 @@
+"""
+Профиль импорта bot.main (python -X importtime, как в bench_startup)
+
+Импорт не должен загружать отложенные модули и укладываться в бюджет
+TEST_MAX_IMPORT_MS (медиана нескольких запусков; на медленных машинах
+CI бюджет можно поднять переменной окружения).
+"""
+
+import os
+import statistics
+
+import pytest
+
+from benchmarks.bench_startup import DEFERRED_MODULES, import_profile
+
+MAX_IMPORT_MS = float(os.getenv("TEST_MAX_IMPORT_MS", 800))
+RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def profiles():
+    return [import_profile("bot.main") for _ in range(RUNS)]
+
+
+@pytest.fixture(scope="module")
+def loaded(profiles):
+    return {name.split(".")[0] for profile in profiles for name in profile}
+
+
+def test_bot_main_is_imported(loaded):
+    assert "bot" in loaded
+
+
+@pytest.mark.parametrize("module", DEFERRED_MODULES)
+def test_deferred_module_not_loaded(loaded, module):
+    assert module not in loaded
+
+
+def test_import_time_within_budget(profiles):
+    import_ms = statistics.median(profile["bot.main"][1] / 1000 for profile in profiles)
+    assert import_ms <= MAX_IMPORT_MS
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from bot.streaming import FinesStreamParser, achunks
+
+FINES = [
+    {"id": "F1", "type": "Брак товара", "amount": 500, "note": 'кавычка " и ]'},
+    {"id": "F2", "type": "Просрочка поставки", "amount": 1500.5, "tags": [1, {}]},
+    {"id": "F3", "type": "Нарушение сроков", "amount": 300, "data": [{"x": 1}]},
+]
+# "data" встречается до массива штрафов в строке и во вложенном объекте
+BODY = json.dumps(
+    {
+        "meta": {"data": [0], "comment": '"data": ['},
+        "data": FINES,
+        "next": "cursor-2",
+    },
+    ensure_ascii=False,
+    indent=1,
+).encode()
+
+
+def parse(chunks):
+    parser = FinesStreamParser()
+    items = []
+    for chunk in chunks:
+        items += parser.feed(chunk)
+    return items, parser.close()
+
+
+def split(body: bytes, size: int):
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+def test_whole_body():
+    items, page = parse([BODY])
+    assert items == FINES
+    assert page == {
+        "meta": {"data": [0], "comment": '"data": ['},
+        "data": None,
+        "next": "cursor-2",
+    }
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_chunk_sizes(size):
+    items, page = parse(split(BODY, size))
+    assert items == FINES and page["next"] == "cursor-2"
+
+
+def test_every_split_point():
+    # Включая разрезы посреди многобайтовых символов UTF-8
+    for position in range(1, len(BODY)):
+        items, page = parse([BODY[:position], BODY[position:]])
+        assert items == FINES, position
+        assert page["next"] == "cursor-2", position
+
+
+def test_items_are_returned_as_soon_as_complete():
+    parser = FinesStreamParser()
+    first_end = BODY.index(b"}", BODY.index(b'"F1"')) + 1
+    assert parser.feed(BODY[: first_end - 1]) == []
+    assert parser.feed(BODY[first_end - 1 : first_end]) == [FINES[0]]
+
+
+def test_data_null_and_missing():
+    assert parse([b'{"data": null, "next": ""}']) == ([], {"data": None, "next": ""})
+    assert parse([b'{"error": "x"}']) == ([], {"error": "x"})
+
+
+def test_empty_array():
+    assert parse(split(b'{"data": [ ], "next": null}', 1)) == (
+        [],
+        {"data": None, "next": None},
+    )
+
+
+def test_truncated_inside_array():
+    parser = FinesStreamParser()
+    parser.feed(BODY[: BODY.index(b'"F2"')])
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_truncated_after_array():
+    parser = FinesStreamParser()
+    parser.feed(BODY[:-3])
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+async def test_achunks():
+    async def numbers():
+        for number in range(7):
+            yield number
+
+    chunks = [chunk async for chunk in achunks(numbers(), 3)]
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6]]
@@ -0,0 +1,185 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import bot.commands
+import database.models
+from bot.commands import HELP_TEXT, TelegramCommands
+from bot.config import config
+from bot.summary import SummaryCache
+from database.repository import FineRepository, StatsRepository
+
+TODAY = datetime.now(timezone.utc).date()
+
+
+def fine(fine_id, fine_type="Брак товара", status="Начислен", amount=500, days=0):
+    return {
+        "id": fine_id,
+        "date": (datetime.now(timezone.utc) - timedelta(days=days)).isoformat(),
+        "type": fine_type,
+        "amount": amount,
+        "status": status,
+    }
+
+
+def test_load_and_queries():
+    summary = SummaryCache()
+    summary.load(
+        [
+            ("a", TODAY, "Брак товара", "Начислен", 2, Decimal("1000")),
+            ("a", TODAY - timedelta(days=40), "Брак товара", "Оплачен", 1, 300),
+            ("b", TODAY, "Просрочка поставки", "Начислен", 1, Decimal("50")),
+        ]
+    )
+    assert summary.by_status(["a"]) == {
+        "Начислен": (2, Decimal("1000")),
+        "Оплачен": (1, Decimal("300")),
+    }
+    assert summary.by_status(["a", "b"])["Начислен"] == (3, Decimal("1050"))
+    assert summary.by_type(["a", "b"], TODAY, TODAY) == {
+        "Брак товара": (2, Decimal("1000")),
+        "Просрочка поставки": (1, Decimal("50")),
+    }
+    assert summary.by_type(["unknown"], TODAY, TODAY) == {}
+
+
+def test_apply_moves_and_drops_empty_cells():
+    summary = SummaryCache()
+    summary.apply("a", {(TODAY, "Брак товара", "Начислен"): (1, Decimal("500"))})
+    summary.apply(
+        "a",
+        {
+            (TODAY, "Брак товара", "Начислен"): (-1, Decimal("-500")),
+            (TODAY, "Брак товара", "Оплачен"): (1, Decimal("500")),
+        },
+    )
+    assert summary.by_status(["a"]) == {"Оплачен": (1, Decimal("500"))}
+
+
+def test_applied_deltas_match_daily_stats(db):
+    summary = SummaryCache()
+    batches = [
+        [fine("F1"), fine("F2", "Просрочка поставки", amount=1500), fine("F3")],
+        # Смена статуса, новый штраф и перенос даты
+        [fine("F1", status="Оплачен"), fine("F4", days=3), fine("F3", days=1)],
+    ]
+    for batch in batches:
+        repo = FineRepository(db)
+        repo.save_fines_batch(batch)
+        db.commit()
+        summary.apply("default", repo.deltas)
+
+    loaded = SummaryCache()
+    loaded.load(StatsRepository(db, None).get_rows())
+    for cache in (summary, loaded):
+        assert cache.by_status(["default"]) == {
+            "Начислен": (3, Decimal("2500")),
+            "Оплачен": (1, Decimal("500")),
+        }
+    week = (TODAY - timedelta(days=6), TODAY)
+    assert summary.by_type(["default"], *week) == loaded.by_type(["default"], *week)
+
+
+@pytest.fixture
+def commands(engine, monkeypatch):
+    """Команды над SQLite с кабинетом из .env в чате 100"""
+    monkeypatch.setattr(database.models, "SessionLocal", sessionmaker(engine))
+    monkeypatch.setattr(config, "DB_ASYNC", False)
+    monkeypatch.setattr(config, "TELEGRAM_CHAT_ID", "100")
+    with sessionmaker(engine)() as db:
+        FineRepository(db).save_fines_batch(
+            [
+                fine("F1", amount=1000),
+                fine("F2", "Просрочка поставки", "Оплачен", 200),
+                fine("F3", "Нарушение сроков", amount=300, days=10),
+            ]
+        )
+        db.commit()
+    return TelegramCommands(None, SummaryCache())
+
+
+async def test_refresh_and_replies(commands):
+    await commands.refresh()
+    assert commands.chat_sellers == {"100": ("default",)}
+
+    stats = commands.answer("100", "/stats")
+    assert stats.startswith("Штрафы WB: всего 3 на 1500")
+    assert "Начислен: 2 на 1300" in stats and "Оплачен: 1 на 200" in stats
+    assert commands.answer("100", "/stats@wb_fines_bot") == stats
+
+    today = commands.answer("100", "/today")
+    assert f"за {TODAY}: 2 на 1200" in today
+    assert "Нарушение сроков" not in today
+
+    top = commands.answer("100", "/top").splitlines()
+    assert top[2].startswith("1. Брак товара: 1 на 1000")
+    assert top[-1].startswith("3. Просрочка поставки")
+
+    unpaid = commands.answer("100", "/unpaid")
+    assert unpaid.startswith("Не оплачено: 2 на 1300") and "Оплачен:" not in unpaid
+
+    assert commands.answer("100", "/help") == HELP_TEXT
+
+
+async def test_ignored_messages(commands):
+    await commands.refresh()
+    assert commands.answer("200", "/stats") is None
+    assert commands.answer("100", "привет") is None
+    assert commands.answer("100", "/unknown") is None
+
+
+class FakeBot:
+    def __init__(self):
+        self.polls = 0
+
+    async def get_updates(self, **kwargs):
+        self.polls += 1
+        await asyncio.sleep(0.01)
+        return []
+
+
+async def test_commands_wait_until_active(commands, monkeypatch):
+    monkeypatch.setattr(config, "REPLICA_HEARTBEAT", 0.01)
+    bot = FakeBot()
+    leader = False
+    commands.notifier = SimpleNamespace(bot=bot)
+    commands.active = lambda: leader
+    task = asyncio.create_task(commands.run())
+    try:
+        await asyncio.sleep(0.05)
+        assert bot.polls == 0
+
+        leader = True
+        await asyncio.sleep(0.05)
+        assert bot.polls > 0
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def test_today_is_utc_day(monkeypatch):
+    class Clock(datetime):
+        """23:45 UTC 10 января; на сервере в UTC+3 уже 11 января"""
+
+        @classmethod
+        def now(cls, tz=None):
+            utc = datetime(2026, 1, 10, 23, 45, tzinfo=timezone.utc)
+            return utc.astimezone(tz) if tz else datetime(2026, 1, 11, 2, 45)
+
+    monkeypatch.setattr(bot.commands, "datetime", Clock)
+    summary = SummaryCache()
+    summary.load(
+        [
+            ("default", date(2026, 1, 10), "Брак товара", "Начислен", 1, 500),
+            ("default", date(2025, 12, 1), "Нарушение сроков", "Начислен", 1, 300),
+        ]
+    )
+    commands = TelegramCommands(None, summary)
+    commands.chat_sellers = {"100": ("default",)}
+
+    assert "за 2026-01-10: 1 на 500" in commands.answer("100", "/today")
+    assert "Нарушение сроков" not in commands.answer("100", "/top")
@@ -0,0 +1,241 @@
+import asyncio
+
+import pytest
+
+from bot.transport import (
+    CircuitBreaker,
+    ResilientTransport,
+    WBCircuitOpenError,
+    WBConnectionError,
+    WBRateLimitError,
+    WBServerError,
+)
+
+
+class FakeResponse:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+def transport(hedge_after=0.02) -> ResilientTransport:
+    return ResilientTransport(
+        breaker=CircuitBreaker(threshold=1000, reset_timeout=30),
+        max_attempts=1,
+        hedge_after=hedge_after,
+    )
+
+
+class Attempts:
+    """Попытки запроса с заданными задержками ответа, сек"""
+
+    def __init__(self, *delays, ignore_cancel=False):
+        self.delays = delays
+        self.ignore_cancel = ignore_cancel
+        self.responses = []
+
+    async def __call__(self):
+        delay = self.delays[len(self.responses)]
+        response = FakeResponse()
+        self.responses.append(response)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Ответ уже получен, отмена опоздала
+            if not self.ignore_cancel:
+                raise
+        return response
+
+
+async def test_fast_attempt_is_not_hedged():
+    attempts = Attempts(0)
+    response = await transport().call(attempts, "/t", hedge=True)
+    assert attempts.responses == [response]
+
+
+async def test_slow_attempt_is_hedged():
+    attempts = Attempts(0.5, 0)
+    response = await transport().call(attempts, "/t", hedge=True)
+    assert response is attempts.responses[1]
+
+
+async def test_unused_response_is_closed():
+    attempts = Attempts(0.5, 0, ignore_cancel=True)
+    response = await transport().call(attempts, "/t", hedge=True)
+    await asyncio.sleep(0.01)
+    assert attempts.responses[0].closed
+    assert not response.closed
+
+
+async def test_hedged_error_when_both_attempts_fail():
+    async def attempt():
+        await asyncio.sleep(0.05)
+        raise WBConnectionError("нет связи", "error")
+
+    with pytest.raises(WBConnectionError):
+        await transport(hedge_after=0.01).call(attempt, "/t", hedge=True)
+
+
+@pytest.mark.parametrize("cancel_after", [0.005, 0.05])
+async def test_caller_cancel_cancels_attempts(cancel_after):
+    """Отмена до hedge_after и после запуска второй попытки"""
+    attempts = Attempts(1, 1)
+    call = asyncio.create_task(transport().call(attempts, "/t", hedge=True))
+    await asyncio.sleep(cancel_after)
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    await asyncio.sleep(0)
+    tasks = asyncio.all_tasks() - {asyncio.current_task()}
+    assert not tasks
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Failing:
+    """Попытки, которые бросают errors по очереди, затем отвечают"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakeResponse()
+
+
+@pytest.fixture
+def pauses(monkeypatch):
+    """Паузы между повторами без реального ожидания"""
+    recorded = []
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args):
+        recorded.append(delay)
+        await sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    return recorded
+
+
+def retrying(breaker=None, total_timeout=10.0) -> ResilientTransport:
+    return ResilientTransport(
+        breaker=breaker or CircuitBreaker(threshold=1000, reset_timeout=30),
+        max_attempts=100,
+        backoff_base=0.1,
+        backoff_cap=1.0,
+        total_timeout=total_timeout,
+        hedge_after=0,
+    )
+
+
+async def test_retries_with_jitter_until_deadline():
+    attempts = Failing(*(WBServerError("502", 502) for _ in range(1000)))
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    transport = ResilientTransport(
+        breaker=CircuitBreaker(threshold=1000, reset_timeout=30),
+        max_attempts=100,
+        backoff_base=0.005,
+        backoff_cap=0.02,
+        total_timeout=0.1,
+    )
+
+    with pytest.raises(WBServerError):
+        await transport.call(attempts, "/t")
+    assert 1 < attempts.calls < 100
+    assert loop.time() - started < 0.15
+
+
+async def test_jitter_stays_within_bounds(pauses):
+    attempts = Failing(*(WBServerError("502", 502) for _ in range(20)))
+    await retrying().call(attempts, "/t")
+    assert attempts.calls == 21
+    assert all(0.1 <= pause <= 1.0 for pause in pauses)
+    assert len(set(pauses)) > 1
+
+
+async def test_retry_after_takes_precedence(pauses):
+    attempts = Failing(WBRateLimitError("429", 429, retry_after=5.0))
+    await retrying().call(attempts, "/t")
+    assert pauses == [5.0]
+
+
+async def test_retry_after_beyond_deadline_is_returned(pauses):
+    attempts = Failing(WBRateLimitError("429", 429, retry_after=60.0))
+    with pytest.raises(WBRateLimitError) as error:
+        await retrying(total_timeout=10).call(attempts, "/t")
+    assert error.value.retry_after == 60.0
+    assert attempts.calls == 1 and pauses == []
+
+
+async def test_rate_limit_does_not_trip_breaker(pauses):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+    attempts = Failing(*(WBRateLimitError("429", 429) for _ in range(5)))
+    await retrying(breaker).call(attempts, "/t")
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_open_half_open_closed():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 10
+    with pytest.raises(WBCircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after == 20
+
+    clock.now = 30
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Пока идёт пробный запрос, остальные не пропускаются
+    with pytest.raises(WBCircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 59
+    with pytest.raises(WBCircuitOpenError):
+        breaker.before_call()
+    clock.now = 60
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+async def test_unexpected_error_releases_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+
+    with pytest.raises(ValueError):
+        await retrying(breaker).call(Failing(ValueError("bad json")), "/t")
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    await retrying(breaker).call(Failing(), "/t")
+    assert breaker.state == CircuitBreaker.CLOSED